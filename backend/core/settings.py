@@ -148,11 +148,87 @@ CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_HEADERS = list(default_headers) + [
     'content-type',
     'authorization',
+    'idempotency-key',
 ]
 
+# Respostas de POSTs com Idempotency-Key ficam guardadas por este período
+IDEMPOTENCIA_TTL_HORAS = 24
+
+# Previsão de demanda / sugestão de pedidos de compra (oficina/previsao.py)
+PREVISAO_JANELA_DIAS = 90        # Histórico de saídas considerado
+PREVISAO_NIVEL_SERVICO_Z = 1.65  # ~95% de chance de não faltar durante o prazo de entrega
+PREVISAO_COBERTURA_DIAS = 30     # Quantos dias de demanda cada pedido sugerido cobre além do ponto de pedido
+
+# Arquivamento do histórico de estoque (oficina/arquivo.py): meses mais antigos que
+# isso vão para o arquivo frio comprimido; os recentes ficam em MovimentacaoEstoque
+ESTOQUE_MESES_ATIVOS = 12
+
+# Expediente dos mecânicos, usado na busca de horários livres (veiculos/agenda.py)
+AGENDA_EXPEDIENTE_INICIO = '08:00'
+AGENDA_EXPEDIENTE_FIM = '18:00'
+AGENDA_DIAS_UTEIS = [0, 1, 2, 3, 4, 5]  # segunda a sábado (date.weekday())
+
+# Segundos que a contagem de alertas não lidos fica em cache (oficina/alertas.py). O cache
+# padrão é de cada processo: é o atraso máximo com que os outros workers veem uma alteração
+NOTIFICACOES_CONTAGEM_TTL = 30
+
+# Paginação da listagem de movimentações de estoque (limit/offset), que mescla o arquivo frio
+MOVIMENTACOES_POR_PAGINA = 200
+MOVIMENTACOES_POR_PAGINA_MAX = 1000
+
+# Caixa de saída de e-mails (oficina/emails.py). As requisições só gravam o e-mail;
+# o envio é feito por uma thread do processo e/ou pelo worker `manage.py enviar_emails`
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'no-reply@sgom.local')
+EMAIL_DESPACHO_IMEDIATO = True   # Envia logo após o commit, em segundo plano; False deixa tudo para o worker
+EMAIL_LOTE_ENVIO = 100           # E-mails por conexão SMTP
+EMAIL_MAX_TENTATIVAS = 5
+EMAIL_ESPERA_BASE_SEGUNDOS = 60  # Espera antes da 2ª tentativa; dobra a cada falha
+
+# Login (usuarios/limites.py e usuarios/senhas.py): token bucket por IP e por identificador
+# e pool limitado para o hash das senhas, para uma rajada de logins não tomar a API toda
+LOGIN_LIMITE_CACHE = 'default'   # Qualquer alias de CACHES; um cache compartilhado limita entre processos
+LOGIN_LIMITE_IP = {'capacidade': 30, 'por_minuto': 30}
+LOGIN_LIMITE_IDENTIFICADOR = {'capacidade': 5, 'por_minuto': 5}
+LOGIN_HASH_THREADS = 2           # Hashes de senha em paralelo (cada um ocupa um núcleo)
+LOGIN_HASH_FILA = 16             # Logins esperando vaga; além disso responde 503 na hora
+LOGIN_HASH_TIMEOUT = 5           # Segundos que um login espera pela vaga
+
+# Importação de clientes e veículos por CSV (usuarios/importacao.py)
+IMPORTACAO_LINHAS_POR_LOTE = 2000  # Linhas por transação (e por consulta de duplicados)
+IMPORTACAO_CONVITE_DIAS = 14       # Validade do convite para o cliente importado definir a senha
+
+# Tentativas de login (usuarios/authentication.py) em JSON, escritas por uma thread própria
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'login': {'class': 'usuarios.logs.HandlerAssincrono'},
+    },
+    'loggers': {
+        'usuarios.login': {
+            'handlers': ['login'],
+            'level': os.environ.get('LOGIN_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Usuários autenticados por JWT (usuarios/authentication.py): local de cada processo, TTL curto
+    'usuarios': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'usuarios',
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'usuarios.authentication.JWTAuthenticationComCache',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         # Permite que qualquer um (inclusive anônimo) acesse os endpoints
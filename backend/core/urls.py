@@ -1,10 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from usuarios.views import MecanicoViewSet, ClienteViewSet, FornecedorViewSet, AdministradorViewSet
+from usuarios.views import MecanicoViewSet, ClienteViewSet, FornecedorViewSet, AdministradorViewSet, revogar_sessoes, metricas_login, aceitar_convite_view
 from veiculos.views import VeiculoViewSet, AgendamentoViewSet, ServicoViewSet,cadastrar_veiculo, agenda_mecanico
 from django.views.generic import RedirectView
 from usuarios.serializers import CustomTokenObtainPairSerializer
+from usuarios.limites import LimiteLogin
 
 router = DefaultRouter()
 router.register(r'mecanicos', MecanicoViewSet, basename='mecanico')
@@ -21,6 +22,7 @@ from rest_framework_simplejwt.views import (
 )
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [LimiteLogin]
 
 urlpatterns = [
     path('', RedirectView.as_view(url='/api/', permanent=False)), 
@@ -34,4 +36,7 @@ urlpatterns = [
     path('api/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/revogar/', revogar_sessoes, name='token_revogar'),
+    path('api/token/metricas/', metricas_login, name='token_metricas'),
+    path('api/convites/aceitar/', aceitar_convite_view, name='convite_aceitar'),
 ]
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Produto, Orcamento, OrdemServico, ItemMovimentacao, Venda, ItemVenda, Checklist, LaudoTecnico, MovimentacaoEstoque, PedidoCompra
+from django.utils import timezone
+from .models import Produto, Orcamento, OrdemServico, ItemMovimentacao, Venda, ItemVenda, Checklist, LaudoTecnico, MovimentacaoEstoque, PedidoCompra, ReservaEstoque, ArquivoMovimentacao, EmailPendente
 
 admin.site.register(Orcamento)
 admin.site.register(OrdemServico)
@@ -11,7 +12,7 @@ admin.site.register(LaudoTecnico)
 
 @admin.register(Produto)
 class ProdutoAdmin(admin.ModelAdmin):
-    list_display = ['id_produto', 'nome', 'fornecedor', 'custo', 'preco_venda', 'estoque_atual', 'data_cadastro']
+    list_display = ['id_produto', 'nome', 'fornecedor', 'custo', 'preco_venda', 'estoque_atual', 'estoque_reservado', 'data_cadastro']
     search_fields = ['nome', 'fornecedor__nome']
     list_filter = ['fornecedor', 'data_cadastro']
 
@@ -25,5 +26,43 @@ class MovimentacaoEstoqueAdmin(admin.ModelAdmin):
 @admin.register(PedidoCompra)
 class PedidoCompraAdmin(admin.ModelAdmin):
     list_display = ['id_pedido', 'produto', 'fornecedor', 'quantidade', 'valor_total', 'status', 'data_pedido']
-    list_filter = ['status', 'data_pedido']
-    search_fields = ['produto__nome', 'fornecedor__nome']
\ No newline at end of file
+    list_filter = ['status', 'lote_sugestao', 'data_pedido']
+    search_fields = ['produto__nome', 'fornecedor__nome']
+    actions = ['confirmar_sugestoes']
+
+    @admin.action(description='Confirmar sugestões selecionadas')
+    def confirmar_sugestoes(self, request, queryset):
+        confirmados = queryset.filter(status='SUGERIDO').update(status='PENDENTE', data_pedido=timezone.now())
+        self.message_user(request, f'{confirmados} sugestão(ões) confirmada(s).')
+
+@admin.register(ReservaEstoque)
+class ReservaEstoqueAdmin(admin.ModelAdmin):
+    list_display = ['id_reserva', 'orcamento', 'produto', 'quantidade', 'status', 'data_criacao']
+    list_filter = ['status', 'data_criacao']
+    search_fields = ['produto__nome']
+    readonly_fields = ['data_criacao', 'data_atualizacao']
+
+@admin.register(ArquivoMovimentacao)
+class ArquivoMovimentacaoAdmin(admin.ModelAdmin):
+    list_display = ['id_arquivo', 'produto', 'periodo', 'total_movimentos', 'quantidade_entrada', 'quantidade_saida', 'data_arquivamento']
+    list_filter = ['periodo']
+    search_fields = ['produto__nome']
+    exclude = ['movimentos']
+    readonly_fields = ['produto', 'periodo', 'total_movimentos', 'quantidade_entrada', 'quantidade_saida', 'data_arquivamento']
+
+@admin.register(EmailPendente)
+class EmailPendenteAdmin(admin.ModelAdmin):
+    list_display = ['id_email', 'assunto', 'destinatarios', 'status', 'tentativas', 'proxima_tentativa', 'data_criacao', 'data_envio']
+    list_filter = ['status', 'data_criacao']
+    search_fields = ['assunto', 'destinatarios']
+    readonly_fields = ['tentativas', 'ultimo_erro', 'data_criacao', 'data_envio']
+    # O corpo pode ter um código de convite (ver oficina/emails.py)
+    exclude = ['mensagem']
+    actions = ['reenviar']
+
+    @admin.action(description='Reenviar e-mails selecionados')
+    def reenviar(self, request, queryset):
+        reenviados = queryset.exclude(status='ENVIADO').update(
+            status='PENDENTE', tentativas=0, proxima_tentativa=timezone.now()
+        )
+        self.message_user(request, f'{reenviados} e-mail(s) de volta à fila.')
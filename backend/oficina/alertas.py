@@ -0,0 +1,115 @@
+"""
+Alertas de estoque baixo (PB12).
+
+Cada produto tem no máximo um alerta aberto (Notificacao com resolvida=False),
+garantido por uma constraint única parcial. Quem altera o saldo apenas chama
+`verificar_estoque(ids)`; os produtos são acumulados e processados uma única
+vez quando a transação confirma (on_commit). O processamento atualiza o nível
+do alerta aberto, cria o alerta se faltar e resolve os alertas dos produtos
+que voltaram ao mínimo. Assim a lista de não lidas cresce com o número de
+produtos, não com o número de movimentações.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Produto, Notificacao
+
+_pendentes = threading.local()
+
+CHAVE_CONTAGEM = 'notificacoes:nao_lidas'
+
+
+def notificacoes_nao_lidas():
+    return Notificacao.objects.filter(lida=False, resolvida=False)
+
+
+def contar_nao_lidas():
+    """
+    Quantidade de alertas não lidos (badge do painel), em cache. Quem altera os
+    alertas descarta a contagem, mas só no cache do próprio processo (LocMem):
+    o TTL limita quanto tempo os outros processos mostram o número antigo.
+    """
+    total = cache.get(CHAVE_CONTAGEM)
+    if total is None:
+        total = notificacoes_nao_lidas().count()
+        cache.set(CHAVE_CONTAGEM, total, settings.NOTIFICACOES_CONTAGEM_TTL)
+    return total
+
+
+def invalidar_contagem():
+    """Descarta a contagem em cache quando a transação confirmar (update/bulk_* não disparam sinais)"""
+    transaction.on_commit(lambda: cache.delete(CHAVE_CONTAGEM))
+
+
+def mensagem_estoque_baixo(produto):
+    return (
+        f"Alerta de Estoque Baixo: O produto '{produto.nome}' está com {produto.estoque_atual} "
+        f"unidades (Mínimo: {produto.estoque_minimo})."
+    )
+
+
+def verificar_estoque(produto_ids):
+    """Agenda a verificação dos alertas destes produtos para o commit da transação atual"""
+    ids = getattr(_pendentes, 'ids', None)
+    if ids is None:
+        ids = _pendentes.ids = set()
+    ids.update(produto_ids)
+    # Um callback por chamada: o primeiro que rodar esvazia o conjunto e os demais não fazem nada.
+    # Se a transação for desfeita, os ids ficam para o próximo commit (a verificação é idempotente).
+    transaction.on_commit(_processar_pendentes)
+
+
+def _processar_pendentes():
+    ids = getattr(_pendentes, 'ids', None)
+    if not ids:
+        return
+    _pendentes.ids = set()
+    sincronizar_alertas(ids)
+
+
+def sincronizar_alertas(produto_ids):
+    """Deixa os alertas abertos destes produtos de acordo com o saldo atual (consultas fixas)"""
+    produtos = Produto.objects.filter(pk__in=produto_ids).only('nome', 'estoque_atual', 'estoque_minimo')
+    abertos = {
+        alerta.produto_id: alerta
+        for alerta in Notificacao.objects.filter(produto_id__in=produto_ids, resolvida=False)
+    }
+
+    novos, alterados, resolver = [], [], []
+    agora = timezone.now()
+    for produto in produtos:
+        alerta = abertos.get(produto.pk)
+        if produto.estoque_atual >= produto.estoque_minimo:
+            if alerta:
+                resolver.append(alerta.pk)
+            continue
+
+        if alerta is None:
+            novos.append(Notificacao(
+                produto=produto, mensagem=mensagem_estoque_baixo(produto), estoque_registrado=produto.estoque_atual
+            ))
+        elif alerta.estoque_registrado != produto.estoque_atual:
+            if alerta.estoque_registrado is None or produto.estoque_atual < alerta.estoque_registrado:
+                # Piorou desde a última leitura: volta a aparecer como não lida
+                alerta.lida = False
+            alerta.mensagem = mensagem_estoque_baixo(produto)
+            alerta.estoque_registrado = produto.estoque_atual
+            # bulk_update não aplica o auto_now
+            alerta.data_atualizacao = agora
+            alterados.append(alerta)
+
+    if not (novos or alterados or resolver):
+        return
+    with transaction.atomic():
+        if novos:
+            # Outra transação pode ter aberto o alerta ao mesmo tempo; a constraint descarta o repetido
+            Notificacao.objects.bulk_create(novos, ignore_conflicts=True)
+        if alterados:
+            Notificacao.objects.bulk_update(alterados, ['mensagem', 'estoque_registrado', 'lida', 'data_atualizacao'])
+        if resolver:
+            Notificacao.objects.filter(pk__in=resolver).update(resolvida=True, data_atualizacao=agora)
+        invalidar_contagem()
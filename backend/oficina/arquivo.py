@@ -0,0 +1,216 @@
+"""
+Arquivo frio do histórico de estoque.
+
+MovimentacaoEstoque só cresce. Os meses encerrados há mais de
+ESTOQUE_MESES_ATIVOS saem da tabela e vão para ArquivoMovimentacao: uma linha
+por produto e mês, com as movimentações comprimidas (JSON + zlib) e os totais
+de entrada/saída em colunas.
+
+Quem lê o histórico consulta o arquivo só quando o intervalo pedido alcança
+meses arquivados:
+- saldos.py soma os totais (ou descomprime o mês, se o intervalo o corta ao meio);
+- reconciliar_estoque soma os totais;
+- reconstruir_valorizacao e a listagem de movimentações descomprimem os meses;
+- a consulta por id acha o mês pela faixa id_minimo/id_maximo da linha.
+"""
+import json
+import zlib
+from collections import defaultdict
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import MovimentacaoEstoque, ArquivoMovimentacao
+
+TAMANHO_LOTE = 5000
+
+# Ordem das colunas de cada movimentação dentro do arquivo comprimido
+CAMPOS = [
+    'id_movimentacao', 'tipo_movimentacao', 'quantidade', 'custo_unitario',
+    'data_movimentacao', 'observacao', 'venda_id', 'ordem_servico_id',
+]
+
+
+def inicio_do_mes(data):
+    return date(data.year, data.month, 1)
+
+
+def mes_seguinte(periodo):
+    return date(periodo.year + periodo.month // 12, periodo.month % 12 + 1, 1)
+
+
+def instante(data):
+    """Meia-noite de `data` no fuso da oficina"""
+    return timezone.make_aware(datetime.combine(data, time.min))
+
+
+def limite_arquivamento(hoje=None):
+    """Primeiro mês que ainda fica na tabela ativa; os anteriores podem ser arquivados"""
+    hoje = hoje or timezone.localdate()
+    meses = hoje.year * 12 + hoje.month - 1 - settings.ESTOQUE_MESES_ATIVOS
+    return date(meses // 12, meses % 12 + 1, 1)
+
+
+def comprimir(linhas):
+    return zlib.compress(json.dumps(linhas, default=str, separators=(',', ':')).encode(), 6)
+
+
+def descomprimir(arquivo):
+    """Movimentações de um ArquivoMovimentacao como dicionários (data já convertida)"""
+    movimentos = []
+    for linha in json.loads(zlib.decompress(bytes(arquivo.movimentos))):
+        movimento = dict(zip(CAMPOS, linha))
+        movimento['produto_id'] = arquivo.produto_id
+        movimento['data_movimentacao'] = parse_datetime(movimento['data_movimentacao'])
+        movimentos.append(movimento)
+    return movimentos
+
+
+def arquivos_no_intervalo(inicio=None, fim=None):
+    """ArquivoMovimentacao dos meses que têm alguma parte em [inicio, fim)"""
+    arquivos = ArquivoMovimentacao.objects.all()
+    if inicio is not None:
+        arquivos = arquivos.filter(periodo__gte=inicio_do_mes(timezone.localtime(inicio)))
+    if fim is not None:
+        arquivos = arquivos.filter(periodo__lt=fim)
+    return arquivos
+
+
+def efeito_arquivado(produto_ids, inicio=None, fim=None):
+    """
+    {produto_id: efeito líquido} dos movimentos arquivados em [inicio, fim).
+    Meses inteiros no intervalo usam os totais; só os cortados são descomprimidos.
+    """
+    efeito = defaultdict(int)
+    for arquivo in arquivos_no_intervalo(inicio, fim).filter(produto_id__in=produto_ids):
+        comeca, termina = instante(arquivo.periodo), instante(mes_seguinte(arquivo.periodo))
+        if (inicio is None or inicio <= comeca) and (fim is None or termina <= fim):
+            efeito[arquivo.produto_id] += arquivo.quantidade_entrada - arquivo.quantidade_saida
+            continue
+        for mov in descomprimir(arquivo):
+            data = mov['data_movimentacao']
+            if (inicio is None or data >= inicio) and (fim is None or data < fim):
+                sinal = 1 if mov['tipo_movimentacao'] == 'ENTRADA' else -1
+                efeito[arquivo.produto_id] += sinal * mov['quantidade']
+    return dict(efeito)
+
+
+def movimentos_arquivados(inicio=None, fim=None, produto=None, tipo=None):
+    """
+    Movimentações do arquivo frio com data em [inicio, fim], como instâncias de
+    MovimentacaoEstoque não gravadas (para serializar junto com as ativas).
+    Gerador do mais recente para o mais antigo, que lê um mês por vez: quem
+    pára de consumir (uma página) não descomprime os meses mais antigos.
+    """
+    arquivos = arquivos_no_intervalo(inicio)
+    if fim is not None:
+        arquivos = arquivos.filter(periodo__lte=timezone.localtime(fim).date())
+    if produto:
+        arquivos = arquivos.filter(produto_id=produto)
+
+    periodos = arquivos.order_by('-periodo').values_list('periodo', flat=True).distinct()
+    for periodo in list(periodos):
+        movimentos = []
+        for arquivo in arquivos.filter(periodo=periodo).select_related('produto'):
+            for mov in descomprimir(arquivo):
+                data = mov['data_movimentacao']
+                if (inicio is not None and data < inicio) or (fim is not None and data > fim):
+                    continue
+                if tipo and mov['tipo_movimentacao'] != tipo:
+                    continue
+                del mov['produto_id']
+                movimentos.append(MovimentacaoEstoque(produto=arquivo.produto, **mov))
+        movimentos.sort(key=lambda mov: mov.data_movimentacao, reverse=True)
+        yield from movimentos
+
+
+def movimento_arquivado(pk):
+    """A movimentação `pk` do arquivo frio (instância não gravada), ou None"""
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    arquivos = ArquivoMovimentacao.objects.filter(id_minimo__lte=pk, id_maximo__gte=pk).select_related('produto')
+    for arquivo in arquivos:
+        for mov in descomprimir(arquivo):
+            if mov['id_movimentacao'] == pk:
+                del mov['produto_id']
+                return MovimentacaoEstoque(produto=arquivo.produto, **mov)
+    return None
+
+
+def arquivar_periodo(periodo):
+    """
+    Move as movimentações do mês `periodo` para o arquivo frio, em lotes de
+    produtos (cada lote em uma transação). Se o produto já tem o mês arquivado,
+    as movimentações são acrescentadas à linha existente.
+    Devolve (movimentações arquivadas, linhas de arquivo gravadas).
+    """
+    periodo = inicio_do_mes(periodo)
+    if periodo >= limite_arquivamento():
+        raise ValueError(f"{periodo:%m/%Y} ainda está dentro de ESTOQUE_MESES_ATIVOS")
+
+    no_mes = MovimentacaoEstoque.objects.filter(
+        data_movimentacao__gte=instante(periodo), data_movimentacao__lt=instante(mes_seguinte(periodo))
+    )
+    arquivadas = gravados = 0
+    ultimo_produto = 0
+
+    while True:
+        produtos = list(
+            no_mes.filter(produto_id__gt=ultimo_produto).order_by('produto_id')
+            .values_list('produto_id', flat=True).distinct()[:TAMANHO_LOTE]
+        )
+        if not produtos:
+            break
+        ultimo_produto = produtos[-1]
+
+        with transaction.atomic():
+            movimentos = list(
+                no_mes.select_for_update().filter(produto_id__in=produtos)
+                .order_by('produto_id', 'data_movimentacao', 'id_movimentacao')
+                .values_list('produto_id', *CAMPOS)
+            )
+            por_produto = defaultdict(list)
+            for produto_id, *linha in movimentos:
+                por_produto[produto_id].append(linha)
+
+            existentes = {
+                arquivo.produto_id: arquivo
+                for arquivo in ArquivoMovimentacao.objects.select_for_update().filter(
+                    periodo=periodo, produto_id__in=por_produto
+                )
+            }
+            novos, alterados = [], []
+            for produto_id, linhas in por_produto.items():
+                arquivo = existentes.get(produto_id)
+                if arquivo is None:
+                    arquivo = ArquivoMovimentacao(produto_id=produto_id, periodo=periodo)
+                    novos.append(arquivo)
+                else:
+                    anteriores = json.loads(zlib.decompress(bytes(arquivo.movimentos)))
+                    linhas = anteriores + linhas
+                    alterados.append(arquivo)
+
+                arquivo.movimentos = comprimir(linhas)
+                arquivo.total_movimentos = len(linhas)
+                arquivo.id_minimo = min(l[0] for l in linhas)
+                arquivo.id_maximo = max(l[0] for l in linhas)
+                arquivo.quantidade_entrada = sum(l[2] for l in linhas if l[1] == 'ENTRADA')
+                arquivo.quantidade_saida = sum(l[2] for l in linhas if l[1] != 'ENTRADA')
+
+            ArquivoMovimentacao.objects.bulk_create(novos)
+            ArquivoMovimentacao.objects.bulk_update(
+                alterados,
+                ['movimentos', 'total_movimentos', 'id_minimo', 'id_maximo', 'quantidade_entrada', 'quantidade_saida'],
+            )
+            # delete() em lote: nada referencia MovimentacaoEstoque e o saldo do produto não muda
+            no_mes.filter(produto_id__in=produtos).delete()
+
+        arquivadas += len(movimentos)
+        gravados += len(por_produto)
+
+    return arquivadas, gravados
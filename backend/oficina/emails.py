@@ -0,0 +1,184 @@
+"""
+Caixa de saída de e-mails.
+
+Quem precisa mandar e-mail chama `enfileirar_email`: a mensagem vira uma linha
+de EmailPendente na transação atual (e some junto se ela for desfeita), então
+nenhuma requisição espera pelo SMTP. Quando a transação confirma (on_commit),
+os ids são entregues a uma thread de despacho do próprio processo
+(EMAIL_DESPACHO_IMEDIATO). O comando `enviar_emails` esvazia o que sobrar
+(processo reiniciado, SMTP fora do ar) e pode rodar como worker dedicado.
+
+`despachar` reserva um lote de EMAIL_LOTE_ENVIO com SELECT ... SKIP LOCKED
+(thread e worker não pegam o mesmo e-mail), abre uma conexão com o backend
+de e-mail e a reaproveita no lote todo. Uma falha fecha a conexão (a próxima
+mensagem reconecta) e devolve o e-mail à fila com espera exponencial:
+EMAIL_ESPERA_BASE_SEGUNDOS * 2^(tentativas - 1), até EMAIL_MAX_TENTATIVAS.
+
+O corpo pode levar códigos de convite (usuarios/convites.py): depois do envio
+a mensagem é apagada, e o admin não a mostra. Senha nunca entra na caixa de saída.
+"""
+import logging
+import queue
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EmailPendente
+
+logger = logging.getLogger(__name__)
+
+# Quem reservou um lote tem este tempo para enviá-lo; se o processo morrer no
+# meio, os e-mails voltam a vencer e outro despacho os envia
+RESERVA = timedelta(minutes=5)
+
+# Na fila do despachante: esvaziar todos os pendentes em vez de ids específicos
+TODOS = None
+
+_fila = queue.Queue()
+_trava = threading.Lock()
+_despachante = None
+
+
+def enfileirar_email(assunto, mensagem, destinatarios, remetente=None):
+    """Grava o e-mail na caixa de saída; o envio acontece depois do commit"""
+    email = EmailPendente.objects.create(
+        assunto=assunto,
+        mensagem=mensagem,
+        remetente=remetente or settings.DEFAULT_FROM_EMAIL,
+        destinatarios=list(destinatarios),
+    )
+    transaction.on_commit(lambda: _acordar_despachante(email.pk))
+    return email
+
+
+def enfileirar_emails(mensagens, remetente=None, acordar=True):
+    """
+    Versão em lote de enfileirar_email para importações: `mensagens` é um
+    iterável de (assunto, mensagem, destinatarios), gravado com bulk_create.
+    Depois do commit o despachante esvazia a fila toda, lote a lote; com
+    acordar=False os e-mails esperam o worker (enviar_emails).
+    """
+    remetente = remetente or settings.DEFAULT_FROM_EMAIL
+    emails = EmailPendente.objects.bulk_create(
+        [
+            EmailPendente(assunto=assunto, mensagem=mensagem, remetente=remetente, destinatarios=list(destinatarios))
+            for assunto, mensagem, destinatarios in mensagens
+        ],
+        batch_size=1000,
+    )
+    if emails and acordar:
+        transaction.on_commit(lambda: _acordar_despachante(TODOS))
+    return emails
+
+
+def _acordar_despachante(email_id):
+    global _despachante
+    if not settings.EMAIL_DESPACHO_IMEDIATO:
+        return
+    _fila.put(email_id)
+    with _trava:
+        if _despachante is None or not _despachante.is_alive():
+            _despachante = threading.Thread(target=_despachar_em_segundo_plano, name='despacho-emails', daemon=True)
+            _despachante.start()
+
+
+def _despachar_em_segundo_plano():
+    while True:
+        ids = {_fila.get()}
+        # Junta o que chegou enquanto o lote anterior era enviado
+        while True:
+            try:
+                ids.add(_fila.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            if TODOS in ids:
+                despachar_pendentes()
+            else:
+                despachar(ids)
+        except Exception:
+            # Ficam pendentes no banco; o worker tenta de novo
+            logger.exception('Falha no despacho de e-mails %s', sorted(ids, key=str))
+        finally:
+            connection.close()
+
+
+def _espera(tentativas):
+    return timedelta(seconds=settings.EMAIL_ESPERA_BASE_SEGUNDOS * 2 ** (tentativas - 1))
+
+
+def _falhou(email, erro):
+    email.tentativas += 1
+    email.ultimo_erro = f'{type(erro).__name__}: {erro}'
+    if email.tentativas >= settings.EMAIL_MAX_TENTATIVAS:
+        email.status = 'FALHOU'
+    else:
+        email.proxima_tentativa = timezone.now() + _espera(email.tentativas)
+    return email
+
+
+def despachar(ids=None):
+    """
+    Envia um lote de e-mails pendentes já vencidos (só os `ids`, se informados).
+    Devolve (enviados, falhas).
+    """
+    agora = timezone.now()
+    with transaction.atomic():
+        fila = EmailPendente.objects.select_for_update(skip_locked=True).filter(
+            status='PENDENTE', proxima_tentativa__lte=agora
+        )
+        if ids is not None:
+            fila = fila.filter(pk__in=ids)
+        lote = list(fila.order_by('proxima_tentativa', 'pk')[:settings.EMAIL_LOTE_ENVIO])
+        if not lote:
+            return 0, 0
+        EmailPendente.objects.filter(pk__in=[email.pk for email in lote]).update(proxima_tentativa=agora + RESERVA)
+
+    enviados, falhas = [], []
+    conexao = get_connection()
+    try:
+        for posicao, email in enumerate(lote):
+            try:
+                # Abre só se ainda não está aberta: o lote todo usa a mesma conexão
+                conexao.open()
+            except Exception as erro:
+                # Sem servidor não adianta tentar o resto do lote agora
+                falhas.extend(_falhou(restante, erro) for restante in lote[posicao:])
+                break
+            try:
+                EmailMessage(
+                    email.assunto, email.mensagem, email.remetente, email.destinatarios, connection=conexao
+                ).send()
+            except Exception as erro:
+                conexao.close()  # A próxima mensagem reconecta
+                falhas.append(_falhou(email, erro))
+            else:
+                enviados.append(email.pk)
+    finally:
+        conexao.close()
+
+    if enviados:
+        EmailPendente.objects.filter(pk__in=enviados).update(
+            status='ENVIADO', tentativas=F('tentativas') + 1, data_envio=timezone.now(), ultimo_erro='',
+            mensagem='',
+        )
+    if falhas:
+        EmailPendente.objects.bulk_update(falhas, ['status', 'tentativas', 'proxima_tentativa', 'ultimo_erro'])
+    return len(enviados), len(falhas)
+
+
+def despachar_pendentes():
+    """Envia, lote a lote, todos os e-mails vencidos. Devolve (enviados, falhas)"""
+    total_enviados = total_falhas = 0
+    while True:
+        enviados, falhas = despachar()
+        total_enviados += enviados
+        total_falhas += falhas
+        # Os que falharam foram remarcados para o futuro: o laço termina
+        if not (enviados or falhas):
+            return total_enviados, total_falhas
@@ -0,0 +1,234 @@
+"""
+Operações de escrita no estoque (PB11).
+
+O saldo do produto é alterado sempre no banco, com UPDATE condicional
+(`estoque_atual = estoque_atual - N WHERE estoque_atual >= N`), nunca
+lendo o valor para o Python e regravando o Produto inteiro. Assim duas
+vendas ou OS simultâneas sobre a mesma peça não perdem atualizações.
+
+Saídas respeitam as reservas: só o saldo disponível (`estoque_atual -
+estoque_reservado`) pode ser vendido. Orçamentos aprovados reservam suas
+peças (o que houver disponível; a OS do que faltar fica AGUARDANDO_PECAS),
+a conclusão da OS consome a reserva e o cancelamento a libera.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import F, Q, Case, When, IntegerField, Sum
+
+from .models import Produto, OrdemServico, ItemMovimentacao, MovimentacaoEstoque, ReservaEstoque
+from .alertas import verificar_estoque
+from .valorizacao import registrar_movimentos
+
+
+class EstoqueInsuficiente(ValueError):
+    """Saída recusada porque o produto não tem saldo suficiente"""
+
+    def __init__(self, produto, disponivel):
+        self.produto = produto
+        self.disponivel = disponivel
+        super().__init__(f"Estoque insuficiente para {produto.nome}. Disponível: {disponivel}")
+
+
+def aplicar_movimentacao(produto, tipo_movimentacao, quantidade):
+    """
+    Aplica uma ENTRADA ou SAIDA no saldo do produto.
+    Deve ser chamada dentro da mesma transação que grava a linha do histórico.
+    Atualiza `produto.estoque_atual` em memória com o saldo confirmado no banco.
+    """
+    produtos = Produto.objects.filter(pk=produto.pk)
+
+    if tipo_movimentacao == 'SAIDA':
+        atualizados = produtos.filter(estoque_disponivel__gte=quantidade).update(
+            estoque_atual=F('estoque_atual') - quantidade
+        )
+        if not atualizados:
+            disponivel = produtos.values_list('estoque_disponivel', flat=True).first()
+            raise EstoqueInsuficiente(produto, disponivel)
+    else:
+        produtos.update(estoque_atual=F('estoque_atual') + quantidade)
+
+    produto.estoque_atual = produtos.values_list('estoque_atual', flat=True).get()
+    verificar_estoque([produto.pk])
+    return produto.estoque_atual
+
+
+def travar_produtos(produto_ids):
+    """
+    Carrega e trava (SELECT ... FOR UPDATE) os produtos em uma única consulta.
+    As linhas são travadas sempre em ordem de chave primária, então duas
+    transações que disputam as mesmas peças nunca entram em deadlock.
+    """
+    produtos = Produto.objects.select_for_update().filter(pk__in=produto_ids).order_by('pk')
+    return {produto.pk: produto for produto in produtos}
+
+
+def _somar_por_produto(campo, quantidades, sinal=1):
+    """CASE que soma (ou subtrai) a quantidade de cada produto ao `campo`, para um UPDATE em lote"""
+    return Case(
+        *[When(pk=pk, then=F(campo) + sinal * quantidade) for pk, quantidade in quantidades.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _com_saldo_disponivel(quantidades):
+    """Condição: cada produto tem disponível (atual - reservado) para a sua quantidade"""
+    return reduce(or_, (
+        Q(pk=pk, estoque_disponivel__gte=quantidade) for pk, quantidade in quantidades.items()
+    ))
+
+
+def _recusar_sem_saldo(quantidades):
+    for produto in Produto.objects.filter(pk__in=quantidades):
+        if produto.estoque_disponivel < quantidades[produto.pk]:
+            raise EstoqueInsuficiente(produto, produto.estoque_disponivel)
+
+
+def baixar_em_lote(quantidades, permitir_negativo=False):
+    """
+    Subtrai `quantidades` ({produto_id: quantidade}) de vários produtos com um único UPDATE.
+    Sem `permitir_negativo`, cada linha só é alterada se tiver saldo disponível; se
+    alguma ficar de fora a exceção desfaz a transação inteira.
+    """
+    if not quantidades:
+        return
+
+    condicao = Q(pk__in=quantidades) if permitir_negativo else _com_saldo_disponivel(quantidades)
+    atualizados = Produto.objects.filter(condicao).update(
+        estoque_atual=_somar_por_produto('estoque_atual', quantidades, -1)
+    )
+    if atualizados != len(quantidades):
+        _recusar_sem_saldo(quantidades)
+    verificar_estoque(quantidades)
+
+
+def quantidades_do_orcamento(orcamento_id):
+    """Peças do orçamento agrupadas por produto: {produto_id: quantidade}"""
+    return dict(
+        ItemMovimentacao.objects.filter(orcamento_id=orcamento_id, produto__isnull=False)
+        .values_list('produto')
+        .annotate(total=Sum('quantidade'))
+        .order_by()
+    )
+
+
+def reservar_orcamento(orcamento):
+    """
+    Reserva as peças de um orçamento aprovado com consultas fixas: trava os
+    produtos, um UPDATE do contador estoque_reservado e um bulk_create das
+    reservas. Peça sem saldo suficiente fica reservada só no que há disponível;
+    devolve o que faltou, {produto_id: quantidade} (vazio se reservou tudo),
+    para a OS aguardar as peças.
+    """
+    quantidades = quantidades_do_orcamento(orcamento.pk)
+    if not quantidades:
+        return {}
+
+    with transaction.atomic():
+        produtos = travar_produtos(quantidades)
+        reservadas = {
+            produto_id: min(quantidade, max(produtos[produto_id].estoque_disponivel, 0))
+            for produto_id, quantidade in quantidades.items()
+        }
+        reservadas = {produto_id: quantidade for produto_id, quantidade in reservadas.items() if quantidade}
+        if reservadas:
+            Produto.objects.filter(pk__in=reservadas).update(
+                estoque_reservado=_somar_por_produto('estoque_reservado', reservadas)
+            )
+            ReservaEstoque.objects.bulk_create([
+                ReservaEstoque(orcamento=orcamento, produto_id=produto_id, quantidade=quantidade)
+                for produto_id, quantidade in reservadas.items()
+            ])
+
+    return {
+        produto_id: quantidade - reservadas.get(produto_id, 0)
+        for produto_id, quantidade in quantidades.items()
+        if quantidade > reservadas.get(produto_id, 0)
+    }
+
+
+def _travar_reservas(orcamento_id):
+    """Reservas ativas do orçamento, travadas: {produto_id: quantidade}"""
+    if not orcamento_id:
+        return {}
+    return dict(
+        ReservaEstoque.objects.select_for_update()
+        .filter(orcamento_id=orcamento_id, status='ATIVA')
+        .values_list('produto_id', 'quantidade')
+    )
+
+
+def _encerrar_reservas(orcamento_id, reservadas, novo_status):
+    """Devolve ao contador as reservas ativas (já travadas) e muda o status delas"""
+    if not reservadas:
+        return
+    Produto.objects.filter(pk__in=reservadas).update(
+        estoque_reservado=_somar_por_produto('estoque_reservado', reservadas, -1)
+    )
+    ReservaEstoque.objects.filter(orcamento_id=orcamento_id, status='ATIVA').update(status=novo_status)
+
+
+def liberar_reservas(orcamento_id):
+    """Cancelamento: as peças reservadas pelo orçamento voltam a ficar disponíveis (idempotente)"""
+    with transaction.atomic():
+        reservadas = _travar_reservas(orcamento_id)
+        if reservadas:
+            travar_produtos(reservadas)
+            _encerrar_reservas(orcamento_id, reservadas, 'LIBERADA')
+
+
+def baixar_pecas_da_os(ordem_servico, quantidades):
+    """
+    Baixa as peças usadas na OS ({produto_id: quantidade}) com consultas fixas:
+    trava os produtos, um UPDATE para o saldo, um bulk_create para o histórico
+    (os alertas ficam para o commit, ver alertas.py). Na OS o saldo pode ficar negativo (a peça já foi usada).
+    """
+    if not quantidades:
+        return
+
+    with transaction.atomic():
+        travar_produtos(quantidades)
+        baixar_em_lote(quantidades, permitir_negativo=True)
+
+        saidas = MovimentacaoEstoque.objects.bulk_create([
+            MovimentacaoEstoque(
+                produto_id=produto_id,
+                tipo_movimentacao='SAIDA',
+                quantidade=quantidade,
+                observacao=f'Uso em OS #{ordem_servico.numero_os}',
+                ordem_servico=ordem_servico
+            )
+            for produto_id, quantidade in quantidades.items()
+        ])
+        registrar_movimentos(saidas)
+
+
+def concluir_ordem_servico(ordem_servico):
+    """
+    Baixa do estoque as peças de uma OS concluída: itens avulsos da OS e
+    itens do orçamento vinculado, agrupados por produto.
+    Idempotente: a OS é marcada (estoque_baixado) com UPDATE condicional na
+    mesma transação, então salvar a OS de novo não baixa o estoque outra vez.
+    """
+    with transaction.atomic():
+        marcada = OrdemServico.objects.filter(pk=ordem_servico.pk, estoque_baixado=False).update(estoque_baixado=True)
+        ordem_servico.estoque_baixado = True
+        if not marcada:
+            return
+
+        origem = Q(os=ordem_servico)
+        if ordem_servico.orcamento_id:
+            origem |= Q(orcamento_id=ordem_servico.orcamento_id)
+        quantidades = dict(
+            ItemMovimentacao.objects.filter(origem, produto__isnull=False)
+            .values_list('produto')
+            .annotate(total=Sum('quantidade'))
+            .order_by()
+        )
+
+        # A reserva feita na aprovação vira a saída: sai do reservado e do saldo atual
+        reservadas = _travar_reservas(ordem_servico.orcamento_id)
+        travar_produtos(set(quantidades) | set(reservadas))
+        _encerrar_reservas(ordem_servico.orcamento_id, reservadas, 'CONSUMIDA')
+        baixar_pecas_da_os(ordem_servico, quantidades)
@@ -0,0 +1,117 @@
+"""
+Suporte ao cabeçalho Idempotency-Key nos POSTs que alteram estoque ou geram OS.
+
+Os terminais do balcão refazem a requisição quando há timeout. Com a mesma
+chave, a segunda chamada devolve a resposta guardada da primeira em vez de
+executar a venda/aprovação de novo. Respostas recentes ficam também no cache
+local, então uma repetição normalmente nem consulta o banco.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import ChaveIdempotencia
+
+CABECALHO = 'Idempotency-Key'
+PREFIXO_CACHE = 'idempotencia:'
+
+
+def _ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCIA_TTL_HORAS', 24))
+
+
+def _sha256(*partes):
+    return hashlib.sha256('\x1f'.join(str(p) for p in partes).encode()).hexdigest()
+
+
+def _repetir(status_code, resposta):
+    return Response(resposta, status=status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def _guardada(chave, impressao_digital):
+    """Resposta já registrada para a chave (cache local, depois banco) ou None"""
+    guardada = cache.get(PREFIXO_CACHE + chave)
+    if guardada is None:
+        registro = ChaveIdempotencia.objects.filter(pk=chave).first()
+        if registro is None:
+            return None
+        if registro.expira_em <= timezone.now():
+            registro.delete()
+            return None
+        guardada = (registro.impressao_digital, registro.status_code, registro.resposta)
+
+    if guardada[0] != impressao_digital:
+        return Response(
+            {'erro': f'{CABECALHO} já utilizada com outro conteúdo.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return _repetir(guardada[1], guardada[2])
+
+
+def idempotente(metodo):
+    """
+    Decorator para métodos de ViewSet. Sem o cabeçalho a view roda normalmente.
+    A linha da chave é inserida na mesma transação da operação. Só respostas 2xx
+    ficam guardadas: se a view falhar ou recusar o pedido (4xx), nada fica
+    registrado e o cliente pode tentar de novo com a mesma chave.
+    """
+    @wraps(metodo)
+    def wrapper(self, request, *args, **kwargs):
+        chave_cliente = request.headers.get(CABECALHO)
+        if not chave_cliente:
+            return metodo(self, request, *args, **kwargs)
+
+        chave = _sha256(request.user.pk, request.method, request.path, chave_cliente)
+        impressao_digital = _sha256(json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder))
+
+        resposta = _guardada(chave, impressao_digital)
+        if resposta is not None:
+            return resposta
+
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    registro = ChaveIdempotencia.objects.create(
+                        chave=chave,
+                        impressao_digital=impressao_digital,
+                        expira_em=timezone.now() + _ttl(),
+                    )
+            except IntegrityError:
+                # Outra requisição com a mesma chave acabou de ser concluída
+                resposta = _guardada(chave, impressao_digital)
+                if resposta is not None:
+                    return resposta
+                return Response(
+                    {'erro': 'Requisição com esta chave ainda em processamento.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            response = metodo(self, request, *args, **kwargs)
+            if response.status_code >= 500:
+                transaction.set_rollback(True)
+                return response
+            if not status.is_success(response.status_code):
+                # Recusas como "estoque insuficiente" podem mudar: a repetição executa de novo
+                registro.delete()
+                return response
+
+            registro.status_code = response.status_code
+            registro.resposta = response.data
+            registro.save(update_fields=['status_code', 'resposta'])
+
+            guardada = (impressao_digital, registro.status_code, registro.resposta)
+            timeout = int(_ttl().total_seconds())
+            transaction.on_commit(lambda: cache.set(PREFIXO_CACHE + chave, guardada, timeout))
+
+        return response
+
+    return wrapper
@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+
+from oficina.arquivo import arquivar_periodo, inicio_do_mes, limite_arquivamento, mes_seguinte
+from oficina.models import MovimentacaoEstoque
+
+
+class Command(BaseCommand):
+    help = (
+        "Move para o arquivo frio (ArquivoMovimentacao, comprimido) as movimentações de estoque dos "
+        "meses anteriores aos últimos ESTOQUE_MESES_ATIVOS. Agende uma vez por mês; rodar de novo "
+        "não duplica nada (só o que ainda está na tabela ativa é movido)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ate', type=date.fromisoformat,
+            help='Arquiva até o mês desta data, inclusive (padrão: último mês fora do período ativo)'
+        )
+
+    def handle(self, *args, **options):
+        limite = limite_arquivamento()
+        ate = inicio_do_mes(options['ate']) if options['ate'] else None
+        if ate is not None and ate >= limite:
+            raise CommandError(f"Só é possível arquivar meses anteriores a {limite:%m/%Y}.")
+        fim = mes_seguinte(ate) if ate else limite
+
+        primeira = MovimentacaoEstoque.objects.aggregate(primeira=Min('data_movimentacao'))['primeira']
+        if primeira is None:
+            self.stdout.write("Nenhuma movimentação a arquivar.")
+            return
+
+        periodo = inicio_do_mes(primeira)
+        while periodo < fim:
+            arquivadas, linhas = arquivar_periodo(periodo)
+            if arquivadas:
+                self.stdout.write(f"{periodo:%m/%Y}: {arquivadas} movimentação(ões) em {linhas} arquivo(s).")
+            periodo = mes_seguinte(periodo)
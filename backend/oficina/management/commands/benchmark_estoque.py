@@ -0,0 +1,99 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction, OperationalError
+
+from oficina.models import Produto, MovimentacaoEstoque
+from usuarios.models import Fornecedor
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de concorrência do histórico de estoque: várias threads registram "
+        "SAIDAs no mesmo produto e o saldo final é conferido para detectar atualizações perdidas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--movimentos', type=int, default=200, help='Saídas por thread')
+        parser.add_argument('--modo', choices=['atomico', 'legado', 'ambos'], default='ambos')
+
+    def handle(self, *args, **options):
+        modos = ['legado', 'atomico'] if options['modo'] == 'ambos' else [options['modo']]
+        fornecedor = Fornecedor.objects.create(
+            nome='Fornecedor Benchmark', cnpj=f'BENCH-{time.time_ns()}', telefone='-', endereco='-'
+        )
+        try:
+            for modo in modos:
+                self._executar(modo, fornecedor, options['threads'], options['movimentos'])
+        finally:
+            fornecedor.delete()
+
+    def _executar(self, modo, fornecedor, n_threads, n_movimentos):
+        total = n_threads * n_movimentos
+        produto = Produto.objects.create(
+            fornecedor=fornecedor, nome=f'Peça Benchmark ({modo})',
+            custo=1, preco_venda=2, estoque_atual=total,
+        )
+        registrar = self._saida_atomica if modo == 'atomico' else self._saida_legada
+        contadores = {'ok': 0, 'retentativas': 0, 'falhas': 0}
+        trava = threading.Lock()
+
+        def trabalhador():
+            try:
+                for _ in range(n_movimentos):
+                    resultado = self._com_retentativa(registrar, produto.pk)
+                    with trava:
+                        for chave, valor in resultado.items():
+                            contadores[chave] += valor
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=trabalhador) for _ in range(n_threads)]
+        inicio = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duracao = time.perf_counter() - inicio
+
+        produto.refresh_from_db()
+        registradas = MovimentacaoEstoque.objects.filter(produto=produto).count()
+        perdidas = produto.estoque_atual - (total - registradas)
+
+        self.stdout.write(
+            f"[{modo}] {contadores['ok']} saídas em {duracao:.2f}s "
+            f"({contadores['ok'] / duracao:.0f} mov/s) | retentativas: {contadores['retentativas']} | "
+            f"falhas: {contadores['falhas']} | estoque final: {produto.estoque_atual} | "
+            f"atualizações perdidas: {perdidas}"
+        )
+        produto.delete()
+
+    def _com_retentativa(self, registrar, produto_id, tentativas=50):
+        # SQLite serializa escritores e responde "database is locked" em vez de esperar
+        for tentativa in range(tentativas):
+            try:
+                registrar(produto_id)
+                return {'ok': 1, 'retentativas': tentativa}
+            except OperationalError:
+                time.sleep(0.001 * (tentativa + 1))
+        return {'falhas': 1, 'retentativas': tentativas}
+
+    def _saida_atomica(self, produto_id):
+        MovimentacaoEstoque.objects.create(
+            produto=Produto(pk=produto_id), tipo_movimentacao='SAIDA', quantidade=1,
+            observacao='Benchmark'
+        )
+
+    def _saida_legada(self, produto_id):
+        # Reproduz o caminho antigo: lê o saldo, confere em Python e regrava o Produto inteiro
+        with transaction.atomic():
+            produto = Produto.objects.get(pk=produto_id)
+            if produto.estoque_atual < 1:
+                raise ValueError('Estoque insuficiente')
+            produto.estoque_atual -= 1
+            produto.save()
+            MovimentacaoEstoque.objects.bulk_create([
+                MovimentacaoEstoque(produto=produto, tipo_movimentacao='SAIDA', quantidade=1, observacao='Benchmark')
+            ])
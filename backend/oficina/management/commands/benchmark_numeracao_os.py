@@ -0,0 +1,89 @@
+import threading
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIClient
+
+from oficina.models import Orcamento, OrdemServico
+from usuarios.models import Cliente, Mecanico
+from veiculos.models import Veiculo
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de aprovações de orçamento em paralelo: cada thread aprova orçamentos "
+        "via POST /api/orcamentos/{id}/aprovar/ e ao final os números de OS são conferidos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--aprovacoes', type=int, default=50, help='Aprovações por thread')
+
+    def handle(self, *args, **options):
+        n_threads, n_aprovacoes = options['threads'], options['aprovacoes']
+        sufixo = time.time_ns()
+
+        user = User.objects.create_user(username=f'bench_numeracao_{sufixo}')
+        mecanico = Mecanico.objects.create(user=user, nome='Mecânico Benchmark', cpf=f'B{sufixo}'[:14])
+        cliente = Cliente.objects.create(nome='Cliente Benchmark', cpf=f'C{sufixo}'[:14])
+        veiculo = Veiculo.objects.create(placa=f'B{sufixo}'[-10:], modelo='-', marca='-', ano=2020, cliente=cliente)
+        orcamentos = Orcamento.objects.bulk_create([
+            Orcamento(cliente=cliente, veiculo=veiculo, mecanico=mecanico, validade=date.today())
+            for _ in range(n_threads * n_aprovacoes)
+        ])
+        ids = [o.pk for o in orcamentos]
+
+        falhas = []
+        retentativas = []
+        trava = threading.Lock()
+
+        def trabalhador(lote):
+            # Exceções viram 500: o sinal usado pelo test client para repassá-las não é seguro entre threads
+            client = APIClient(SERVER_NAME='localhost', raise_request_exception=False)
+            try:
+                for pk in lote:
+                    status_code, tentativas = self._aprovar(client, pk)
+                    with trava:
+                        retentativas.append(tentativas)
+                        if status_code != 200:
+                            falhas.append(status_code)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=trabalhador, args=(ids[i::n_threads],))
+            for i in range(n_threads)
+        ]
+        inicio = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duracao = time.perf_counter() - inicio
+
+        numeros = list(OrdemServico.objects.filter(orcamento_id__in=ids).values_list('numero_os', flat=True))
+        aprovadas = len(numeros)
+        self.stdout.write(
+            f"{aprovadas} aprovações em {duracao:.2f}s ({aprovadas / duracao:.0f}/s) | "
+            f"retentativas: {sum(retentativas)} | falhas: {len(falhas)} | "
+            f"números repetidos: {aprovadas - len(set(numeros))}"
+        )
+
+        OrdemServico.objects.filter(orcamento_id__in=ids).delete()
+        Orcamento.objects.filter(pk__in=ids).delete()
+        veiculo.delete()
+        cliente.delete()
+        mecanico.delete()
+        user.delete()
+
+    def _aprovar(self, client, pk, tentativas=50):
+        # SQLite serializa escritores e responde "database is locked" em vez de esperar
+        for tentativa in range(tentativas):
+            status_code = client.post(f'/api/orcamentos/{pk}/aprovar/').status_code
+            if status_code != 500:
+                return status_code, tentativa
+            time.sleep(0.001 * (tentativa + 1))
+        return status_code, tentativas
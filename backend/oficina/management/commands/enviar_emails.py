@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from oficina.emails import despachar_pendentes
+
+
+class Command(BaseCommand):
+    help = (
+        "Envia os e-mails pendentes da caixa de saída (EmailPendente) em lotes, reaproveitando a "
+        "conexão SMTP. Sem --continuo esvazia a fila e termina (cron); com --continuo roda como worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help='Continua verificando a fila até ser interrompido')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre verificações (com --continuo)')
+
+    def handle(self, *args, **options):
+        while True:
+            enviados, falhas = despachar_pendentes()
+            if enviados or falhas or not options['continuo']:
+                self.stdout.write(f"{enviados} e-mail(s) enviado(s), {falhas} falha(s).")
+            if not options['continuo']:
+                return
+            time.sleep(options['intervalo'])
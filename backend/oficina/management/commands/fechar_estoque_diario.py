@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from oficina.models import SaldoEstoqueDiario
+from oficina.saldos import fechar_dia
+
+
+class Command(BaseCommand):
+    help = (
+        "Grava o saldo de estoque ao fim do dia (SaldoEstoqueDiario) dos produtos que tiveram movimento. "
+        "Agende uma vez por dia (ex.: cron logo após a meia-noite); dias sem fechamento "
+        "desde o último são fechados em sequência."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', type=date.fromisoformat, help='Dia a fechar (padrão: ontem)')
+        parser.add_argument(
+            '--desde', type=date.fromisoformat,
+            help='Fecha todos os dias desde esta data (padrão: dia seguinte ao último fechamento)'
+        )
+
+    def handle(self, *args, **options):
+        ate = options['data'] or timezone.localdate() - timedelta(days=1)
+        if ate >= timezone.localdate():
+            raise CommandError("Só é possível fechar dias que já terminaram.")
+
+        desde = options['desde']
+        if desde is None:
+            ultimo = SaldoEstoqueDiario.objects.order_by('-data').values_list('data', flat=True).first()
+            desde = ultimo + timedelta(days=1) if ultimo and ultimo < ate else ate
+
+        dia = desde
+        while dia <= ate:
+            gravados = fechar_dia(dia)
+            self.stdout.write(f"{dia:%d/%m/%Y}: {gravados} saldo(s) gravado(s).")
+            dia += timedelta(days=1)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from oficina.models import ChaveIdempotencia
+
+
+class Command(BaseCommand):
+    help = "Remove as chaves de idempotência expiradas (executar periodicamente, ex.: cron diário)."
+
+    def handle(self, *args, **options):
+        removidas, _ = ChaveIdempotencia.objects.filter(expira_em__lte=timezone.now()).delete()
+        self.stdout.write(f"{removidas} chave(s) de idempotência expirada(s) removida(s).")
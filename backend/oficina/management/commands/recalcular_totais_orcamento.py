@@ -0,0 +1,32 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from oficina.models import Orcamento, ItemMovimentacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói Orcamento.valor_total a partir dos itens com um único UPDATE. "
+        "Use após cargas em massa (bulk_create/update não disparam os sinais) ou para corrigir divergências."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Orçamentos a recalcular (padrão: todos)')
+
+    def handle(self, *args, **options):
+        orcamentos = Orcamento.objects.all()
+        if options['ids']:
+            orcamentos = orcamentos.filter(pk__in=options['ids'])
+
+        soma_itens = ItemMovimentacao.objects.filter(orcamento=OuterRef('pk')).values('orcamento').annotate(
+            total=Sum('subtotal')
+        ).values('total')
+        total_correto = Coalesce(Subquery(soma_itens), Decimal('0.00'), output_field=DecimalField())
+
+        divergentes = orcamentos.annotate(correto=total_correto).exclude(valor_total=F('correto')).count()
+        atualizados = orcamentos.update(valor_total=total_correto)
+
+        self.stdout.write(f"{atualizados} orçamento(s) recalculado(s), {divergentes} estava(m) divergente(s).")
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum
+
+from oficina.models import Produto, MovimentacaoEstoque, ArquivoMovimentacao
+from oficina.saldos import EFEITO_NO_SALDO
+from oficina.valorizacao import registrar_movimentos
+
+OBSERVACAO_AJUSTE = 'Ajuste de reconciliação: saldo do produto sem registro no histórico'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara Produto.estoque_atual com a soma do histórico (MovimentacaoEstoque e arquivo frio) e lista as divergências. "
+        "Produtos e somas do histórico são lidos em fluxo, ordenados por produto, e comparados "
+        "em memória constante. Com --corrigir grava movimentações de ajuste (em lote) para o histórico "
+        "bater com o saldo atual; o saldo do produto não é alterado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corrigir', action='store_true', help='Grava as movimentações de ajuste')
+        parser.add_argument('--lote', type=int, default=5000, help='Linhas lidas/gravadas por vez')
+        parser.add_argument('--mostrar', type=int, default=20, help='Quantas divergências listar')
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        produtos = Produto.objects.order_by('pk').values_list('pk', 'nome', 'estoque_atual').iterator(chunk_size=lote)
+        somas = (
+            MovimentacaoEstoque.objects.values_list('produto_id')
+            .annotate(efeito=EFEITO_NO_SALDO)
+            .order_by('produto_id')
+            .iterator(chunk_size=lote)
+        )
+        # Meses já arquivados (ver oficina/arquivo.py) entram pelos totais de cada arquivo
+        arquivadas = (
+            ArquivoMovimentacao.objects.values_list('produto_id')
+            .annotate(efeito=Sum(F('quantidade_entrada') - F('quantidade_saida')))
+            .order_by('produto_id')
+            .iterator(chunk_size=lote)
+        )
+
+        analisados = divergentes = diferenca_total = 0
+        ajustes = []
+        soma = next(somas, None)
+        arquivada = next(arquivadas, None)
+
+        for produto_id, nome, estoque_atual in produtos:
+            analisados += 1
+            # As duas listas vêm ordenadas por produto: avança o histórico até alcançar este produto
+            while soma is not None and soma[0] < produto_id:
+                soma = next(somas, None)
+            historico = soma[1] if soma is not None and soma[0] == produto_id else 0
+            while arquivada is not None and arquivada[0] < produto_id:
+                arquivada = next(arquivadas, None)
+            if arquivada is not None and arquivada[0] == produto_id:
+                historico += arquivada[1]
+
+            diferenca = estoque_atual - historico
+            if not diferenca:
+                continue
+
+            divergentes += 1
+            diferenca_total += abs(diferenca)
+            if divergentes <= options['mostrar']:
+                self.stdout.write(
+                    f"#{produto_id} {nome}: estoque_atual={estoque_atual}, histórico={historico} ({diferenca:+d})"
+                )
+
+            if options['corrigir']:
+                # bulk_create não passa por MovimentacaoEstoque.save: só o histórico (e a valorização) muda
+                ajustes.append(MovimentacaoEstoque(
+                    produto_id=produto_id,
+                    tipo_movimentacao='ENTRADA' if diferenca > 0 else 'SAIDA',
+                    quantidade=abs(diferenca),
+                    observacao=OBSERVACAO_AJUSTE,
+                ))
+                if len(ajustes) >= lote:
+                    self._gravar(ajustes)
+                    ajustes = []
+
+        if ajustes:
+            self._gravar(ajustes)
+
+        self.stdout.write(
+            f"{analisados} produto(s) analisado(s), {divergentes} divergente(s), "
+            f"diferença total de {diferenca_total} unidade(s)."
+        )
+        if options['corrigir'] and divergentes:
+            self.stdout.write(f"{divergentes} movimentação(ões) de ajuste gravada(s).")
+
+    def _gravar(self, ajustes):
+        with transaction.atomic():
+            registrar_movimentos(MovimentacaoEstoque.objects.bulk_create(ajustes))
@@ -0,0 +1,144 @@
+from decimal import Decimal
+from operator import itemgetter
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from oficina.arquivo import descomprimir
+from oficina.models import Produto, MovimentacaoEstoque, ValorizacaoEstoque, CamadaCustoFIFO, ArquivoMovimentacao
+from oficina.valorizacao import CENTAVO, CASAS_CUSTO
+
+
+def _decimal(valor, casas):
+    return Decimal(repr(float(valor))).quantize(casas)
+
+
+class Command(BaseCommand):
+    help = (
+        "Refaz ValorizacaoEstoque e as camadas PEPS a partir de todo o histórico de movimentações "
+        "(incluindo os meses do arquivo frio). "
+        "Os produtos são processados em lotes e cada lote é calculado com somas acumuladas (numpy) "
+        "em vez de repetir movimento a movimento. Rode com a oficina parada: movimentações gravadas "
+        "durante a reconstrução podem ficar de fora."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help='Produtos por lote')
+
+    def handle(self, *args, **options):
+        produtos = Produto.objects.order_by('pk').values_list('pk', 'custo')
+        total_produtos = total_movimentos = 0
+        ultimo_pk = 0
+
+        while True:
+            lote = list(produtos.filter(pk__gt=ultimo_pk)[:options['lote']])
+            if not lote:
+                break
+            ultimo_pk = lote[-1][0]
+            custos_cadastro = dict(lote)
+
+            movimentos = self._arquivadas(custos_cadastro) + list(
+                MovimentacaoEstoque.objects.filter(produto_id__in=custos_cadastro)
+                .order_by('produto_id', 'data_movimentacao', 'id_movimentacao')
+                .values_list('produto_id', 'tipo_movimentacao', 'quantidade', 'custo_unitario', 'data_movimentacao')
+            )
+            # Os meses arquivados são sempre anteriores aos ativos: a ordenação estável
+            # por produto mantém, dentro de cada produto, a ordem cronológica
+            movimentos.sort(key=itemgetter(0))
+            estados, camadas = self._calcular(movimentos, custos_cadastro)
+
+            with transaction.atomic():
+                ValorizacaoEstoque.objects.filter(produto_id__in=custos_cadastro).delete()
+                CamadaCustoFIFO.objects.filter(produto_id__in=custos_cadastro).delete()
+                ValorizacaoEstoque.objects.bulk_create(estados)
+                CamadaCustoFIFO.objects.bulk_create(camadas, batch_size=5000)
+
+            total_produtos += len(estados)
+            total_movimentos += len(movimentos)
+
+        self.stdout.write(
+            f"Valorização reconstruída: {total_produtos} produto(s) com movimentação, "
+            f"{total_movimentos} movimentação(ões) processada(s)."
+        )
+
+    def _arquivadas(self, produto_ids):
+        """Movimentações do arquivo frio dos produtos, no formato da consulta acima"""
+        movimentos = []
+        for arquivo in ArquivoMovimentacao.objects.filter(produto_id__in=produto_ids).order_by('produto_id', 'periodo'):
+            movimentos.extend(
+                (mov['produto_id'], mov['tipo_movimentacao'], mov['quantidade'],
+                 Decimal(mov['custo_unitario']) if mov['custo_unitario'] is not None else None,
+                 mov['data_movimentacao'])
+                for mov in descomprimir(arquivo)
+            )
+        return movimentos
+
+    def _calcular(self, movimentos, custos_cadastro):
+        if not movimentos:
+            return [], []
+
+        produto_ids, tipos, quantidades, custos, datas = zip(*movimentos)
+        produto = np.array(produto_ids, dtype=np.int64)
+        quantidade = np.array(quantidades, dtype=np.int64)
+        entrada = np.array([tipo == 'ENTRADA' for tipo in tipos])
+        custo = np.array([
+            float(c if c is not None else custos_cadastro[p]) for p, c in zip(produto_ids, custos)
+        ])
+
+        # Grupos contíguos por produto (a consulta já vem ordenada)
+        inicios = np.flatnonzero(np.r_[True, produto[1:] != produto[:-1]])
+        tamanhos = np.diff(np.r_[inicios, len(produto)])
+
+        def acumulado_no_grupo(valores):
+            soma = np.cumsum(valores)
+            antes_do_grupo = soma[inicios] - valores[inicios]
+            return soma - np.repeat(antes_do_grupo, tamanhos)
+
+        efeito = np.where(entrada, quantidade, -quantidade)
+        saldo_depois = acumulado_no_grupo(efeito)
+        saldo_antes = saldo_depois - efeito
+
+        # PEPS: as saídas consomem, na ordem, as primeiras O unidades que entraram no produto
+        entradas = np.where(entrada, quantidade, 0)
+        entradas_acumuladas = acumulado_no_grupo(entradas)
+        saidas_no_grupo = np.add.reduceat(np.where(entrada, 0, quantidade), inicios)
+        restante = np.clip(entradas_acumuladas - np.repeat(saidas_no_grupo, tamanhos), 0, entradas)
+        valor_fifo = np.add.reduceat(restante * custo, inicios)
+        pendente = np.maximum(saidas_no_grupo - np.add.reduceat(entradas, inicios), 0)
+
+        # Custo médio: em cada entrada, medio = a * medio_anterior + b (saídas não mudam o médio)
+        base = np.maximum(saldo_antes, 0)
+        divisor = np.where(entrada, base + quantidade, 1)
+        peso_anterior = np.where(entrada, base / divisor, 1.0)
+        parcela = np.where(entrada, quantidade * custo / divisor, 0.0)
+
+        estados = []
+        for indice, (inicio, tamanho) in enumerate(zip(inicios, tamanhos)):
+            fim = inicio + tamanho
+            a, b = peso_anterior[inicio:fim], parcela[inicio:fim]
+            # Produto dos pesos posteriores a cada movimento (sufixo exclusivo)
+            posteriores = np.r_[np.cumprod(a[::-1])[::-1][1:], 1.0]
+            custo_medio = _decimal((b * posteriores).sum(), CASAS_CUSTO)
+            saldo = int(saldo_depois[fim - 1])
+
+            estados.append(ValorizacaoEstoque(
+                produto_id=int(produto[inicio]),
+                quantidade=saldo,
+                custo_medio=custo_medio,
+                valor_medio=(max(saldo, 0) * custo_medio).quantize(CENTAVO),
+                valor_fifo=_decimal(valor_fifo[indice], CENTAVO),
+                fifo_pendente=int(pendente[indice]),
+            ))
+
+        camadas = [
+            CamadaCustoFIFO(
+                produto_id=int(produto[i]),
+                custo_unitario=_decimal(custo[i], CASAS_CUSTO),
+                quantidade_inicial=int(quantidade[i]),
+                quantidade_restante=int(restante[i]),
+                data_entrada=datas[i],
+            )
+            for i in np.flatnonzero(restante > 0)
+        ]
+        return estados, camadas
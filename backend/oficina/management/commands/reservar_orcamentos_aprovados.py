@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from oficina.estoque import reservar_orcamento
+from oficina.models import Orcamento
+
+
+class Command(BaseCommand):
+    help = (
+        "Reserva as peças de orçamentos APROVADO aprovados antes das reservas existirem: os que têm OS "
+        "ainda aberta (sem baixa de estoque) e nenhuma reserva. Reserva o que houver disponível, do "
+        "orçamento mais antigo para o mais novo. Pode ser rodado de novo: quem já tem reserva é ignorado."
+    )
+
+    def handle(self, *args, **options):
+        orcamentos = (
+            Orcamento.objects.filter(
+                status='APROVADO', ordemservico__estoque_baixado=False, reservas__isnull=True
+            )
+            .exclude(ordemservico__status__in=['CONCLUIDA', 'CANCELADA'])
+            .order_by('pk')
+        )
+
+        reservados = incompletos = 0
+        for orcamento in orcamentos.iterator():
+            faltando = reservar_orcamento(orcamento)
+            reservados += 1
+            if faltando:
+                incompletos += 1
+                pecas = ', '.join(f"produto {produto_id}: faltam {quantidade}" for produto_id, quantidade in faltando.items())
+                self.stderr.write(f"Orçamento #{orcamento.pk}: {pecas}")
+
+        self.stdout.write(
+            f"{reservados} orçamento(s) aprovado(s) reservado(s), {incompletos} sem estoque para todas as peças."
+        )
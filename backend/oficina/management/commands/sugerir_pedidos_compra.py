@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from oficina.previsao import gerar_sugestoes
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula a demanda de cada produto a partir das saídas recentes e grava pedidos de compra "
+        "SUGERIDO para os que chegaram ao ponto de pedido, substituindo as sugestões não confirmadas. "
+        "Agende uma vez por noite; o admin confirma as sugestões em /api/pedidos-compra/sugestoes/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', type=date.fromisoformat, help='Data de referência (padrão: hoje)')
+
+    def handle(self, *args, **options):
+        sugestoes = gerar_sugestoes(options['data'])
+        fornecedores = {pedido.fornecedor_id for pedido in sugestoes}
+        self.stdout.write(
+            f"{len(sugestoes)} pedido(s) sugerido(s) para {len(fornecedores)} fornecedor(es)."
+        )
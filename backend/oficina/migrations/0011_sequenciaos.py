@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0010_chaveidempotencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenciaOS',
+            fields=[
+                ('ano', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('ultimo_numero', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Sequência de OS',
+                'verbose_name_plural': 'Sequências de OS',
+            },
+        ),
+    ]
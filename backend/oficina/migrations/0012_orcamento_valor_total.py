@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 15:40
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def preencher_valor_total(apps, schema_editor):
+    Orcamento = apps.get_model('oficina', 'Orcamento')
+    ItemMovimentacao = apps.get_model('oficina', 'ItemMovimentacao')
+    soma_itens = ItemMovimentacao.objects.filter(orcamento=OuterRef('pk')).values('orcamento').annotate(
+        total=Sum('subtotal')
+    ).values('total')
+    Orcamento.objects.update(
+        valor_total=Coalesce(Subquery(soma_itens), Decimal('0.00'), output_field=models.DecimalField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0011_sequenciaos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orcamento',
+            name='valor_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.RunPython(preencher_valor_total, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+def marcar_concluidas(apps, schema_editor):
+    # OS já concluídas tiveram o estoque baixado pelos sinais antigos
+    OrdemServico = apps.get_model('oficina', 'OrdemServico')
+    OrdemServico.objects.filter(status='CONCLUIDA').update(estoque_baixado=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0012_orcamento_valor_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordemservico',
+            name='estoque_baixado',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(marcar_concluidas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-18 16:45
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def manter_um_alerta_por_produto(apps, schema_editor):
+    # Antes havia uma notificação por baixa; fica aberta só a mais recente de cada produto
+    Notificacao = apps.get_model('oficina', 'Notificacao')
+    mais_recentes = (
+        Notificacao.objects.filter(produto__isnull=False)
+        .values('produto').annotate(ultima=Max('id_notificacao')).values_list('ultima', flat=True)
+    )
+    Notificacao.objects.filter(produto__isnull=False).exclude(
+        id_notificacao__in=list(mais_recentes)
+    ).update(resolvida=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0013_ordemservico_estoque_baixado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacao',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='notificacao',
+            name='estoque_registrado',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificacao',
+            name='resolvida',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(manter_um_alerta_por_produto, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notificacao',
+            constraint=models.UniqueConstraint(condition=models.Q(('resolvida', False)), fields=('produto',), name='notificacao_aberta_por_produto'),
+        ),
+    ]
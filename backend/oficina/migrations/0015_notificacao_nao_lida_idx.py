@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0014_notificacao_alerta_unico'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacao',
+            index=models.Index(condition=models.Q(('lida', False), ('resolvida', False)), fields=['-data_criacao'], name='notificacao_nao_lida_idx'),
+        ),
+    ]
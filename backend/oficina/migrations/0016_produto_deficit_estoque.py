@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 17:30
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0015_notificacao_nao_lida_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='deficit_estoque',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('estoque_minimo'), '-', models.F('estoque_atual')), output_field=models.IntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(condition=models.Q(('deficit_estoque__gt', 0)), fields=['-deficit_estoque'], name='produto_estoque_baixo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(condition=models.Q(('deficit_estoque__gt', 0)), fields=['fornecedor', '-deficit_estoque'], name='produto_forn_estoque_baixo_idx'),
+        ),
+    ]
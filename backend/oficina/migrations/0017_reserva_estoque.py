@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-18 18:00
+
+import django.db.models.deletion
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0016_produto_deficit_estoque'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='estoque_reservado',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='estoque_disponivel',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('estoque_atual'), '-', models.F('estoque_reservado')), output_field=models.IntegerField()),
+        ),
+        migrations.CreateModel(
+            name='ReservaEstoque',
+            fields=[
+                ('id_reserva', models.AutoField(primary_key=True, serialize=False)),
+                ('quantidade', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('ATIVA', 'Ativa'), ('CONSUMIDA', 'Consumida'), ('LIBERADA', 'Liberada')], default='ATIVA', max_length=20)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('orcamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='oficina.orcamento')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='oficina.produto')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Estoque',
+                'verbose_name_plural': 'Reservas de Estoque',
+                'constraints': [models.UniqueConstraint(fields=('orcamento', 'produto'), name='reserva_por_orcamento_produto')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 18:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0017_reserva_estoque'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoEstoqueDiario',
+            fields=[
+                ('id_saldo', models.AutoField(primary_key=True, serialize=False)),
+                ('data', models.DateField()),
+                ('saldo', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'Saldo Diário de Estoque',
+                'verbose_name_plural': 'Saldos Diários de Estoque',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='movimentacaoestoque',
+            index=models.Index(fields=['produto', 'data_movimentacao'], name='movimentacao_produto_data_idx'),
+        ),
+        migrations.AddField(
+            model_name='saldoestoquediario',
+            name='produto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_diarios', to='oficina.produto'),
+        ),
+        migrations.AddConstraint(
+            model_name='saldoestoquediario',
+            constraint=models.UniqueConstraint(fields=('produto', 'data'), name='saldo_diario_por_produto'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-18 19:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0018_saldo_estoque_diario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValorizacaoEstoque',
+            fields=[
+                ('produto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='valorizacao', serialize=False, to='oficina.produto')),
+                ('quantidade', models.IntegerField(default=0)),
+                ('custo_medio', models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=12)),
+                ('valor_medio', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('valor_fifo', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('fifo_pendente', models.PositiveIntegerField(default=0)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Valorização de Estoque',
+                'verbose_name_plural': 'Valorizações de Estoque',
+            },
+        ),
+        migrations.CreateModel(
+            name='CamadaCustoFIFO',
+            fields=[
+                ('id_camada', models.AutoField(primary_key=True, serialize=False)),
+                ('custo_unitario', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('quantidade_inicial', models.PositiveIntegerField()),
+                ('quantidade_restante', models.PositiveIntegerField()),
+                ('data_entrada', models.DateTimeField(default=django.utils.timezone.now)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='camadas_custo', to='oficina.produto')),
+            ],
+            options={
+                'verbose_name': 'Camada de Custo (PEPS)',
+                'verbose_name_plural': 'Camadas de Custo (PEPS)',
+                'indexes': [models.Index(condition=models.Q(('quantidade_restante__gt', 0)), fields=['produto', 'id_camada'], name='camada_fifo_aberta_idx')],
+            },
+        ),
+    ]
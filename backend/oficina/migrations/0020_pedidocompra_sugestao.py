@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0019_valorizacao_estoque'),
+        ('usuarios', '0003_fornecedor_prazo_entrega_dias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedidocompra',
+            name='lote_sugestao',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pedidocompra',
+            name='status',
+            field=models.CharField(choices=[('SUGERIDO', 'Sugerido'), ('PENDENTE', 'Pendente'), ('APROVADO', 'Aprovado'), ('REJEITADO', 'Rejeitado'), ('ENTREGUE', 'Entregue')], default='PENDENTE', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='pedidocompra',
+            index=models.Index(fields=['status', 'fornecedor'], name='pedido_status_fornecedor_idx'),
+        ),
+    ]
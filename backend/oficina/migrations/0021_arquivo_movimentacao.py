@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0020_pedidocompra_sugestao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoMovimentacao',
+            fields=[
+                ('id_arquivo', models.AutoField(primary_key=True, serialize=False)),
+                ('periodo', models.DateField(help_text='Primeiro dia do mês arquivado')),
+                ('quantidade_entrada', models.IntegerField(default=0)),
+                ('quantidade_saida', models.IntegerField(default=0)),
+                ('total_movimentos', models.PositiveIntegerField(default=0)),
+                ('movimentos', models.BinaryField()),
+                ('data_arquivamento', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Arquivo de Movimentações',
+                'verbose_name_plural': 'Arquivos de Movimentações',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='movimentacaoestoque',
+            index=models.Index(fields=['data_movimentacao'], name='movimentacao_data_idx'),
+        ),
+        migrations.AddField(
+            model_name='arquivomovimentacao',
+            name='produto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='arquivos_movimentacao', to='oficina.produto'),
+        ),
+        migrations.AddIndex(
+            model_name='arquivomovimentacao',
+            index=models.Index(fields=['periodo', 'produto'], name='arquivo_periodo_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='arquivomovimentacao',
+            constraint=models.UniqueConstraint(fields=('produto', 'periodo'), name='arquivo_movimentacao_por_periodo'),
+        ),
+    ]
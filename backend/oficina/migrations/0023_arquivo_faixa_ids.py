@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 23:50
+
+import json
+import zlib
+
+from django.db import migrations, models
+
+
+def preencher_faixas(apps, schema_editor):
+    # O id é a primeira coluna de cada movimentação comprimida (ver arquivo.CAMPOS)
+    ArquivoMovimentacao = apps.get_model('oficina', 'ArquivoMovimentacao')
+    for arquivo in ArquivoMovimentacao.objects.filter(id_minimo__isnull=True).iterator():
+        ids = [linha[0] for linha in json.loads(zlib.decompress(bytes(arquivo.movimentos)))]
+        if ids:
+            ArquivoMovimentacao.objects.filter(pk=arquivo.pk).update(id_minimo=min(ids), id_maximo=max(ids))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0022_email_pendente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arquivomovimentacao',
+            name='id_minimo',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='arquivomovimentacao',
+            name='id_maximo',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(preencher_faixas, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='arquivomovimentacao',
+            index=models.Index(fields=['id_maximo', 'id_minimo'], name='arquivo_faixa_ids_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from usuarios.models import Fornecedor
 from decimal import Decimal
@@ -14,7 +15,29 @@ class Produto(models.Model):
     preco_venda = models.DecimalField(max_digits=10, decimal_places=2)
     estoque_minimo = models.IntegerField(default=0)
     estoque_atual = models.IntegerField(default=0)
+    # Unidades reservadas para orçamentos aprovados (contador mantido por estoque.py)
+    estoque_reservado = models.IntegerField(default=0, editable=False)
+    estoque_disponivel = models.GeneratedField(
+        expression=models.F('estoque_atual') - models.F('estoque_reservado'),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
     data_cadastro = models.DateTimeField(auto_now_add=True)
+    # Quanto falta para o mínimo (> 0 = estoque baixo), calculado pelo próprio banco
+    deficit_estoque = models.GeneratedField(
+        expression=models.F('estoque_minimo') - models.F('estoque_atual'),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # estoque_reservado só muda por UPDATE atômico; uma edição do cadastro não pode sobrescrevê-lo
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and not f.generated and f.name != 'estoque_reservado'
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.nome} - {self.fornecedor.nome}"
@@ -23,6 +46,16 @@ class Produto(models.Model):
         verbose_name = "Produto"
         verbose_name_plural = "Produtos"
         ordering = ['-data_cadastro']
+        indexes = [
+            # Índices parciais: só os produtos em falta entram, já na ordem de gravidade (PB10)
+            models.Index(
+                fields=['-deficit_estoque'], condition=models.Q(deficit_estoque__gt=0), name='produto_estoque_baixo_idx'
+            ),
+            models.Index(
+                fields=['fornecedor', '-deficit_estoque'], condition=models.Q(deficit_estoque__gt=0),
+                name='produto_forn_estoque_baixo_idx'
+            ),
+        ]
 
 # --- Orçamento ---
 class Orcamento(models.Model):
@@ -45,20 +78,26 @@ class Orcamento(models.Model):
     agendamento = models.ForeignKey('veiculos.Agendamento', on_delete=models.SET_NULL, null=True, blank=True, related_name='orcamentos')  # <--- ADICIONE
     checklist = models.ForeignKey('Checklist', on_delete=models.SET_NULL, null=True, blank=True, related_name='orcamentos')  # <--- ADICIONE
 
+    # Mantido pelos sinais de ItemMovimentacao (delta a cada inclusão/alteração/remoção)
+    valor_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # valor_total só muda pelos sinais dos itens; uma instância antiga não pode sobrescrevê-lo
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'valor_total'
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Orçamento #{self.id_orcamento}"
 
     def calcular_total(self):
-        from decimal import Decimal
-        total = self.itens.aggregate(
-            total=models.Sum(models.F('quantidade') * models.F('valor_unitario'))
-        )['total']
+        """Soma os itens direto no banco (usado para conferir/reconstruir valor_total)"""
+        total = self.itens.aggregate(total=models.Sum('subtotal'))['total']
         return total or Decimal('0.00')
 
-    @property
-    def valor_total(self):
-        return self.calcular_total()
-
 # --- Ordem de Serviço (OS) ---
 class OrdemServico(models.Model):
     STATUS_CHOICES = [
@@ -74,6 +113,8 @@ class OrdemServico(models.Model):
     data_abertura = models.DateTimeField(auto_now_add=True)  # <--- Este é o campo correto
     data_conclusao = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='AGUARDANDO_INICIO')
+    # Marcado na conclusão, na mesma transação que baixa as peças (evita baixa dupla)
+    estoque_baixado = models.BooleanField(default=False, editable=False)
     
     # Relacionamento interno no mesmo app
     orcamento = models.OneToOneField(Orcamento, on_delete=models.SET_NULL, null=True, blank=True)
@@ -82,9 +123,34 @@ class OrdemServico(models.Model):
     veiculo = models.ForeignKey('veiculos.Veiculo', on_delete=models.PROTECT)
     mecanico_responsavel = models.ForeignKey('usuarios.Mecanico', on_delete=models.PROTECT)
 
+    def save(self, *args, **kwargs):
+        if not self.numero_os:
+            from .numeracao import proximo_numero_os
+            self.numero_os = proximo_numero_os()
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # estoque_baixado só é gravado pela conclusão; uma instância antiga não pode desmarcá-lo
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'estoque_baixado'
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"OS #{self.numero_os}"
 
+
+class SequenciaOS(models.Model):
+    """Contador anual usado para numerar as Ordens de Serviço (ver oficina/numeracao.py)"""
+    ano = models.PositiveIntegerField(primary_key=True)
+    ultimo_numero = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Sequência de OS {self.ano}: {self.ultimo_numero}"
+
+    class Meta:
+        verbose_name = 'Sequência de OS'
+        verbose_name_plural = 'Sequências de OS'
+
 # --- Itens (Tabela unificada) ---
 class ItemMovimentacao(models.Model):
     id_item = models.AutoField(primary_key=True)
@@ -105,6 +171,35 @@ class ItemMovimentacao(models.Model):
         self.subtotal = self.quantidade * self.valor_unitario
         super().save(*args, **kwargs)
 
+class ReservaEstoque(models.Model):
+    """
+    Peças de um orçamento aprovado separadas no estoque (ver estoque.reservar_orcamento).
+    Enquanto ATIVA, a quantidade conta em Produto.estoque_reservado.
+    """
+    STATUS_CHOICES = [
+        ('ATIVA', 'Ativa'),
+        ('CONSUMIDA', 'Consumida'),  # OS concluída: virou saída de estoque
+        ('LIBERADA', 'Liberada'),    # OS cancelada: voltou a ficar disponível
+    ]
+
+    id_reserva = models.AutoField(primary_key=True)
+    orcamento = models.ForeignKey(Orcamento, on_delete=models.CASCADE, related_name='reservas')
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='reservas')
+    quantidade = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ATIVA')
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Reserva de {self.quantidade}x {self.produto.nome} (Orçamento #{self.orcamento_id})"
+
+    class Meta:
+        verbose_name = 'Reserva de Estoque'
+        verbose_name_plural = 'Reservas de Estoque'
+        constraints = [
+            models.UniqueConstraint(fields=['orcamento', 'produto'], name='reserva_por_orcamento_produto'),
+        ]
+
 # --- Satélites (Checklist e Laudo) ---
 class Checklist(models.Model):
     id_checklist = models.AutoField(primary_key=True)
@@ -173,9 +268,24 @@ class Notificacao(models.Model):
     produto = models.ForeignKey(Produto, on_delete=models.SET_NULL, null=True, blank=True, related_name='notificacoes')
     lida = models.BooleanField(default=False)
     data_criacao = models.DateTimeField(auto_now_add=True)
+    # Alerta de estoque baixo: um aberto por produto, atualizado no lugar (ver alertas.py)
+    estoque_registrado = models.IntegerField(null=True, blank=True)
+    resolvida = models.BooleanField(default=False)
+    data_atualizacao = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-data_criacao']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['produto'], condition=models.Q(resolvida=False), name='notificacao_aberta_por_produto'
+            ),
+        ]
+        indexes = [
+            # Lista/contagem de não lidas (?nao_lidas=true, notificacoes/contagem/)
+            models.Index(
+                fields=['-data_criacao'], condition=models.Q(lida=False, resolvida=False), name='notificacao_nao_lida_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"Notificação: {self.mensagem[:50]}..."
@@ -202,18 +312,21 @@ class MovimentacaoEstoque(models.Model):
     ordem_servico = models.ForeignKey('OrdemServico', on_delete=models.SET_NULL, null=True, blank=True, related_name='movimentacoes')
 
     def save(self, *args, **kwargs):
-        """Atualiza o estoque automaticamente ao salvar"""
-        if not self.pk:  # Apenas na criação (não ao editar)
-            if self.tipo_movimentacao == 'ENTRADA':
-                self.produto.estoque_atual += self.quantidade
-            elif self.tipo_movimentacao == 'SAIDA':
-                if self.produto.estoque_atual < self.quantidade:
-                    raise ValueError(f"Estoque insuficiente para {self.produto.nome}. Disponível: {self.produto.estoque_atual}")
-                self.produto.estoque_atual -= self.quantidade
-            
-            self.produto.save()
-        
-        super().save(*args, **kwargs)
+        """
+        Atualiza o estoque automaticamente ao salvar.
+        O delta é aplicado no banco com UPDATE condicional e a linha do histórico
+        é gravada na mesma transação (saída sem saldo levanta EstoqueInsuficiente).
+        """
+        if self.pk:  # Apenas na criação (não ao editar)
+            return super().save(*args, **kwargs)
+
+        from .estoque import aplicar_movimentacao
+        from .valorizacao import registrar_movimentos
+
+        with transaction.atomic():
+            aplicar_movimentacao(self.produto, self.tipo_movimentacao, self.quantidade)
+            super().save(*args, **kwargs)
+            registrar_movimentos([self])
 
     def __str__(self):
         return f"{self.tipo_movimentacao} - {self.produto.nome} ({self.quantidade}un) - {self.data_movimentacao.strftime('%d/%m/%Y %H:%M')}"
@@ -222,6 +335,112 @@ class MovimentacaoEstoque(models.Model):
         ordering = ['-data_movimentacao']
         verbose_name = 'Movimentação de Estoque'
         verbose_name_plural = 'Movimentações de Estoque'
+        indexes = [
+            # Movimentos de um produto num intervalo (saldo histórico a partir do fechamento, ver saldos.py)
+            models.Index(fields=['produto', 'data_movimentacao'], name='movimentacao_produto_data_idx'),
+            # Listagem por período sem produto (MovimentacaoEstoqueViewSet)
+            models.Index(fields=['data_movimentacao'], name='movimentacao_data_idx'),
+        ]
+
+
+class ArquivoMovimentacao(models.Model):
+    """
+    Arquivo frio do histórico: as movimentações de um produto em um mês já
+    encerrado, comprimidas em uma única linha (ver arquivo.py). Os totais ficam
+    em colunas para o saldo e a reconciliação não precisarem descomprimir.
+    """
+    id_arquivo = models.AutoField(primary_key=True)
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='arquivos_movimentacao')
+    periodo = models.DateField(help_text="Primeiro dia do mês arquivado")
+    quantidade_entrada = models.IntegerField(default=0)
+    quantidade_saida = models.IntegerField(default=0)
+    total_movimentos = models.PositiveIntegerField(default=0)
+    # Faixa de id_movimentacao do conteúdo: acha a linha de uma movimentação arquivada
+    id_minimo = models.IntegerField(null=True, blank=True)
+    id_maximo = models.IntegerField(null=True, blank=True)
+    movimentos = models.BinaryField()
+    data_arquivamento = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.produto.nome} - {self.periodo:%m/%Y} ({self.total_movimentos} movimentações)"
+
+    class Meta:
+        verbose_name = 'Arquivo de Movimentações'
+        verbose_name_plural = 'Arquivos de Movimentações'
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'periodo'], name='arquivo_movimentacao_por_periodo'),
+        ]
+        indexes = [
+            models.Index(fields=['periodo', 'produto'], name='arquivo_periodo_idx'),
+            models.Index(fields=['id_maximo', 'id_minimo'], name='arquivo_faixa_ids_idx'),
+        ]
+
+
+class ValorizacaoEstoque(models.Model):
+    """
+    Valor do estoque de um produto, mantido a cada movimentação (ver valorizacao.py).
+    Guarda o custo médio ponderado e o total das camadas PEPS (FIFO) em aberto.
+    """
+    produto = models.OneToOneField(Produto, on_delete=models.CASCADE, primary_key=True, related_name='valorizacao')
+    quantidade = models.IntegerField(default=0)
+    custo_medio = models.DecimalField(max_digits=12, decimal_places=4, default=Decimal('0'))
+    valor_medio = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    valor_fifo = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    # Unidades que saíram sem camada para consumir; as próximas entradas as cobrem primeiro
+    fifo_pendente = models.PositiveIntegerField(default=0)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Valorização de {self.produto.nome}: {self.quantidade}un"
+
+    class Meta:
+        verbose_name = 'Valorização de Estoque'
+        verbose_name_plural = 'Valorizações de Estoque'
+
+
+class CamadaCustoFIFO(models.Model):
+    """Lote de entrada ainda não consumido, na ordem de chegada (PEPS)"""
+    id_camada = models.AutoField(primary_key=True)
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='camadas_custo')
+    custo_unitario = models.DecimalField(max_digits=12, decimal_places=4)
+    quantidade_inicial = models.PositiveIntegerField()
+    quantidade_restante = models.PositiveIntegerField()
+    data_entrada = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.quantidade_restante}/{self.quantidade_inicial}un de {self.produto.nome} a {self.custo_unitario}"
+
+    class Meta:
+        verbose_name = 'Camada de Custo (PEPS)'
+        verbose_name_plural = 'Camadas de Custo (PEPS)'
+        indexes = [
+            models.Index(
+                fields=['produto', 'id_camada'], condition=models.Q(quantidade_restante__gt=0),
+                name='camada_fifo_aberta_idx'
+            ),
+        ]
+
+
+class SaldoEstoqueDiario(models.Model):
+    """
+    Fechamento diário do estoque: saldo do produto ao fim do dia `data`.
+    Gravado pelo comando fechar_estoque_diario; serve de ponto de partida para
+    consultar o saldo em uma data sem somar o histórico inteiro (ver saldos.py).
+    """
+    id_saldo = models.AutoField(primary_key=True)
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='saldos_diarios')
+    data = models.DateField()
+    saldo = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.produto.nome} em {self.data:%d/%m/%Y}: {self.saldo}"
+
+    class Meta:
+        verbose_name = 'Saldo Diário de Estoque'
+        verbose_name_plural = 'Saldos Diários de Estoque'
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'data'], name='saldo_diario_por_produto'),
+        ]
 
 # --- Pedido de Compra ---
 class PedidoCompra(models.Model):
@@ -229,6 +448,7 @@ class PedidoCompra(models.Model):
     Pedido de compra feito pela Oficina (Admin) ao Fornecedor
     """
     STATUS_CHOICES = [
+        ('SUGERIDO', 'Sugerido'),  # Gerado pela previsão de demanda, aguardando confirmação do Admin
         ('PENDENTE', 'Pendente'),
         ('APROVADO', 'Aprovado'),
         ('REJEITADO', 'Rejeitado'),
@@ -245,6 +465,8 @@ class PedidoCompra(models.Model):
     data_pedido = models.DateTimeField(auto_now_add=True)
     data_aprovacao = models.DateTimeField(null=True, blank=True)
     observacao = models.TextField(blank=True, null=True)
+    # Dia da rodada de previsão que gerou a sugestão (só para status SUGERIDO)
+    lote_sugestao = models.DateField(null=True, blank=True)
 
     def save(self, *args, **kwargs):
         self.valor_total = self.quantidade * self.valor_unitario
@@ -256,4 +478,65 @@ class PedidoCompra(models.Model):
     class Meta:
         ordering = ['-data_pedido']
         verbose_name = 'Pedido de Compra'
-        verbose_name_plural = 'Pedidos de Compra'
\ No newline at end of file
+        verbose_name_plural = 'Pedidos de Compra'
+        indexes = [
+            models.Index(fields=['status', 'fornecedor'], name='pedido_status_fornecedor_idx'),
+        ]
+
+# --- Idempotência (retentativas dos terminais) ---
+class ChaveIdempotencia(models.Model):
+    """
+    Resposta guardada de um POST enviado com o cabeçalho Idempotency-Key.
+    A chave é o hash de (usuário, rota, Idempotency-Key) e a impressão digital
+    é o hash do corpo, para recusar a mesma chave reutilizada com outro conteúdo.
+    """
+    chave = models.CharField(max_length=64, primary_key=True)
+    impressao_digital = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    resposta = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    expira_em = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Idempotency-Key {self.chave[:12]}... ({self.status_code})"
+
+    class Meta:
+        verbose_name = 'Chave de Idempotência'
+        verbose_name_plural = 'Chaves de Idempotência'
+
+# --- Caixa de saída de e-mails (ver oficina/emails.py) ---
+class EmailPendente(models.Model):
+    """
+    E-mail gravado na mesma transação que o originou e enviado fora da requisição.
+    Falhas voltam para a fila com espera crescente até EMAIL_MAX_TENTATIVAS.
+    """
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('ENVIADO', 'Enviado'),
+        ('FALHOU', 'Falhou'),
+    ]
+
+    id_email = models.AutoField(primary_key=True)
+    assunto = models.CharField(max_length=255)
+    mensagem = models.TextField()
+    remetente = models.CharField(max_length=254)
+    destinatarios = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    ultimo_erro = models.TextField(blank=True)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_envio = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"E-mail #{self.id_email} - {self.assunto} ({self.status})"
+
+    class Meta:
+        ordering = ['-data_criacao']
+        verbose_name = 'E-mail Pendente'
+        verbose_name_plural = 'E-mails Pendentes'
+        indexes = [
+            # Fila do despacho: só os pendentes, na ordem em que vencem
+            models.Index(
+                fields=['proxima_tentativa'], condition=models.Q(status='PENDENTE'), name='email_pendente_fila_idx'
+            ),
+        ]
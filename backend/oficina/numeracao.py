@@ -0,0 +1,62 @@
+"""
+Numeração das Ordens de Serviço (PB08).
+
+Cada ano tem uma linha em SequenciaOS e os números são reservados com um
+UPDATE atômico do contador (`ultimo_numero = ultimo_numero + N`): custo
+constante, sem varrer as OS existentes e sem números repetidos entre
+aprovações simultâneas. O número tem o formato AAAA-NNNNNN, então a ordem
+alfabética coincide com a ordem de emissão.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SequenciaOS
+
+
+def formatar_numero_os(ano, numero):
+    return f"{ano}-{numero:06d}"
+
+
+def _incrementar(ano, quantidade):
+    """Soma `quantidade` ao contador do ano e devolve o novo valor (None se a linha não existe)"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {SequenciaOS._meta.db_table} SET ultimo_numero = ultimo_numero + %s "
+                "WHERE ano = %s RETURNING ultimo_numero",
+                [quantidade, ano],
+            )
+            linha = cursor.fetchone()
+        return linha[0] if linha else None
+
+    contador = SequenciaOS.objects.filter(ano=ano)
+    if not contador.update(ultimo_numero=F('ultimo_numero') + quantidade):
+        return None
+    return contador.values_list('ultimo_numero', flat=True).get()
+
+
+def reservar_numeros_os(quantidade=1, ano=None):
+    """
+    Reserva um bloco contíguo de `quantidade` números de OS e devolve a lista formatada.
+    A linha do contador fica travada até o fim da transação de quem chamou, então
+    use dentro da mesma transação que cria as OS.
+    """
+    ano = ano or timezone.localdate().year
+
+    with transaction.atomic():
+        ultimo = _incrementar(ano, quantidade)
+        if ultimo is None:
+            try:
+                with transaction.atomic():
+                    SequenciaOS.objects.create(ano=ano, ultimo_numero=quantidade)
+                ultimo = quantidade
+            except IntegrityError:
+                # Outra transação criou o contador do ano ao mesmo tempo
+                ultimo = _incrementar(ano, quantidade)
+
+    return [formatar_numero_os(ano, numero) for numero in range(ultimo - quantidade + 1, ultimo + 1)]
+
+
+def proximo_numero_os():
+    return reservar_numeros_os(1)[0]
@@ -0,0 +1,117 @@
+"""
+Previsão de demanda e sugestão de pedidos de compra.
+
+As saídas de consumo (SAIDA de venda ou de OS) dos últimos PREVISAO_JANELA_DIAS
+viram uma matriz produtos x dias e todas as contas são feitas de uma vez com
+NumPy. Outras saídas (aprovação de pedido ao fornecedor, ajustes da
+reconciliação) não são demanda: contá-las faria cada compra aumentar a próxima.
+
+
+- demanda diária média (d) e desvio padrão (σ) de cada produto;
+- ponto de pedido = d·L + z·σ·√L, com L = prazo de entrega do fornecedor;
+- se a posição (disponível + pedidos em aberto) está no ponto de pedido ou
+  abaixo, sugere comprar até ponto de pedido + d·PREVISAO_COBERTURA_DIAS.
+
+As sugestões são gravadas como PedidoCompra SUGERIDO (um bulk_create), ordenadas
+por fornecedor, e substituem as sugestões ainda não confirmadas da rodada anterior.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Produto, MovimentacaoEstoque, PedidoCompra
+from .saldos import fim_do_dia
+
+
+def _matriz_de_saidas(indice_produto, inicio, dias):
+    """Matriz (produtos x dias) com as unidades consumidas (vendas e OS) de cada produto em cada dia"""
+    saidas = (
+        MovimentacaoEstoque.objects
+        .filter(tipo_movimentacao='SAIDA', data_movimentacao__gte=fim_do_dia(inicio - timedelta(days=1)))
+        .filter(Q(venda__isnull=False) | Q(ordem_servico__isnull=False))
+        .filter(data_movimentacao__lt=fim_do_dia(inicio + timedelta(days=dias - 1)))
+        .annotate(dia=TruncDate('data_movimentacao'))
+        .values_list('produto_id', 'dia')
+        .annotate(total=Sum('quantidade'))
+        .order_by()
+    )
+    matriz = np.zeros((len(indice_produto), dias))
+    linhas, colunas, totais = [], [], []
+    for produto_id, dia, total in saidas:
+        linha = indice_produto.get(produto_id)
+        if linha is not None:
+            linhas.append(linha)
+            colunas.append((dia - inicio).days)
+            totais.append(total)
+    np.add.at(matriz, (np.array(linhas, dtype=np.int64), np.array(colunas, dtype=np.int64)), totais)
+    return matriz
+
+
+def calcular_sugestoes(hoje=None):
+    """
+    Calcula as sugestões para todos os produtos e devolve a lista de PedidoCompra
+    (ainda não gravados), ordenada por fornecedor.
+    """
+    hoje = hoje or timezone.localdate()
+    dias = settings.PREVISAO_JANELA_DIAS
+    inicio = hoje - timedelta(days=dias)
+
+    produtos = list(
+        Produto.objects.order_by('fornecedor_id', 'pk')
+        .values_list('pk', 'fornecedor_id', 'custo', 'estoque_disponivel', 'fornecedor__prazo_entrega_dias')
+    )
+    if not produtos:
+        return []
+    ids, fornecedores, custos, disponivel, prazos = zip(*produtos)
+    indice_produto = {produto_id: linha for linha, produto_id in enumerate(ids)}
+
+    em_aberto = np.zeros(len(ids))
+    pedidos = (
+        PedidoCompra.objects.filter(status='PENDENTE')
+        .values_list('produto_id').annotate(total=Sum('quantidade')).order_by()
+    )
+    for produto_id, total in pedidos:
+        em_aberto[indice_produto[produto_id]] = total
+
+    saidas = _matriz_de_saidas(indice_produto, inicio, dias)
+    demanda = saidas.mean(axis=1)
+    desvio = saidas.std(axis=1, ddof=1) if dias > 1 else np.zeros(len(ids))
+    prazo = np.array(prazos, dtype=float)
+
+    ponto_pedido = demanda * prazo + settings.PREVISAO_NIVEL_SERVICO_Z * desvio * np.sqrt(prazo)
+    alvo = ponto_pedido + demanda * settings.PREVISAO_COBERTURA_DIAS
+    posicao = np.array(disponivel, dtype=float) + em_aberto
+    quantidade = np.ceil(alvo - posicao).astype(np.int64)
+    sugerir = (demanda > 0) & (posicao <= ponto_pedido) & (quantidade > 0)
+
+    sugestoes = []
+    for linha in np.flatnonzero(sugerir):
+        custo = custos[linha]
+        sugestoes.append(PedidoCompra(
+            produto_id=ids[linha],
+            fornecedor_id=fornecedores[linha],
+            quantidade=int(quantidade[linha]),
+            valor_unitario=custo,
+            valor_total=custo * int(quantidade[linha]),  # bulk_create não passa pelo save()
+            status='SUGERIDO',
+            lote_sugestao=hoje,
+            observacao=(
+                f'Sugestão automática: demanda média {demanda[linha]:.2f}/dia (desvio {desvio[linha]:.2f}), '
+                f'prazo {int(prazo[linha])} dias, ponto de pedido {ponto_pedido[linha]:.1f}, '
+                f'posição atual {posicao[linha]:.0f}.'
+            ),
+        ))
+    return sugestoes
+
+
+def gerar_sugestoes(hoje=None):
+    """Substitui as sugestões não confirmadas pelas da rodada atual; devolve as gravadas"""
+    sugestoes = calcular_sugestoes(hoje)
+    with transaction.atomic():
+        PedidoCompra.objects.filter(status='SUGERIDO').delete()
+        return PedidoCompra.objects.bulk_create(sugestoes, batch_size=5000)
@@ -0,0 +1,146 @@
+"""
+Saldo histórico do estoque (PB11).
+
+O histórico (MovimentacaoEstoque) só cresce, então "quantas unidades havia na
+data D?" não deve somar o histórico inteiro. Cada dia fechado grava em
+SaldoEstoqueDiario o saldo dos produtos que se movimentaram no dia (a tabela
+cresce com os movimentos, não com produtos × dias); a consulta parte do
+fechamento mais próximo do produto e soma apenas os movimentos entre ele e a
+data pedida.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Case, When, F, OuterRef, Subquery, Sum, IntegerField
+from django.utils import timezone
+
+from .models import Produto, MovimentacaoEstoque, SaldoEstoqueDiario
+from .arquivo import arquivos_no_intervalo, efeito_arquivado, instante, limite_arquivamento
+
+TAMANHO_LOTE = 5000
+
+# Efeito de cada movimento no saldo: ENTRADA soma, SAIDA subtrai
+EFEITO_NO_SALDO = Sum(Case(
+    When(tipo_movimentacao='ENTRADA', then=F('quantidade')),
+    default=-F('quantidade'),
+    output_field=IntegerField(),
+))
+
+
+def fim_do_dia(data):
+    """Instante em que o dia `data` termina (início do dia seguinte, no fuso da oficina)"""
+    return timezone.make_aware(datetime.combine(data + timedelta(days=1), time.min))
+
+
+def _movimentos_no_intervalo(produto_ids, inicio=None, fim=None):
+    """{produto_id: efeito líquido} dos movimentos em [inicio, fim)"""
+    movimentos = MovimentacaoEstoque.objects.filter(produto_id__in=produto_ids)
+    if inicio is not None:
+        movimentos = movimentos.filter(data_movimentacao__gte=inicio)
+    if fim is not None:
+        movimentos = movimentos.filter(data_movimentacao__lt=fim)
+    efeito = dict(movimentos.values_list('produto_id').annotate(efeito=EFEITO_NO_SALDO).order_by())
+
+    # Meses antigos podem estar no arquivo frio (ver arquivo.py)
+    if inicio is not None and inicio >= instante(limite_arquivamento()):
+        return efeito
+    for produto_id, arquivado in efeito_arquivado(produto_ids, inicio, fim).items():
+        efeito[produto_id] = efeito.get(produto_id, 0) + arquivado
+    return efeito
+
+
+def _produtos_movimentados(inicio, fim):
+    """Produtos com algum movimento em [inicio, fim), em ordem de pk"""
+    ids = set(
+        MovimentacaoEstoque.objects.filter(data_movimentacao__gte=inicio, data_movimentacao__lt=fim)
+        .order_by().values_list('produto_id', flat=True).distinct()
+    )
+    if inicio < instante(limite_arquivamento()):
+        # Dia de um mês já arquivado: entram os produtos com movimento no mês (a mais não erra o saldo)
+        ids.update(arquivos_no_intervalo(inicio, fim).values_list('produto_id', flat=True))
+    return sorted(ids)
+
+
+def fechar_dia(data):
+    """
+    Grava (ou regrava) o saldo ao fim de `data` dos produtos que tiveram
+    movimento no dia; os parados continuam valendo pelo último fechamento.
+    Cada produto parte do seu fechamento anterior mais recente e só lê os
+    movimentos desde então; sem fechamento anterior (ex.: primeiro movimento),
+    parte do saldo atual descontando os movimentos posteriores. Processa os
+    produtos em lotes. Devolve a quantidade de saldos gravados.
+    """
+    fim = fim_do_dia(data)
+    movidos = _produtos_movimentados(fim_do_dia(data - timedelta(days=1)), fim)
+    ultimo_fechamento = SaldoEstoqueDiario.objects.filter(
+        produto_id=OuterRef('produto_id'), data__lt=data
+    ).order_by('-data').values('data')[:1]
+
+    gravados = 0
+    for inicio_lote in range(0, len(movidos), TAMANHO_LOTE):
+        ids = movidos[inicio_lote:inicio_lote + TAMANHO_LOTE]
+
+        base = {
+            pk: (dia, saldo)
+            for pk, dia, saldo in SaldoEstoqueDiario.objects.filter(
+                produto_id__in=ids, data=Subquery(ultimo_fechamento)
+            ).values_list('produto_id', 'data', 'saldo')
+        }
+        # Uma leitura dos movimentos por data de partida (produtos que moveram juntos tendem a compartilhá-la)
+        por_data = defaultdict(list)
+        for pk, (dia, _) in base.items():
+            por_data[dia].append(pk)
+        desde_base = {}
+        for dia, pks in por_data.items():
+            desde_base.update(_movimentos_no_intervalo(pks, fim_do_dia(dia), fim))
+
+        sem_base = [pk for pk in ids if pk not in base]
+        atuais, depois = {}, {}
+        if sem_base:
+            atuais = dict(Produto.objects.filter(pk__in=sem_base).values_list('pk', 'estoque_atual'))
+            depois = _movimentos_no_intervalo(sem_base, fim)
+
+        saldos = []
+        for pk in ids:
+            if pk in base:
+                saldo = base[pk][1] + desde_base.get(pk, 0)
+            elif pk in atuais:
+                saldo = atuais[pk] - depois.get(pk, 0)
+            else:
+                continue
+            saldos.append(SaldoEstoqueDiario(produto_id=pk, data=data, saldo=saldo))
+
+        with transaction.atomic():
+            SaldoEstoqueDiario.objects.bulk_create(
+                saldos, update_conflicts=True, unique_fields=['produto', 'data'], update_fields=['saldo']
+            )
+        gravados += len(saldos)
+
+    return gravados
+
+
+def saldo_em(produto, data):
+    """
+    Saldo do produto ao fim de `data`, com consultas fixas: o fechamento mais
+    próximo (antes ou depois da data) e a soma dos movimentos entre ele e a data.
+    Sem nenhum fechamento, parte do saldo atual.
+    Devolve (saldo, data do fechamento usado ou None).
+    """
+    fechamentos = SaldoEstoqueDiario.objects.filter(produto=produto)
+    fim = fim_do_dia(data)
+
+    antes = fechamentos.filter(data__lte=data).order_by('-data').values_list('data', 'saldo').first()
+    if antes:
+        data_base, saldo = antes
+        efeito = _movimentos_no_intervalo([produto.pk], fim_do_dia(data_base), fim).get(produto.pk, 0)
+        return saldo + efeito, data_base
+
+    depois = fechamentos.filter(data__gt=data).order_by('data').values_list('data', 'saldo').first()
+    if depois:
+        data_base, saldo = depois
+        efeito = _movimentos_no_intervalo([produto.pk], fim, fim_do_dia(data_base)).get(produto.pk, 0)
+        return saldo - efeito, data_base
+
+    efeito = _movimentos_no_intervalo([produto.pk], fim).get(produto.pk, 0)
+    return produto.estoque_atual - efeito, None
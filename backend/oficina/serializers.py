@@ -1,5 +1,10 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 from .models import Orcamento, ItemMovimentacao, Produto, OrdemServico, Venda, ItemVenda, Checklist, LaudoTecnico, Notificacao, MovimentacaoEstoque, PedidoCompra
+from .estoque import EstoqueInsuficiente, travar_produtos, baixar_em_lote
+from .valorizacao import registrar_movimentos
 from veiculos.models import Servico
 from usuarios.models import Fornecedor
 
@@ -36,7 +41,6 @@ class OrcamentoSerializer(serializers.ModelSerializer):
     veiculo_modelo = serializers.CharField(source='veiculo.modelo', read_only=True)
     mecanico_nome = serializers.CharField(source='mecanico.nome', read_only=True)
     cliente_nome = serializers.CharField(source='cliente.nome', read_only=True)
-    valor_total = serializers.SerializerMethodField()
     checklist_info = serializers.SerializerMethodField()
     agendamento_info = serializers.SerializerMethodField()
 
@@ -51,10 +55,6 @@ class OrcamentoSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['data_criacao', 'valor_total', 'cliente']
 
-    def get_valor_total(self, obj):
-        """Calcula o valor total dos itens do orçamento"""
-        return obj.calcular_total()
-    
     def get_checklist_info(self, obj):
         if obj.checklist:
             return {
@@ -109,7 +109,10 @@ class LaudoTecnicoSerializer(serializers.ModelSerializer):
         return value
 
 class ItemVendaSerializer(serializers.ModelSerializer):
+    # Chave simples: os produtos são buscados de uma vez em VendaSerializer.validate_itens
+    produto = serializers.IntegerField(source='produto_id')
     nome_produto = serializers.ReadOnlyField(source='produto.nome')
+    quantidade = serializers.IntegerField(min_value=1)
     subtotal = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     class Meta:
@@ -128,47 +131,75 @@ class VendaSerializer(serializers.ModelSerializer):
     def validate_itens(self, value):
         if not value or len(value) == 0:
             raise serializers.ValidationError("A venda deve conter pelo menos um item.")
+
+        ids = {item['produto_id'] for item in value}
+        existentes = set(Produto.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        inexistentes = sorted(ids - existentes)
+        if inexistentes:
+            raise serializers.ValidationError(f"Produto(s) inexistente(s): {inexistentes}")
         return value
 
     def create(self, validated_data):
+        """
+        Registra a venda com número fixo de consultas, independente da quantidade de itens:
+        trava os produtos em ordem, valida o estoque em memória e grava itens e
+        histórico com um bulk_create cada.
+        """
         itens_data = validated_data.pop('itens')
-        venda = Venda.objects.create(total=0)
-        
-        total_venda = 0
-        
+
+        quantidades = defaultdict(int)
         for item_data in itens_data:
-            produto = item_data['produto']
-            quantidade = item_data['quantidade']
-            valor_unitario = item_data['valor_unitario']
-            
+            quantidades[item_data['produto_id']] += item_data['quantidade']
+
+        with transaction.atomic():
+            produtos = travar_produtos(quantidades)
+
             # Validação de Estoque (TC07 - Cenário 2)
-            if produto.estoque_atual < quantidade:
+            for produto_id, quantidade in quantidades.items():
+                produto = produtos[produto_id]
+                if produto.estoque_disponivel < quantidade:
+                    raise serializers.ValidationError(
+                        f"Quantidade solicitada superior ao estoque disponível para {produto.nome} (Disponível: {produto.estoque_disponivel})"
+                    )
+
+            itens = [
+                ItemVenda(
+                    produto=produtos[item_data['produto_id']],
+                    quantidade=item_data['quantidade'],
+                    valor_unitario=item_data['valor_unitario'],
+                    subtotal=item_data['quantidade'] * item_data['valor_unitario'],
+                )
+                for item_data in itens_data
+            ]
+            venda = Venda.objects.create(total=sum(item.subtotal for item in itens))
+
+            try:
+                baixar_em_lote(quantidades)
+            except EstoqueInsuficiente as e:
                 raise serializers.ValidationError(
-                    f"Quantidade solicitada superior ao estoque disponível para {produto.nome} (Atual: {produto.estoque_atual})"
+                    f"Quantidade solicitada superior ao estoque disponível para {e.produto.nome} (Disponível: {e.disponivel})"
                 )
-            
-            # ✅ REGISTRA A SAÍDA NO HISTÓRICO (PB11)
-            MovimentacaoEstoque.objects.create(
-                produto=produto,
-                tipo_movimentacao='SAIDA',
-                quantidade=quantidade,
-                observacao=f'Venda Balcão #{venda.id_venda}',
-                venda=venda
-            )
-            # O método save() do MovimentacaoEstoque já abate o estoque automaticamente
-            
-            # Cria item da venda
-            item_venda = ItemVenda.objects.create(
-                venda=venda,
-                produto=produto,
-                quantidade=quantidade,
-                valor_unitario=valor_unitario
-            )
-            total_venda += item_venda.subtotal
-        
-        venda.total = total_venda
-        venda.save()
-        
+
+            for item in itens:
+                item.venda = venda
+            ItemVenda.objects.bulk_create(itens)
+
+            # ✅ REGISTRA A SAÍDA NO HISTÓRICO (PB11) - o saldo já foi baixado acima
+            saidas = MovimentacaoEstoque.objects.bulk_create([
+                MovimentacaoEstoque(
+                    produto=item.produto,
+                    tipo_movimentacao='SAIDA',
+                    quantidade=item.quantidade,
+                    observacao=f'Venda Balcão #{venda.id_venda}',
+                    venda=venda
+                )
+                for item in itens
+            ])
+            registrar_movimentos(saidas)
+
+        # Uma consulta para os itens com os produtos, em vez de uma por produto ao serializar a resposta
+        prefetch_related_objects([venda], Prefetch('itens', queryset=ItemVenda.objects.select_related('produto')))
+
         return venda
 
 class ProdutoSerializer(serializers.ModelSerializer):
@@ -180,9 +211,10 @@ class ProdutoSerializer(serializers.ModelSerializer):
         fields = [
             'id_produto', 'fornecedor', 'fornecedor_nome', 
             'nome', 'descricao', 'custo', 'preco_venda', 
-            'estoque_minimo', 'estoque_atual', 'data_cadastro'
+            'estoque_minimo', 'estoque_atual', 'estoque_reservado', 'estoque_disponivel',
+            'deficit_estoque', 'data_cadastro'
         ]
-        read_only_fields = ['fornecedor', 'data_cadastro']  # Fornecedor é setado automaticamente
+        read_only_fields = ['fornecedor', 'estoque_reservado', 'estoque_disponivel', 'deficit_estoque', 'data_cadastro']  # Fornecedor é setado automaticamente
 
     def validate_preco_venda(self, value):
         """TC05 - Cenário 3: Preço deve ser maior que zero"""
@@ -250,8 +282,11 @@ class NotificacaoSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Notificacao
-        fields = ['id_notificacao', 'mensagem', 'produto', 'produto_nome', 'lida', 'data_criacao']
-        read_only_fields = ['data_criacao']
+        fields = [
+            'id_notificacao', 'mensagem', 'produto', 'produto_nome', 'lida', 'data_criacao',
+            'estoque_registrado', 'resolvida', 'data_atualizacao'
+        ]
+        read_only_fields = ['data_criacao', 'estoque_registrado', 'resolvida', 'data_atualizacao']
 
 class MovimentacaoEstoqueSerializer(serializers.ModelSerializer):
     produto_nome = serializers.ReadOnlyField(source='produto.nome')
@@ -277,6 +312,13 @@ class MovimentacaoEstoqueSerializer(serializers.ModelSerializer):
                 )
         
         return data
+
+    def create(self, validated_data):
+        """A validação acima é só uma prévia; o saldo é conferido de novo no UPDATE condicional"""
+        try:
+            return super().create(validated_data)
+        except EstoqueInsuficiente as e:
+            raise serializers.ValidationError(str(e))
     
 class PedidoCompraSerializer(serializers.ModelSerializer):
     produto_nome = serializers.ReadOnlyField(source='produto.nome')
@@ -1,29 +1,46 @@
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
 from django.dispatch import receiver
 from django.db.models import Sum, F
-from .models import ItemMovimentacao, OrdemServico, Notificacao, MovimentacaoEstoque
+from decimal import Decimal
+from .models import ItemMovimentacao, Orcamento, OrdemServico, Produto, Notificacao
+from .estoque import concluir_ordem_servico, baixar_pecas_da_os, liberar_reservas
+from .alertas import verificar_estoque, invalidar_contagem
+from usuarios.models import Mecanico
+
+def _somar_ao_total(orcamento_id, delta):
+    if orcamento_id and delta:
+        Orcamento.objects.filter(pk=orcamento_id).update(
+            valor_total=F('valor_total') + Decimal(str(delta))
+        )
+
+@receiver(pre_save, sender=ItemMovimentacao)
+def guardar_subtotal_anterior(sender, instance, **kwargs):
+    """Guarda orçamento/subtotal gravados antes da alteração, para calcular o delta"""
+    instance._subtotal_anterior = None
+    if instance.pk:
+        instance._subtotal_anterior = ItemMovimentacao.objects.filter(pk=instance.pk).values_list(
+            'orcamento_id', 'subtotal'
+        ).first()
 
 @receiver(post_save, sender=ItemMovimentacao)
-@receiver(post_delete, sender=ItemMovimentacao)
 def atualizar_total_orcamento(sender, instance, **kwargs):
     """
-    Sempre que um item é adicionado, alterado ou removido,
-    recalcula o valor total do orçamento pai.
+    Sempre que um item é adicionado ou alterado, aplica a diferença
+    no valor_total do orçamento pai (UPDATE ... SET valor_total = valor_total + delta).
     """
-    orcamento = instance.orcamento
-    if orcamento:
-        # Calcula: Soma de (quantidade * valor_unitario) de todos os itens
-        resultado = orcamento.itens.aggregate(
-            total=Sum(F('quantidade') * F('valor_unitario'))
-        )
-        
-        # Se não tiver itens, o resultado é None, então usamos 0.00
-        novo_total = resultado['total'] or 0.00
-        
-        # Atualiza o orçamento apenas se o valor mudou para evitar loop infinito
-        if orcamento.valor_total != novo_total:
-            orcamento.valor_total = novo_total
-            orcamento.save(update_fields=['valor_total'])
+    anterior = getattr(instance, '_subtotal_anterior', None)
+    if anterior and anterior[0] == instance.orcamento_id:
+        _somar_ao_total(instance.orcamento_id, Decimal(str(instance.subtotal)) - anterior[1])
+        return
+
+    if anterior:
+        _somar_ao_total(anterior[0], -anterior[1])
+    _somar_ao_total(instance.orcamento_id, instance.subtotal)
+
+@receiver(post_delete, sender=ItemMovimentacao)
+def descontar_total_orcamento(sender, instance, **kwargs):
+    """Item removido: subtrai o subtotal do orçamento pai"""
+    _somar_ao_total(instance.orcamento_id, -instance.subtotal)
 
 @receiver(post_save, sender=ItemMovimentacao)
 def atualizar_estoque_item_adicionado_apos_conclusao(sender, instance, created, **kwargs):
@@ -32,85 +49,64 @@ def atualizar_estoque_item_adicionado_apos_conclusao(sender, instance, created,
     (o que não deveria acontecer no fluxo normal, mas por segurança),
     devemos baixar o estoque imediatamente.
     """
-    if created and instance.os and instance.os.status == 'CONCLUIDA' and instance.produto:
-         produto = instance.produto
-         produto.estoque_atual -= instance.quantidade
-         produto.save()
-         
-         if produto.estoque_atual < produto.estoque_minimo:
-              Notificacao.objects.create(
-                  mensagem=f"Alerta de Estoque Baixo: O produto '{produto.nome}' está com {produto.estoque_atual} unidades (Mínimo: {produto.estoque_minimo}).",
-                  produto=produto
-              )
+    if created and instance.os and instance.os.estoque_baixado and instance.produto_id:
+        baixar_pecas_da_os(instance.os, {instance.produto_id: instance.quantidade})
 
-@receiver(pre_save, sender=OrdemServico)
+@receiver(post_save, sender=OrdemServico)
 def baixar_estoque_ao_concluir_os(sender, instance, **kwargs):
     """
-    Ao alterar o status da OS para 'CONCLUIDA', baixa o estoque dos itens utilizados.
-    Itens podem vir da própria OS (itens avulsos) ou do Orçamento vinculado.
+    Ao alterar o status da OS para 'CONCLUIDA', baixa o estoque dos itens utilizados
+    (PB11 - TC11 Cenário 1). Toda a lógica fica em estoque.concluir_ordem_servico.
     """
-    if not instance.pk:
-        return
+    if instance.status == 'CONCLUIDA' and not instance.estoque_baixado:
+        concluir_ordem_servico(instance)
+    elif instance.status == 'CANCELADA' and instance.orcamento_id:
+        # Peças reservadas na aprovação voltam a ficar disponíveis
+        liberar_reservas(instance.orcamento_id)
 
-    try:
-        os_antiga = OrdemServico.objects.get(pk=instance.pk)
-    except OrdemServico.DoesNotExist:
-        return
+def _os_aberta(status):
+    return status not in ('CONCLUIDA', 'CANCELADA')
+
+def _somar_os_abertas(mecanico_id, delta):
+    if mecanico_id:
+        Mecanico.objects.filter(pk=mecanico_id).update(os_abertas=F('os_abertas') + delta)
 
-    # Se o status mudou para CONCLUIDA
-    if os_antiga.status != 'CONCLUIDA' and instance.status == 'CONCLUIDA':
-        itens_a_baixar = []
-
-        # 1. Itens vinculados diretamente à OS
-        if instance.itens.exists():
-            itens_a_baixar.extend(instance.itens.all())
-        
-        # 2. Itens do Orçamento vinculado (se houver)
-        if instance.orcamento and instance.orcamento.itens.exists():
-            itens_a_baixar.extend(instance.orcamento.itens.all())
-            
-        # Baixa estoque
-        for item in itens_a_baixar:
-            if item.produto: # Apenas se for produto (não serviço)
-                produto = item.produto
-                # Otimista: assume que tem estoque ou permite ficar negativo?
-                # Requisito não especifica bloqueio na OS, mas é boa prática.
-                # Por simplicidade/robustez, vamos apenas subtrair. 
-                # Se precisar bloquear, teria que ser validação no serializer/view.
-                produto.estoque_atual -= item.quantidade
-                produto.save()
-
-                if produto.estoque_atual < produto.estoque_minimo:
-                     Notificacao.objects.create(
-                          mensagem=f"Alerta de Estoque Baixo: O produto '{produto.nome}' está com {produto.estoque_atual} unidades (Mínimo: {produto.estoque_minimo}).",
-                          produto=produto
-                     )
+@receiver(pre_save, sender=OrdemServico)
+def guardar_responsavel_anterior(sender, instance, **kwargs):
+    """Guarda mecânico/status gravados antes da alteração, para manter Mecanico.os_abertas"""
+    instance._responsavel_anterior = None
+    if instance.pk:
+        instance._responsavel_anterior = OrdemServico.objects.filter(pk=instance.pk).values_list(
+            'mecanico_responsavel_id', 'status'
+        ).first()
 
 @receiver(post_save, sender=OrdemServico)
-def atualizar_estoque_ao_finalizar_os(sender, instance, created, **kwargs):
-    """
-    Quando uma OS é marcada como CONCLUÍDA, registra a saída de estoque
-    dos produtos usados (PB11 - TC11 Cenário 1)
-    """
-    if instance.status == 'CONCLUIDA' and instance.orcamento:
-        # Busca os itens do orçamento associado
-        itens = instance.orcamento.itens.all()
-        
-        for item in itens:
-            # Verifica se já existe movimentação para este item
-            ja_registrado = MovimentacaoEstoque.objects.filter(
-                ordem_servico=instance,
-                produto=item.produto,
-                tipo_movimentacao='SAIDA'
-            ).exists()
-            
-            if not ja_registrado:
-                # ✅ REGISTRA A SAÍDA NO HISTÓRICO
-                MovimentacaoEstoque.objects.create(
-                    produto=item.produto,
-                    tipo_movimentacao='SAIDA',
-                    quantidade=item.quantidade,
-                    observacao=f'Uso em OS #{instance.numero_os}',
-                    ordem_servico=instance
-                )
-                # O método save() já abate o estoque
\ No newline at end of file
+def contar_os_abertas(sender, instance, **kwargs):
+    """Mecanico.os_abertas: -1 para quem deixou de ter a OS aberta, +1 para quem passou a ter"""
+    anterior = getattr(instance, '_responsavel_anterior', None)
+    antes = anterior[0] if anterior and _os_aberta(anterior[1]) else None
+    depois = instance.mecanico_responsavel_id if _os_aberta(instance.status) else None
+    if antes != depois:
+        _somar_os_abertas(antes, -1)
+        _somar_os_abertas(depois, 1)
+
+@receiver(post_delete, sender=OrdemServico)
+def descontar_os_aberta(sender, instance, **kwargs):
+    if _os_aberta(instance.status):
+        _somar_os_abertas(instance.mecanico_responsavel_id, -1)
+
+@receiver(pre_delete, sender=Orcamento)
+def liberar_reservas_ao_excluir_orcamento(sender, instance, **kwargs):
+    liberar_reservas(instance.pk)
+
+
+@receiver(post_save, sender=Produto)
+def verificar_alerta_ao_editar_produto(sender, instance, **kwargs):
+    """Saldo ou mínimo editados no cadastro também abrem/resolvem o alerta de estoque baixo"""
+    verificar_estoque([instance.pk])
+
+
+@receiver(post_save, sender=Notificacao)
+@receiver(post_delete, sender=Notificacao)
+def invalidar_contagem_notificacoes(sender, **kwargs):
+    invalidar_contagem()
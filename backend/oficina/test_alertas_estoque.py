@@ -0,0 +1,95 @@
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from usuarios.models import Fornecedor
+from .models import Produto, MovimentacaoEstoque, Notificacao
+from .alertas import sincronizar_alertas
+
+
+class AlertasEstoqueTests(TestCase):
+    def setUp(self):
+        fornecedor = Fornecedor.objects.create(nome="Fornecedor", cnpj="66666666000166")
+        self.produto = Produto.objects.create(
+            fornecedor=fornecedor, nome="Pastilha", custo=50, preco_venda=100, estoque_atual=10, estoque_minimo=5
+        )
+
+    def _saida(self, quantidade):
+        MovimentacaoEstoque.objects.create(produto=self.produto, tipo_movimentacao='SAIDA', quantidade=quantidade)
+
+    def test_um_alerta_aberto_atualizado_no_lugar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._saida(6)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._saida(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._saida(1)
+
+        alerta = Notificacao.objects.get(produto=self.produto)
+        self.assertEqual(alerta.estoque_registrado, 2)
+        self.assertIn("está com 2 unidades", alerta.mensagem)
+        self.assertFalse(alerta.resolvida)
+
+    def test_atualizacao_do_alerta_registra_a_data(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._saida(6)
+        alerta = Notificacao.objects.get(produto=self.produto)
+        Notificacao.objects.filter(pk=alerta.pk).update(data_atualizacao=alerta.data_atualizacao - timedelta(days=1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._saida(1)
+
+        atualizado = Notificacao.objects.get(pk=alerta.pk)
+        self.assertGreater(atualizado.data_atualizacao, alerta.data_atualizacao - timedelta(minutes=1))
+
+    def test_baixas_na_mesma_transacao_verificadas_uma_vez(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for _ in range(4):
+                self._saida(2)
+
+        with CaptureQueriesContext(connection) as consultas:
+            for callback in callbacks:
+                callback()
+
+        # Produtos + alertas abertos + inserção (e o savepoint), independente do número de baixas
+        self.assertEqual(len([q for q in consultas if 'SAVEPOINT' not in q['sql']]), 3)
+        self.assertEqual(Notificacao.objects.get(produto=self.produto).estoque_registrado, 2)
+
+    def test_reposicao_resolve_alerta(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._saida(8)
+        with self.captureOnCommitCallbacks(execute=True):
+            MovimentacaoEstoque.objects.create(produto=self.produto, tipo_movimentacao='ENTRADA', quantidade=10)
+
+        self.assertTrue(Notificacao.objects.get(produto=self.produto).resolvida)
+
+        # Nova baixa abre outro alerta, sem reabrir o resolvido
+        with self.captureOnCommitCallbacks(execute=True):
+            self._saida(9)
+        self.assertEqual(Notificacao.objects.filter(produto=self.produto, resolvida=False).count(), 1)
+        self.assertEqual(Notificacao.objects.filter(produto=self.produto).count(), 2)
+
+    def test_alerta_lido_volta_a_aparecer_se_piorar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._saida(6)
+        Notificacao.objects.update(lida=True)
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin_alerta'))
+        self.assertEqual(client.get('/api/notificacoes/?nao_lidas=true').data, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._saida(2)
+        nao_lidas = client.get('/api/notificacoes/?nao_lidas=true').data
+        self.assertEqual(len(nao_lidas), 1)
+        self.assertEqual(nao_lidas[0]['estoque_registrado'], 2)
+
+    def test_sincronizar_sem_alteracao_nao_grava(self):
+        Produto.objects.filter(pk=self.produto.pk).update(estoque_atual=1)
+        sincronizar_alertas([self.produto.pk])
+
+        with CaptureQueriesContext(connection) as consultas:
+            sincronizar_alertas([self.produto.pk])
+        self.assertEqual(len(consultas), 2)
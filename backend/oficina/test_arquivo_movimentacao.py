@@ -0,0 +1,115 @@
+from datetime import date, datetime
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from usuarios.models import Fornecedor
+from .arquivo import arquivar_periodo, limite_arquivamento, mes_seguinte
+from .models import Produto, MovimentacaoEstoque, ArquivoMovimentacao, ValorizacaoEstoque
+from .saldos import saldo_em
+
+
+class ArquivoMovimentacaoTests(TestCase):
+    def setUp(self):
+        fornecedor = Fornecedor.objects.create(nome="Fornecedor", cnpj="14141414000114")
+        self.produto = Produto.objects.create(
+            fornecedor=fornecedor, nome="Amortecedor", custo=100, preco_venda=200, estoque_atual=0
+        )
+        limite = limite_arquivamento()
+        # Um mês bem antigo (arquivável) e o mês corrente (ativo)
+        self.antigo = date(limite.year - 1, limite.month, 1)
+        self.atual = timezone.localdate().replace(day=1)
+
+        self._movimentar(self.antigo, 1, 'ENTRADA', 10, custo=100)
+        self._movimentar(self.antigo, 15, 'SAIDA', 3)
+        self._movimentar(mes_seguinte(self.antigo), 5, 'ENTRADA', 5, custo=130)
+        self._movimentar(self.atual, 1, 'SAIDA', 4)
+
+    def _em(self, mes, dia):
+        return timezone.make_aware(datetime(mes.year, mes.month, dia, 12))
+
+    def _movimentar(self, mes, dia, tipo, quantidade, custo=None):
+        mov = MovimentacaoEstoque.objects.create(
+            produto=self.produto, tipo_movimentacao=tipo, quantidade=quantidade, custo_unitario=custo
+        )
+        MovimentacaoEstoque.objects.filter(pk=mov.pk).update(data_movimentacao=self._em(mes, dia))
+
+    def test_arquiva_o_mes_comprimido(self):
+        arquivadas, linhas = arquivar_periodo(self.antigo)
+
+        self.assertEqual((arquivadas, linhas), (2, 1))
+        arquivo = ArquivoMovimentacao.objects.get()
+        self.assertEqual((arquivo.periodo, arquivo.quantidade_entrada, arquivo.quantidade_saida), (self.antigo, 10, 3))
+        self.assertEqual(MovimentacaoEstoque.objects.count(), 2)
+
+        # Rodar de novo não duplica
+        self.assertEqual(arquivar_periodo(self.antigo), (0, 0))
+
+    def test_nao_arquiva_meses_ativos(self):
+        with self.assertRaises(ValueError):
+            arquivar_periodo(self.atual)
+
+    def test_saldo_historico_le_o_arquivo(self):
+        meio_do_mes = date(self.antigo.year, self.antigo.month, 10)
+        antes = [saldo_em(self.produto, meio_do_mes), saldo_em(self.produto, mes_seguinte(self.antigo))]
+
+        call_command('arquivar_movimentacoes', stdout=StringIO())
+
+        self.produto.refresh_from_db()
+        depois = [saldo_em(self.produto, meio_do_mes), saldo_em(self.produto, mes_seguinte(self.antigo))]
+        self.assertEqual(depois, antes)
+        self.assertEqual([saldo for saldo, _ in depois], [10, 7])
+
+    def test_reconciliacao_e_valorizacao_consideram_o_arquivo(self):
+        incremental = ValorizacaoEstoque.objects.values().get(produto=self.produto)
+        call_command('arquivar_movimentacoes', stdout=StringIO())
+
+        saida = StringIO()
+        call_command('reconciliar_estoque', stdout=saida)
+        self.assertIn("0 divergente(s)", saida.getvalue())
+
+        call_command('reconstruir_valorizacao', stdout=StringIO())
+        reconstruido = ValorizacaoEstoque.objects.values().get(produto=self.produto)
+        for campo in ['quantidade', 'custo_medio', 'valor_medio', 'valor_fifo', 'fifo_pendente']:
+            self.assertEqual(reconstruido[campo], incremental[campo], campo)
+
+    def test_listagem_mescla_o_arquivo_quando_o_periodo_alcanca(self):
+        arquivado = MovimentacaoEstoque.objects.get(quantidade=3).pk
+        arquivar_periodo(self.antigo)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin_arquivo', is_staff=True))
+
+        def quantidades(url):
+            return [m['quantidade'] for m in client.get(url).data['resultados']]
+
+        response = client.get(f'/api/movimentacoes-estoque/?data_inicio={self.antigo.isoformat()}')
+        self.assertEqual([m['quantidade'] for m in response.data['resultados']], [4, 5, 3, 10])
+        self.assertIsNone(response.data['proximo'])
+        self.assertEqual(response.data['resultados'][-1]['custo_unitario'], '100.00')
+        self.assertEqual(response.data['resultados'][-1]['produto_nome'], "Amortecedor")
+
+        self.assertEqual(quantidades(f'/api/movimentacoes-estoque/?data_inicio={self.antigo.isoformat()}&tipo=SAIDA'), [4, 3])
+
+        # Sem data_inicio o período também alcança o arquivo
+        self.assertEqual(quantidades('/api/movimentacoes-estoque/'), [4, 5, 3, 10])
+        self.assertEqual(quantidades(f'/api/movimentacoes-estoque/?data_fim={mes_seguinte(self.antigo).isoformat()}'), [3, 10])
+
+        # Paginação atravessa a fronteira entre a tabela ativa e o arquivo e diz onde continuar
+        response = client.get('/api/movimentacoes-estoque/?limit=2&offset=1')
+        self.assertEqual([m['quantidade'] for m in response.data['resultados']], [5, 3])
+        self.assertEqual(response.data['proximo'], 3)
+        self.assertEqual(quantidades('/api/movimentacoes-estoque/?limit=2&offset=3'), [10])
+
+        # Arquivada, continua acessível pelo id
+        response = client.get(f'/api/movimentacoes-estoque/{arquivado}/')
+        self.assertEqual((response.status_code, response.data['quantidade']), (200, 3))
+        self.assertEqual(client.get('/api/movimentacoes-estoque/999999/').status_code, 404)
+
+        # Período só com meses ativos não lê o arquivo
+        with CaptureQueriesContext(connection) as consultas:
+            response = client.get(f'/api/movimentacoes-estoque/?data_inicio={timezone.localdate().isoformat()}')
+        self.assertFalse([c for c in consultas.captured_queries if 'arquivomovimentacao' in c['sql']])
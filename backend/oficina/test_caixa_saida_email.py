@@ -0,0 +1,105 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from oficina import emails
+from oficina.emails import enfileirar_email, despachar, despachar_pendentes
+from oficina.models import EmailPendente
+
+
+class FalhaNoEnvio(EmailBackend):
+    """Backend locmem que recusa os e-mails para destinatários em `recusados`"""
+    recusados = set()
+    conexoes = 0
+    aberta = False
+
+    def open(self):
+        if self.aberta:
+            return False
+        self.aberta = True
+        FalhaNoEnvio.conexoes += 1
+        return True
+
+    def close(self):
+        self.aberta = False
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & self.recusados:
+                raise ConnectionError('servidor recusou')
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_LOTE_ENVIO=10, EMAIL_MAX_TENTATIVAS=3, EMAIL_ESPERA_BASE_SEGUNDOS=60,
+)
+class CaixaSaidaEmailTests(TestCase):
+    def test_so_envia_depois_do_commit_e_fora_da_requisicao(self):
+        with mock.patch.object(emails, '_acordar_despachante') as acordar:
+            with self.captureOnCommitCallbacks(execute=True):
+                email = enfileirar_email('Assunto', 'Corpo', ['cliente@sgom.local'])
+                acordar.assert_not_called()
+            acordar.assert_called_once_with(email.pk)
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(despachar_pendentes(), (1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.tentativas, email.mensagem), ('ENVIADO', 1, ''))
+        self.assertIsNotNone(email.data_envio)
+        self.assertEqual(mail.outbox[0].from_email, 'no-reply@sgom.local')
+        # Já enviado: não sai de novo
+        self.assertEqual(despachar_pendentes(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_lotes_reaproveitam_a_conexao(self):
+        for i in range(25):
+            enfileirar_email(f'Aviso {i}', 'Corpo', [f'c{i}@sgom.local'])
+        FalhaNoEnvio.recusados, FalhaNoEnvio.conexoes = set(), 0
+
+        with override_settings(EMAIL_BACKEND='oficina.test_caixa_saida_email.FalhaNoEnvio'):
+            self.assertEqual(despachar_pendentes(), (25, 0))
+
+        self.assertEqual(len(mail.outbox), 25)
+        # Uma conexão por lote de 10
+        self.assertEqual(FalhaNoEnvio.conexoes, 3)
+        self.assertFalse(EmailPendente.objects.filter(status='PENDENTE').exists())
+
+    @override_settings(EMAIL_BACKEND='oficina.test_caixa_saida_email.FalhaNoEnvio')
+    def test_falha_volta_para_a_fila_com_espera_crescente(self):
+        FalhaNoEnvio.recusados = {'fora@sgom.local'}
+        ruim = enfileirar_email('Falha', 'Corpo', ['fora@sgom.local'])
+        bom = enfileirar_email('Ok', 'Corpo', ['ok@sgom.local'])
+
+        self.assertEqual(despachar(), (1, 1))
+        ruim.refresh_from_db()
+        self.assertEqual((ruim.status, ruim.tentativas), ('PENDENTE', 1))
+        self.assertIn('servidor recusou', ruim.ultimo_erro)
+        self.assertAlmostEqual(
+            (ruim.proxima_tentativa - timezone.now()).total_seconds(), 60, delta=5
+        )
+        # Ainda não venceu: nada a enviar
+        self.assertEqual(despachar(), (0, 0))
+
+        EmailPendente.objects.filter(pk=ruim.pk).update(proxima_tentativa=timezone.now() - timedelta(seconds=1))
+        despachar()
+        ruim.refresh_from_db()
+        self.assertEqual(ruim.tentativas, 2)
+        self.assertAlmostEqual((ruim.proxima_tentativa - timezone.now()).total_seconds(), 120, delta=5)
+
+        EmailPendente.objects.filter(pk=ruim.pk).update(proxima_tentativa=timezone.now() - timedelta(seconds=1))
+        despachar()
+        ruim.refresh_from_db()
+        self.assertEqual((ruim.status, ruim.tentativas), ('FALHOU', 3))
+        self.assertEqual(EmailPendente.objects.get(pk=bom.pk).status, 'ENVIADO')
+
+    def test_despacho_por_ids(self):
+        primeiro = enfileirar_email('Um', 'Corpo', ['um@sgom.local'])
+        enfileirar_email('Dois', 'Corpo', ['dois@sgom.local'])
+
+        self.assertEqual(despachar([primeiro.pk]), (1, 0))
+        self.assertEqual([m.subject for m in mail.outbox], ['Um'])
@@ -0,0 +1,84 @@
+from datetime import date
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from usuarios.models import Mecanico, Cliente, Fornecedor
+from veiculos.models import Veiculo
+from .models import Orcamento, OrdemServico, ItemMovimentacao, Produto, MovimentacaoEstoque, Notificacao
+
+
+class ConclusaoOSTests(TestCase):
+    def setUp(self):
+        self.mecanico = Mecanico.objects.create(user=User.objects.create_user(username='mec_conclusao', password='123'))
+        self.cliente = Cliente.objects.create(nome="Cliente", cpf="65465465465")
+        self.veiculo = Veiculo.objects.create(placa="CON-0001", modelo="Gol", marca="VW", ano=2019, cliente=self.cliente)
+        self.fornecedor = Fornecedor.objects.create(nome="Fornecedor", cnpj="55555555000155")
+
+    def _produto(self, nome, estoque=20, minimo=0):
+        return Produto.objects.create(
+            fornecedor=self.fornecedor, nome=nome, custo=10, preco_venda=20,
+            estoque_atual=estoque, estoque_minimo=minimo
+        )
+
+    def _os_com_itens(self, produtos):
+        orcamento = Orcamento.objects.create(
+            cliente=self.cliente, veiculo=self.veiculo, mecanico=self.mecanico, validade=date.today()
+        )
+        os = OrdemServico.objects.create(
+            veiculo=self.veiculo, mecanico_responsavel=self.mecanico, status='EM_ANDAMENTO', orcamento=orcamento
+        )
+        for produto in produtos:
+            ItemMovimentacao.objects.create(orcamento=orcamento, produto=produto, quantidade=2, valor_unitario=20)
+        return os
+
+    def _concluir(self, os):
+        os.status = 'CONCLUIDA'
+        with CaptureQueriesContext(connection) as consultas:
+            os.save()
+        return len(consultas)
+
+    def test_consultas_constantes_por_quantidade_de_itens(self):
+        poucos = self._concluir(self._os_com_itens([self._produto("Filtro")]))
+        muitos = self._concluir(self._os_com_itens([self._produto(f"Peça {i}") for i in range(15)]))
+
+        self.assertEqual(poucos, muitos)
+
+    def test_itens_da_os_e_do_orcamento_agrupados_por_produto(self):
+        oleo = self._produto("Óleo", estoque=20, minimo=18)
+        os = self._os_com_itens([oleo])
+        ItemMovimentacao.objects.create(os=os, produto=oleo, quantidade=3, valor_unitario=40)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._concluir(os)
+
+        oleo.refresh_from_db()
+        self.assertEqual(oleo.estoque_atual, 15)
+        saida = MovimentacaoEstoque.objects.get(ordem_servico=os)
+        self.assertEqual(saida.quantidade, 5)
+        self.assertEqual(Notificacao.objects.filter(produto=oleo).count(), 1)
+
+    def test_salvar_novamente_nao_baixa_de_novo(self):
+        oleo = self._produto("Óleo")
+        os = self._os_com_itens([oleo])
+        copia_antiga = OrdemServico.objects.get(pk=os.pk)
+        self._concluir(os)
+
+        os.save()
+        # Instância carregada antes da conclusão ainda vê estoque_baixado=False
+        self._concluir(copia_antiga)
+
+        oleo.refresh_from_db()
+        self.assertEqual(oleo.estoque_atual, 18)
+        self.assertEqual(MovimentacaoEstoque.objects.filter(ordem_servico=os).count(), 1)
+
+    def test_item_incluido_apos_conclusao_baixa_pelo_historico(self):
+        oleo = self._produto("Óleo")
+        os = self._os_com_itens([])
+        self._concluir(os)
+
+        ItemMovimentacao.objects.create(os=os, produto=oleo, quantidade=1, valor_unitario=40)
+
+        oleo.refresh_from_db()
+        self.assertEqual(oleo.estoque_atual, 19)
+        self.assertTrue(MovimentacaoEstoque.objects.filter(ordem_servico=os, produto=oleo).exists())
@@ -0,0 +1,83 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from usuarios.models import Fornecedor
+from .models import Produto, Notificacao
+
+
+class ContagemNotificacoesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        fornecedor = Fornecedor.objects.create(nome="Fornecedor", cnpj="77777777000177")
+        self.produtos = [
+            Produto.objects.create(fornecedor=fornecedor, nome=f"Peça {i}", custo=10, preco_venda=20)
+            for i in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin_contagem'))
+
+    def _notificar(self, produto):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notificacao.objects.create(mensagem="Alerta", produto=produto)
+
+    def _contagem(self):
+        return self.client.get('/api/notificacoes/contagem/').data['nao_lidas']
+
+    def test_contagem_vem_do_cache(self):
+        for produto in self.produtos:
+            self._notificar(produto)
+        self.assertEqual(self._contagem(), 5)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self._contagem(), 5)
+        self.assertEqual(len(consultas), 0)
+
+    def test_contagem_invalidada_ao_criar_e_marcar_lida(self):
+        notificacao = self._notificar(self.produtos[0])
+        self.assertEqual(self._contagem(), 1)
+
+        self._notificar(self.produtos[1])
+        self.assertEqual(self._contagem(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/notificacoes/{notificacao.pk}/marcar_lida/')
+        self.assertEqual(self._contagem(), 1)
+
+    @override_settings(NOTIFICACOES_CONTAGEM_TTL=30)
+    def test_contagem_expira_para_alteracoes_de_outro_processo(self):
+        self._notificar(self.produtos[0])
+        self.assertEqual(self._contagem(), 1)
+
+        # Gravado por outro processo: o cache deste não é invalidado
+        Notificacao.objects.create(mensagem="Alerta", produto=self.produtos[1])
+        self.assertEqual(self._contagem(), 1)
+
+        daqui_a_pouco = time.time() + 31
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=daqui_a_pouco):
+            self.assertEqual(self._contagem(), 2)
+
+    def test_marcar_todas_lidas_em_um_update(self):
+        for produto in self.produtos:
+            self._notificar(produto)
+        self.assertEqual(self._contagem(), 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.post('/api/notificacoes/marcar_todas_lidas/')
+
+        self.assertEqual(response.data['marcadas'], 5)
+        self.assertEqual([q['sql'].split()[0] for q in consultas], ['UPDATE'])
+        self.assertEqual(self._contagem(), 0)
+        self.assertFalse(Notificacao.objects.filter(lida=False).exists())
+
+    def test_lista_limitada(self):
+        for produto in self.produtos:
+            self._notificar(produto)
+        response = self.client.get('/api/notificacoes/?nao_lidas=true&limite=3')
+        self.assertEqual(len(response.data), 3)
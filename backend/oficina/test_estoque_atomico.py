@@ -0,0 +1,61 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from usuarios.models import Fornecedor
+from .models import Produto, MovimentacaoEstoque
+from .estoque import EstoqueInsuficiente
+
+
+class EstoqueAtomicoTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='forn_atomico', password='123')
+        self.fornecedor = Fornecedor.objects.create(user=self.user, nome="Fornecedor", cnpj="11111111000111")
+        self.produto = Produto.objects.create(
+            fornecedor=self.fornecedor, nome="Pastilha de Freio", custo=30, preco_venda=60, estoque_atual=5
+        )
+
+    def test_saidas_com_instancias_desatualizadas_nao_perdem_atualizacao(self):
+        """Duas cópias do mesmo produto em memória (ex.: duas vendas simultâneas) baixam ambas"""
+        copia_a = Produto.objects.get(pk=self.produto.pk)
+        copia_b = Produto.objects.get(pk=self.produto.pk)
+
+        MovimentacaoEstoque.objects.create(produto=copia_a, tipo_movimentacao='SAIDA', quantidade=2)
+        MovimentacaoEstoque.objects.create(produto=copia_b, tipo_movimentacao='SAIDA', quantidade=2)
+
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque_atual, 1)
+        self.assertEqual(copia_b.estoque_atual, 1)
+
+    def test_saida_sem_saldo_e_recusada_sem_gravar_historico(self):
+        copia_desatualizada = Produto.objects.get(pk=self.produto.pk)
+        MovimentacaoEstoque.objects.create(produto=self.produto, tipo_movimentacao='SAIDA', quantidade=4)
+
+        # A cópia ainda "acha" que existem 5 unidades, mas o banco só tem 1
+        with self.assertRaises(EstoqueInsuficiente):
+            MovimentacaoEstoque.objects.create(produto=copia_desatualizada, tipo_movimentacao='SAIDA', quantidade=3)
+
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque_atual, 1)
+        self.assertEqual(MovimentacaoEstoque.objects.filter(produto=self.produto).count(), 1)
+
+    def test_movimentacao_nao_regrava_outras_colunas_do_produto(self):
+        copia = Produto.objects.get(pk=self.produto.pk)
+        copia.nome = "Nome alterado só em memória"
+
+        MovimentacaoEstoque.objects.create(produto=copia, tipo_movimentacao='ENTRADA', quantidade=10, custo_unitario=30)
+
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.nome, "Pastilha de Freio")
+        self.assertEqual(self.produto.estoque_atual, 15)
+
+    def test_api_saida_sem_saldo_retorna_400(self):
+        admin = User.objects.create_superuser(username='admin_atomico', password='123')
+        client = APIClient()
+        client.force_authenticate(user=admin)
+
+        response = client.post('/api/movimentacoes-estoque/', {
+            'produto': self.produto.pk, 'tipo_movimentacao': 'SAIDA', 'quantidade': 6
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(MovimentacaoEstoque.objects.count(), 0)
@@ -0,0 +1,68 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from usuarios.models import Fornecedor
+from .models import Produto
+
+
+class EstoqueBaixoTests(TestCase):
+    def setUp(self):
+        self.fornecedor = Fornecedor.objects.create(nome="Fornecedor", cnpj="88888888000188")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin_baixo', is_staff=True))
+
+    def _produto(self, nome, atual, minimo, fornecedor=None):
+        return Produto.objects.create(
+            fornecedor=fornecedor or self.fornecedor, nome=nome, custo=10, preco_venda=20,
+            estoque_atual=atual, estoque_minimo=minimo
+        )
+
+    def test_deficit_calculado_pelo_banco(self):
+        produto = self._produto("Filtro", 3, 10)
+        self.assertEqual(Produto.objects.get(pk=produto.pk).deficit_estoque, 7)
+
+        Produto.objects.filter(pk=produto.pk).update(estoque_atual=12)
+        self.assertEqual(Produto.objects.get(pk=produto.pk).deficit_estoque, -2)
+
+    def test_listagem_ordenada_por_gravidade(self):
+        self._produto("Leve", 9, 10)
+        self._produto("Grave", 0, 20)
+        self._produto("Ok", 50, 10)
+        self._produto("Médio", 2, 7)
+
+        response = self.client.get('/api/produtos/estoque-baixo/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['nome'] for p in response.data], ["Grave", "Médio", "Leve"])
+        self.assertEqual([p['deficit_estoque'] for p in response.data], [20, 5, 1])
+
+    def test_filtro_estoque_baixo_para_admin(self):
+        """Antes o filtro só era aplicado para fornecedores (e quebrava com NameError)"""
+        self._produto("Baixo", 1, 5)
+        self._produto("Ok", 50, 5)
+
+        response = self.client.get('/api/produtos/?estoque_baixo=true')
+
+        self.assertEqual([p['nome'] for p in response.data], ["Baixo"])
+
+    def test_fornecedor_ve_apenas_os_seus(self):
+        dono = User.objects.create_user(username='forn_baixo')
+        fornecedor = Fornecedor.objects.create(user=dono, nome="Outro", cnpj="99999999000199")
+        self._produto("Meu", 1, 5, fornecedor=fornecedor)
+        self._produto("Alheio", 1, 5)
+
+        client = APIClient()
+        client.force_authenticate(dono)
+        response = client.get('/api/produtos/estoque-baixo/')
+
+        self.assertEqual([p['nome'] for p in response.data], ["Meu"])
+
+    def test_consulta_unica_para_a_listagem(self):
+        for i in range(10):
+            self._produto(f"Peça {i}", i, 10)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get('/api/produtos/estoque-baixo/?limite=5')
+        self.assertEqual(len(consultas), 1)
@@ -0,0 +1,100 @@
+from datetime import date
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+from usuarios.models import Fornecedor, Mecanico, Cliente
+from veiculos.models import Veiculo
+from .models import Produto, Venda, Orcamento, OrdemServico, ChaveIdempotencia, PedidoCompra
+
+
+class IdempotenciaTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='forn_idem', password='123')
+        self.fornecedor = Fornecedor.objects.create(user=self.user, nome="Fornecedor", cnpj="33333333000133")
+        self.produto = Produto.objects.create(
+            fornecedor=self.fornecedor, nome="Filtro de Óleo", custo=10, preco_venda=25, estoque_atual=10
+        )
+        self.venda = {'itens': [{'produto': self.produto.id_produto, 'quantidade': 2, 'valor_unitario': 25.00}]}
+
+    def test_venda_repetida_com_mesma_chave_nao_baixa_estoque_de_novo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            primeira = self.client.post('/api/vendas/', self.venda, format='json', HTTP_IDEMPOTENCY_KEY='terminal-1-abc')
+
+        with self.assertNumQueries(0):
+            repetida = self.client.post('/api/vendas/', self.venda, format='json', HTTP_IDEMPOTENCY_KEY='terminal-1-abc')
+
+        self.assertEqual(primeira.status_code, 201)
+        self.assertEqual(repetida.status_code, 201)
+        self.assertEqual(repetida.data['id_venda'], primeira.data['id_venda'])
+        self.assertEqual(repetida['Idempotent-Replayed'], 'true')
+        self.assertEqual(Venda.objects.count(), 1)
+        self.produto.refresh_from_db()
+        self.assertEqual(self.produto.estoque_atual, 8)
+
+    def test_repeticao_le_do_banco_quando_cache_foi_perdido(self):
+        primeira = self.client.post('/api/vendas/', self.venda, format='json', HTTP_IDEMPOTENCY_KEY='terminal-1-def')
+        cache.clear()
+        repetida = self.client.post('/api/vendas/', self.venda, format='json', HTTP_IDEMPOTENCY_KEY='terminal-1-def')
+
+        self.assertEqual(repetida.data['id_venda'], primeira.data['id_venda'])
+        self.assertEqual(Venda.objects.count(), 1)
+
+    def test_mesma_chave_com_outro_conteudo_e_recusada(self):
+        self.client.post('/api/vendas/', self.venda, format='json', HTTP_IDEMPOTENCY_KEY='terminal-1-ghi')
+        outro = {'itens': [{'produto': self.produto.id_produto, 'quantidade': 5, 'valor_unitario': 25.00}]}
+
+        response = self.client.post('/api/vendas/', outro, format='json', HTTP_IDEMPOTENCY_KEY='terminal-1-ghi')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Venda.objects.count(), 1)
+
+    def test_falha_nao_registra_chave(self):
+        sem_estoque = {'itens': [{'produto': self.produto.id_produto, 'quantidade': 50, 'valor_unitario': 25.00}]}
+
+        response = self.client.post('/api/vendas/', sem_estoque, format='json', HTTP_IDEMPOTENCY_KEY='terminal-1-jkl')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ChaveIdempotencia.objects.exists())
+
+        # Depois da reposição, a mesma chave executa a venda em vez de repetir a recusa
+        Produto.objects.filter(pk=self.produto.pk).update(estoque_atual=60)
+        response = self.client.post('/api/vendas/', sem_estoque, format='json', HTTP_IDEMPOTENCY_KEY='terminal-1-jkl')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Venda.objects.count(), 1)
+
+    def test_recusa_4xx_nao_fica_guardada(self):
+        pedido = PedidoCompra.objects.create(
+            produto=self.produto, fornecedor=self.fornecedor, quantidade=20, valor_unitario=10
+        )
+        self.client.force_authenticate(self.user)
+        url = f'/api/pedidos-compra/{pedido.pk}/aprovar/'
+
+        response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='pedido-1')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ChaveIdempotencia.objects.exists())
+
+        # Com o estoque reposto, a repetição aprova em vez de devolver a recusa antiga
+        Produto.objects.filter(pk=self.produto.pk).update(estoque_atual=30)
+        response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='pedido-1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ChaveIdempotencia.objects.get().status_code, 200)
+
+    def test_aprovacao_repetida_gera_uma_unica_os(self):
+        mecanico = Mecanico.objects.create(user=User.objects.create_user(username='mec_idem', password='123'))
+        cliente = Cliente.objects.create(nome="Cliente", cpf="12312312312")
+        veiculo = Veiculo.objects.create(placa="IDE-0001", modelo="Gol", marca="VW", ano=2019, cliente=cliente)
+        orcamento = Orcamento.objects.create(
+            cliente=cliente, veiculo=veiculo, mecanico=mecanico, validade=date.today()
+        )
+        url = f'/api/orcamentos/{orcamento.pk}/aprovar/'
+
+        primeira = self.client.post(url, HTTP_IDEMPOTENCY_KEY='aprovacao-1')
+        repetida = self.client.post(url, HTTP_IDEMPOTENCY_KEY='aprovacao-1')
+        sem_chave = self.client.post(url)
+
+        self.assertEqual(primeira.status_code, 200)
+        self.assertEqual(repetida.status_code, 200)
+        self.assertEqual(repetida.data['numero_os'], primeira.data['numero_os'])
+        self.assertEqual(sem_chave.status_code, 400)
+        self.assertEqual(OrdemServico.objects.filter(orcamento=orcamento).count(), 1)
@@ -49,9 +49,10 @@ class MonitoramentoEstoqueTestCase(TestCase):
             status='EM_ANDAMENTO', orcamento=orcamento
         )
         
-        # Concluir OS
+        # Concluir OS (o alerta é gerado no commit da transação)
         os.status = 'CONCLUIDA'
-        os.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            os.save()
         
         # Verifica estoque
         self.amortecedor.refresh_from_db()
@@ -0,0 +1,56 @@
+from datetime import date
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from usuarios.models import Mecanico, Cliente
+from veiculos.models import Veiculo
+from .models import Orcamento, OrdemServico, SequenciaOS
+from .numeracao import reservar_numeros_os
+
+
+class NumeracaoOSTests(TestCase):
+    def test_numeros_sequenciais_por_ano(self):
+        self.assertEqual(reservar_numeros_os(ano=2030), ['2030-000001'])
+        self.assertEqual(reservar_numeros_os(ano=2030), ['2030-000002'])
+        self.assertEqual(reservar_numeros_os(ano=2031), ['2031-000001'])
+
+    def test_reserva_em_bloco(self):
+        reservar_numeros_os(ano=2030)
+        bloco = reservar_numeros_os(3, ano=2030)
+
+        self.assertEqual(bloco, ['2030-000002', '2030-000003', '2030-000004'])
+        self.assertEqual(SequenciaOS.objects.get(ano=2030).ultimo_numero, 4)
+
+    def test_ordem_alfabetica_acompanha_emissao(self):
+        """O Max() antigo sobre CharField achava "9" > "10"; o formato com zeros evita isso"""
+        SequenciaOS.objects.create(ano=2030, ultimo_numero=8)
+        numeros = reservar_numeros_os(3, ano=2030)
+        self.assertEqual(sorted(numeros), numeros)
+
+    def test_aprovacoes_geram_numeros_distintos(self):
+        mecanico = Mecanico.objects.create(user=User.objects.create_user(username='mec_num', password='123'))
+        cliente = Cliente.objects.create(nome="Cliente", cpf="32132132132")
+        veiculo = Veiculo.objects.create(placa="NUM-0001", modelo="Gol", marca="VW", ano=2019, cliente=cliente)
+        client = APIClient()
+
+        numeros = []
+        for _ in range(12):
+            orcamento = Orcamento.objects.create(
+                cliente=cliente, veiculo=veiculo, mecanico=mecanico, validade=date.today()
+            )
+            response = client.post(f'/api/orcamentos/{orcamento.pk}/aprovar/')
+            self.assertEqual(response.status_code, 200)
+            numeros.append(response.data['numero_os'])
+
+        self.assertEqual(len(set(numeros)), 12)
+        self.assertEqual(sorted(numeros), numeros)
+        self.assertTrue(numeros[-1].endswith('-000012'))
+
+    def test_os_sem_numero_recebe_numero_do_contador(self):
+        mecanico = Mecanico.objects.create(user=User.objects.create_user(username='mec_num2', password='123'))
+        cliente = Cliente.objects.create(nome="Cliente", cpf="45645645645")
+        veiculo = Veiculo.objects.create(placa="NUM-0002", modelo="Gol", marca="VW", ano=2019, cliente=cliente)
+
+        os = OrdemServico.objects.create(veiculo=veiculo, mecanico_responsavel=mecanico)
+
+        self.assertRegex(os.numero_os, r'^\d{4}-\d{6}$')
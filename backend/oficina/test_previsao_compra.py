@@ -0,0 +1,120 @@
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from usuarios.models import Fornecedor
+from .models import Produto, MovimentacaoEstoque, PedidoCompra, Venda
+from .previsao import calcular_sugestoes, gerar_sugestoes
+
+HOJE = date(2026, 10, 18)
+
+
+class PrevisaoCompraTests(TestCase):
+    def setUp(self):
+        self.fornecedor = Fornecedor.objects.create(nome="Fornecedor", cnpj="12121212000112", prazo_entrega_dias=5)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin_previsao', is_staff=True))
+
+    def _produto(self, nome, estoque, fornecedor=None):
+        return Produto.objects.create(
+            fornecedor=fornecedor or self.fornecedor, nome=nome, custo=10, preco_venda=20,
+            estoque_atual=estoque, estoque_minimo=0
+        )
+
+    def _saidas(self, produto, por_dia, dias=90):
+        """Uma venda de `por_dia` unidades em cada um dos últimos `dias` dias"""
+        venda = Venda.objects.create()
+        movimentos = MovimentacaoEstoque.objects.bulk_create([
+            MovimentacaoEstoque(produto=produto, tipo_movimentacao='SAIDA', quantidade=por_dia, venda=venda)
+            for _ in range(dias)
+        ])
+        for atras, mov in enumerate(movimentos, start=1):
+            momento = timezone.make_aware(datetime.combine(HOJE - timedelta(days=atras), time(12)))
+            MovimentacaoEstoque.objects.filter(pk=mov.pk).update(data_movimentacao=momento)
+
+    def test_sugere_quando_atinge_ponto_de_pedido(self):
+        # Demanda constante de 2/dia, prazo 5 dias: ponto de pedido 10, alvo 10 + 2*30 = 70
+        produto = self._produto("Filtro", 8)
+        self._saidas(produto, 2)
+
+        sugestoes = calcular_sugestoes(HOJE)
+
+        self.assertEqual(len(sugestoes), 1)
+        self.assertEqual(sugestoes[0].produto_id, produto.pk)
+        self.assertEqual(sugestoes[0].quantidade, 62)
+        self.assertEqual(sugestoes[0].valor_total, 620)
+
+    def test_nao_sugere_acima_do_ponto_de_pedido_ou_sem_demanda(self):
+        com_estoque = self._produto("Com estoque", 50)
+        self._saidas(com_estoque, 2)
+        self._produto("Parado", 0)
+
+        self.assertEqual(calcular_sugestoes(HOJE), [])
+
+    def test_pedido_pendente_conta_na_posicao(self):
+        produto = self._produto("Óleo", 8)
+        self._saidas(produto, 2)
+        PedidoCompra.objects.create(
+            produto=produto, fornecedor=self.fornecedor, quantidade=60, valor_unitario=10
+        )
+
+        self.assertEqual(calcular_sugestoes(HOJE), [])
+
+    def test_pedido_aprovado_nao_conta_como_demanda(self):
+        produto = self._produto("Correia", 8)
+        self._saidas(produto, 2)
+        antes = calcular_sugestoes(HOJE + timedelta(days=1))
+
+        dono = User.objects.create_user(username='forn_aprova')
+        Fornecedor.objects.filter(pk=self.fornecedor.pk).update(user=dono)
+        pedido = PedidoCompra.objects.create(produto=produto, fornecedor=self.fornecedor, quantidade=5, valor_unitario=10)
+        client = APIClient()
+        client.force_authenticate(dono)
+        self.assertEqual(client.post(f'/api/pedidos-compra/{pedido.pk}/aprovar/').status_code, 200)
+        # A aprovação grava SAIDA e ENTRADA de 5; leva as duas para dentro da janela da previsão
+        MovimentacaoEstoque.objects.filter(venda__isnull=True).update(
+            data_movimentacao=timezone.make_aware(datetime.combine(HOJE, time(12)))
+        )
+
+        depois = calcular_sugestoes(HOJE + timedelta(days=1))
+        self.assertEqual([s.quantidade for s in depois], [s.quantidade for s in antes])
+        self.assertEqual(len(depois), 1)
+
+    def test_nova_rodada_substitui_sugestoes_nao_confirmadas(self):
+        produto = self._produto("Pastilha", 0)
+        self._saidas(produto, 1)
+
+        gerar_sugestoes(HOJE)
+        gerar_sugestoes(HOJE)
+
+        self.assertEqual(PedidoCompra.objects.filter(status='SUGERIDO').count(), 1)
+
+    def test_admin_lista_por_fornecedor_e_confirma(self):
+        outro = Fornecedor.objects.create(nome="Outro", cnpj="34343434000134", prazo_entrega_dias=5)
+        for nome, fornecedor in [("A", self.fornecedor), ("B", self.fornecedor), ("C", outro)]:
+            self._saidas(self._produto(nome, 0, fornecedor), 1)
+        gerar_sugestoes(HOJE)
+
+        response = self.client.get('/api/pedidos-compra/sugestoes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([len(grupo['pedidos']) for grupo in response.data], [2, 1])
+
+        response = self.client.post(
+            '/api/pedidos-compra/confirmar_sugestoes/', {'fornecedor': self.fornecedor.pk}, format='json'
+        )
+        self.assertEqual(response.data['confirmados'], 2)
+        self.assertEqual(PedidoCompra.objects.filter(status='PENDENTE').count(), 2)
+        self.assertEqual(PedidoCompra.objects.filter(status='SUGERIDO').count(), 1)
+
+    def test_fornecedor_nao_ve_sugestoes(self):
+        dono = User.objects.create_user(username='forn_previsao')
+        fornecedor = Fornecedor.objects.create(user=dono, nome="Dono", cnpj="56565656000156")
+        self._saidas(self._produto("Vela", 0, fornecedor), 1)
+        gerar_sugestoes(HOJE)
+
+        client = APIClient()
+        client.force_authenticate(dono)
+        self.assertEqual(client.get('/api/pedidos-compra/').data, [])
+        self.assertEqual(client.get('/api/pedidos-compra/sugestoes/').status_code, 403)
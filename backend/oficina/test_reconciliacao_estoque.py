@@ -0,0 +1,67 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from usuarios.models import Fornecedor
+from .models import Produto, MovimentacaoEstoque, PedidoCompra
+
+
+class ReconciliacaoEstoqueTests(TestCase):
+    def setUp(self):
+        self.dono = User.objects.create_user(username='forn_reconc')
+        self.fornecedor = Fornecedor.objects.create(user=self.dono, nome="Fornecedor", cnpj="13131313000113")
+
+    def _produto(self, nome, estoque):
+        return Produto.objects.create(
+            fornecedor=self.fornecedor, nome=nome, custo=10, preco_venda=20, estoque_atual=estoque
+        )
+
+    def _reconciliar(self, *args):
+        saida = StringIO()
+        call_command('reconciliar_estoque', *args, '--lote', '2', stdout=saida)
+        return saida.getvalue()
+
+    def test_lista_divergencias(self):
+        certo = self._produto("Certo", 0)
+        MovimentacaoEstoque.objects.create(produto=certo, tipo_movimentacao='ENTRADA', quantidade=5)
+        self._produto("Sem histórico", 7)
+        desviado = self._produto("Desviado", 0)
+        MovimentacaoEstoque.objects.create(produto=desviado, tipo_movimentacao='ENTRADA', quantidade=5)
+        Produto.objects.filter(pk=desviado.pk).update(estoque_atual=2)
+
+        saida = self._reconciliar()
+
+        self.assertIn("3 produto(s) analisado(s), 2 divergente(s), diferença total de 10", saida)
+        self.assertIn("Sem histórico: estoque_atual=7, histórico=0 (+7)", saida)
+        self.assertIn("Desviado: estoque_atual=2, histórico=5 (-3)", saida)
+        self.assertNotIn("Certo:", saida)
+
+    def test_corrigir_grava_ajustes_sem_mexer_no_saldo(self):
+        produtos = [self._produto(f"Peça {i}", i + 1) for i in range(5)]
+
+        self._reconciliar('--corrigir')
+
+        self.assertEqual(MovimentacaoEstoque.objects.filter(tipo_movimentacao='ENTRADA').count(), 5)
+        self.assertEqual(
+            list(Produto.objects.order_by('pk').values_list('estoque_atual', flat=True)),
+            [p.estoque_atual for p in produtos]
+        )
+        self.assertIn("0 divergente(s)", self._reconciliar())
+
+    def test_aprovacao_de_pedido_nao_desvia_o_saldo(self):
+        produto = self._produto("Filtro", 0)
+        MovimentacaoEstoque.objects.create(produto=produto, tipo_movimentacao='ENTRADA', quantidade=10)
+        pedido = PedidoCompra.objects.create(
+            produto=produto, fornecedor=self.fornecedor, quantidade=4, valor_unitario=10
+        )
+
+        client = APIClient()
+        client.force_authenticate(self.dono)
+        response = client.post(f'/api/pedidos-compra/{pedido.pk}/aprovar/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['estoque_fornecedor'], 6)
+        produto.refresh_from_db()
+        self.assertEqual(produto.estoque_atual, 10)
+        self.assertIn("0 divergente(s)", self._reconciliar())
@@ -0,0 +1,118 @@
+from datetime import date
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from usuarios.models import Mecanico, Cliente, Fornecedor
+from veiculos.models import Veiculo
+from .models import Orcamento, OrdemServico, ItemMovimentacao, Produto, ReservaEstoque
+
+
+class ReservaEstoqueTests(TestCase):
+    def setUp(self):
+        self.mecanico = Mecanico.objects.create(user=User.objects.create_user(username='mec_reserva', password='123'))
+        self.cliente = Cliente.objects.create(nome="Cliente", cpf="14714714714")
+        self.veiculo = Veiculo.objects.create(placa="RES-0001", modelo="Gol", marca="VW", ano=2019, cliente=self.cliente)
+        fornecedor = Fornecedor.objects.create(nome="Fornecedor", cnpj="10101010000110")
+        self.bateria = Produto.objects.create(
+            fornecedor=fornecedor, nome="Bateria", custo=300, preco_venda=500, estoque_atual=3
+        )
+        self.client = APIClient()
+
+    def _orcamento(self, quantidade):
+        orcamento = Orcamento.objects.create(
+            cliente=self.cliente, veiculo=self.veiculo, mecanico=self.mecanico, validade=date.today()
+        )
+        ItemMovimentacao.objects.create(orcamento=orcamento, produto=self.bateria, quantidade=quantidade, valor_unitario=500)
+        return orcamento
+
+    def _aprovar(self, orcamento):
+        return self.client.post(f'/api/orcamentos/{orcamento.pk}/aprovar/')
+
+    def _saldos(self):
+        self.bateria.refresh_from_db()
+        return self.bateria.estoque_atual, self.bateria.estoque_reservado, self.bateria.estoque_disponivel
+
+    def test_aprovacao_reserva_pecas(self):
+        response = self._aprovar(self._orcamento(2))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._saldos(), (3, 2, 1))
+        self.assertEqual(ReservaEstoque.objects.get().status, 'ATIVA')
+
+    def test_sem_saldo_aprova_e_a_os_aguarda_pecas(self):
+        self._aprovar(self._orcamento(2))
+        segundo = self._orcamento(2)
+
+        response = self._aprovar(segundo)
+
+        # O segundo orçamento não conta com as peças do primeiro: reserva a que sobrou e aguarda a outra
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status_os'], 'AGUARDANDO_PECAS')
+        self.assertEqual(response.data['pecas_pendentes'], [{'produto': self.bateria.pk, 'nome': 'Bateria', 'quantidade': 1}])
+        segundo.refresh_from_db()
+        self.assertEqual(segundo.status, 'APROVADO')
+        self.assertEqual(ReservaEstoque.objects.get(orcamento=segundo).quantidade, 1)
+        self.assertEqual(self._saldos(), (3, 3, 0))
+
+        # Concluída, a OS baixa todas as peças usadas, reservadas ou não
+        os = OrdemServico.objects.get(orcamento=segundo)
+        os.status = 'CONCLUIDA'
+        os.save()
+        self.assertEqual(self._saldos(), (1, 2, -1))
+
+    def test_reserva_orcamentos_aprovados_antes_das_reservas(self):
+        antigo = self._orcamento(2)
+        antigo.status = 'APROVADO'
+        antigo.save()
+        OrdemServico.objects.create(orcamento=antigo, veiculo=self.veiculo, mecanico_responsavel=self.mecanico)
+        self._aprovar(self._orcamento(2))
+
+        call_command('reservar_orcamentos_aprovados', stdout=StringIO(), stderr=StringIO())
+        call_command('reservar_orcamentos_aprovados', stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(ReservaEstoque.objects.get(orcamento=antigo).quantidade, 1)
+        self.assertEqual(self._saldos(), (3, 3, 0))
+
+    def test_venda_balcao_respeita_reserva(self):
+        self._aprovar(self._orcamento(2))
+
+        response = self.client.post('/api/vendas/', {
+            'itens': [{'produto': self.bateria.pk, 'quantidade': 2, 'valor_unitario': '500.00'}]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._saldos(), (3, 2, 1))
+
+    def test_conclusao_consome_reserva(self):
+        orcamento = self._orcamento(2)
+        self._aprovar(orcamento)
+        os = OrdemServico.objects.get(orcamento=orcamento)
+
+        os.status = 'CONCLUIDA'
+        os.save()
+
+        self.assertEqual(self._saldos(), (1, 0, 1))
+        self.assertEqual(ReservaEstoque.objects.get().status, 'CONSUMIDA')
+
+    def test_cancelamento_libera_reserva(self):
+        orcamento = self._orcamento(2)
+        self._aprovar(orcamento)
+        os = OrdemServico.objects.get(orcamento=orcamento)
+
+        os.status = 'CANCELADA'
+        os.save()
+        os.save()
+
+        self.assertEqual(self._saldos(), (3, 0, 3))
+        self.assertEqual(ReservaEstoque.objects.get().status, 'LIBERADA')
+
+    def test_edicao_do_produto_nao_sobrescreve_reservado(self):
+        produto_antigo = Produto.objects.get(pk=self.bateria.pk)
+        self._aprovar(self._orcamento(2))
+
+        produto_antigo.estoque_atual = 10
+        produto_antigo.save()
+
+        self.assertEqual(self._saldos(), (10, 2, 8))
@@ -0,0 +1,104 @@
+from datetime import date, datetime, timedelta
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from usuarios.models import Fornecedor
+from .models import Produto, MovimentacaoEstoque, SaldoEstoqueDiario
+from .saldos import fechar_dia, saldo_em
+
+
+class SaldoHistoricoTests(TestCase):
+    def setUp(self):
+        fornecedor = Fornecedor.objects.create(nome="Fornecedor", cnpj="12121212000112")
+        self.produto = Produto.objects.create(
+            fornecedor=fornecedor, nome="Correia", custo=40, preco_venda=80, estoque_atual=10
+        )
+        Produto.objects.filter(pk=self.produto.pk).update(data_cadastro=self._em(date(2025, 1, 1)))
+        self.dia1, self.dia2, self.dia3 = date(2025, 3, 1), date(2025, 3, 2), date(2025, 3, 3)
+
+    def _em(self, dia, hora=12):
+        return timezone.make_aware(datetime(dia.year, dia.month, dia.day, hora))
+
+    def _movimentar(self, dia, tipo, quantidade):
+        mov = MovimentacaoEstoque.objects.create(produto=self.produto, tipo_movimentacao=tipo, quantidade=quantidade)
+        MovimentacaoEstoque.objects.filter(pk=mov.pk).update(data_movimentacao=self._em(dia))
+
+    def _saldo(self, dia):
+        self.produto.refresh_from_db()
+        return saldo_em(self.produto, dia)[0]
+
+    def _cenario(self):
+        # 10 iniciais; dia 1: +5 -3 = 12; dia 2: -4 = 8; dia 3: +10 = 18
+        self._movimentar(self.dia1, 'ENTRADA', 5)
+        self._movimentar(self.dia1, 'SAIDA', 3)
+        self._movimentar(self.dia2, 'SAIDA', 4)
+        self._movimentar(self.dia3, 'ENTRADA', 10)
+
+    def test_saldo_sem_fechamento_parte_do_atual(self):
+        self._cenario()
+        self.assertEqual(self._saldo(self.dia1), 12)
+        self.assertEqual(self._saldo(self.dia2), 8)
+        self.assertEqual(self._saldo(self.dia1 - timedelta(days=1)), 10)
+
+    def test_fechamentos_incrementais(self):
+        self._cenario()
+        fechar_dia(self.dia1)
+        # Altera o saldo atual sem movimento: o dia 2 deve partir do fechamento do dia 1
+        Produto.objects.filter(pk=self.produto.pk).update(estoque_atual=999)
+        fechar_dia(self.dia2)
+
+        saldos = dict(SaldoEstoqueDiario.objects.values_list('data', 'saldo'))
+        self.assertEqual(saldos, {self.dia1: 12, self.dia2: 8})
+
+    def test_fecha_so_produtos_movimentados(self):
+        parado = Produto.objects.create(
+            fornecedor=self.produto.fornecedor, nome="Filtro", custo=10, preco_venda=20, estoque_atual=7
+        )
+        Produto.objects.filter(pk=parado.pk).update(data_cadastro=self._em(date(2025, 1, 1)))
+        self._cenario()
+        fechar_dia(self.dia1)
+        # Parte do último fechamento do produto (dia 1), mesmo sem o dia 2 fechado
+        Produto.objects.filter(pk=self.produto.pk).update(estoque_atual=999)
+        self.assertEqual(fechar_dia(self.dia3), 1)
+
+        saldos = set(SaldoEstoqueDiario.objects.values_list('produto_id', 'data', 'saldo'))
+        self.assertEqual(saldos, {(self.produto.pk, self.dia1, 12), (self.produto.pk, self.dia3, 18)})
+        parado.refresh_from_db()
+        self.assertEqual(saldo_em(parado, self.dia3)[0], 7)
+
+    def test_consulta_usa_fechamento_mais_proximo(self):
+        self._cenario()
+        fechar_dia(self.dia2)
+
+        self.assertEqual(self._saldo(self.dia1), 12)
+        self.assertEqual(self._saldo(self.dia2), 8)
+        self.assertEqual(self._saldo(self.dia3), 18)
+
+    def test_consultas_constantes(self):
+        self._cenario()
+        fechar_dia(self.dia2)
+        self.produto.refresh_from_db()
+        for _ in range(30):
+            self._movimentar(self.dia3, 'SAIDA', 0)
+
+        with CaptureQueriesContext(connection) as consultas:
+            saldo_em(self.produto, self.dia3)
+        # Fechamento, movimentos ativos e (datas antigas) o arquivo frio
+        self.assertEqual(len(consultas), 3)
+
+    def test_endpoint_estoque_em(self):
+        self._cenario()
+        call_command('fechar_estoque_diario', data=self.dia1, stdout=open('/dev/null', 'w'))
+
+        response = APIClient().get(f'/api/produtos/{self.produto.pk}/estoque-em/?data=2025-03-02')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['estoque'], 8)
+        self.assertEqual(response.data['fechamento_base'], self.dia1)
+
+    def test_endpoint_data_invalida(self):
+        response = APIClient().get(f'/api/produtos/{self.produto.pk}/estoque-em/?data=ontem')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,99 @@
+from datetime import date
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from usuarios.models import Mecanico, Cliente, Fornecedor
+from veiculos.models import Veiculo, Servico
+from .models import Orcamento, ItemMovimentacao, Produto
+
+
+class ValorTotalOrcamentoTests(TestCase):
+    def setUp(self):
+        self.mecanico = Mecanico.objects.create(user=User.objects.create_user(username='mec_total', password='123'))
+        self.cliente = Cliente.objects.create(nome="Cliente", cpf="78978978978")
+        self.veiculo = Veiculo.objects.create(placa="TOT-0001", modelo="Gol", marca="VW", ano=2019, cliente=self.cliente)
+        fornecedor = Fornecedor.objects.create(nome="Fornecedor", cnpj="44444444000144")
+        self.produto = Produto.objects.create(fornecedor=fornecedor, nome="Vela", custo=10, preco_venda=20)
+        self.servico = Servico.objects.create(descricao="Revisão", preco_base=150)
+        self.orcamento = self._novo_orcamento()
+
+    def _novo_orcamento(self):
+        return Orcamento.objects.create(
+            cliente=self.cliente, veiculo=self.veiculo, mecanico=self.mecanico, validade=date.today()
+        )
+
+    def _total(self, orcamento):
+        orcamento.refresh_from_db()
+        return orcamento.valor_total
+
+    def test_total_acompanha_inclusao_alteracao_e_remocao(self):
+        vela = ItemMovimentacao.objects.create(
+            orcamento=self.orcamento, produto=self.produto, quantidade=4, valor_unitario=Decimal('20.00')
+        )
+        ItemMovimentacao.objects.create(orcamento=self.orcamento, servico=self.servico, valor_unitario=Decimal('150.00'))
+        self.assertEqual(self._total(self.orcamento), Decimal('230.00'))
+
+        vela.quantidade = 2
+        vela.save()
+        self.assertEqual(self._total(self.orcamento), Decimal('190.00'))
+
+        vela.delete()
+        self.assertEqual(self._total(self.orcamento), Decimal('150.00'))
+
+    def test_item_movido_para_outro_orcamento(self):
+        outro = self._novo_orcamento()
+        item = ItemMovimentacao.objects.create(
+            orcamento=self.orcamento, servico=self.servico, valor_unitario=Decimal('150.00')
+        )
+
+        item.orcamento = outro
+        item.save()
+
+        self.assertEqual(self._total(self.orcamento), Decimal('0.00'))
+        self.assertEqual(self._total(outro), Decimal('150.00'))
+
+    def test_salvar_instancia_antiga_nao_sobrescreve_o_total(self):
+        antigo = Orcamento.objects.get(pk=self.orcamento.pk)
+        ItemMovimentacao.objects.create(orcamento=self.orcamento, servico=self.servico, valor_unitario=Decimal('150.00'))
+
+        antigo.descricao = "Cliente pediu revisão completa"
+        antigo.save()
+        self.assertEqual(self._total(self.orcamento), Decimal('150.00'))
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin_total', password='123', is_staff=True))
+        response = client.post(f'/api/orcamentos/{self.orcamento.pk}/rejeitar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._total(self.orcamento), Decimal('150.00'))
+
+    def test_listagem_nao_consulta_itens_por_orcamento(self):
+        client = APIClient()
+        for _ in range(5):
+            ItemMovimentacao.objects.create(
+                orcamento=self._novo_orcamento(), servico=self.servico, valor_unitario=Decimal('150.00')
+            )
+        with CaptureQueriesContext(connection) as poucos:
+            client.get('/api/orcamentos/')
+
+        for _ in range(20):
+            ItemMovimentacao.objects.create(
+                orcamento=self._novo_orcamento(), servico=self.servico, valor_unitario=Decimal('150.00')
+            )
+        with CaptureQueriesContext(connection) as muitos:
+            response = client.get('/api/orcamentos/')
+
+        self.assertEqual(len(poucos), len(muitos))
+        self.assertEqual(len(muitos), 1)
+        self.assertEqual(response.data[-1]['valor_total'], '150.00')
+
+    def test_comando_reconstroi_total_divergente(self):
+        ItemMovimentacao.objects.create(orcamento=self.orcamento, servico=self.servico, valor_unitario=Decimal('150.00'))
+        Orcamento.objects.filter(pk=self.orcamento.pk).update(valor_total=Decimal('999.00'))
+
+        call_command('recalcular_totais_orcamento', verbosity=0, stdout=open('/dev/null', 'w'))
+
+        self.assertEqual(self._total(self.orcamento), Decimal('150.00'))
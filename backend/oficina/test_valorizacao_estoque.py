@@ -0,0 +1,83 @@
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from usuarios.models import Fornecedor
+from .models import Produto, MovimentacaoEstoque, ValorizacaoEstoque, CamadaCustoFIFO
+
+
+class ValorizacaoEstoqueTests(TestCase):
+    def setUp(self):
+        fornecedor = Fornecedor.objects.create(nome="Fornecedor", cnpj="15151515000115")
+        self.produto = Produto.objects.create(
+            fornecedor=fornecedor, nome="Pneu", custo=Decimal('100.00'), preco_venda=300
+        )
+
+    def _mov(self, tipo, quantidade, custo=None):
+        MovimentacaoEstoque.objects.create(
+            produto=self.produto, tipo_movimentacao=tipo, quantidade=quantidade, custo_unitario=custo
+        )
+
+    def _cenario(self):
+        self._mov('ENTRADA', 10, Decimal('100.00'))
+        self._mov('ENTRADA', 10, Decimal('130.00'))
+        self._mov('SAIDA', 15)
+        self._mov('ENTRADA', 5)  # sem custo: usa o custo de cadastro (100)
+
+    def _estado(self):
+        estado = ValorizacaoEstoque.objects.get(produto=self.produto)
+        return estado.quantidade, estado.custo_medio, estado.valor_medio, estado.valor_fifo, estado.fifo_pendente
+
+    def test_custo_medio_e_peps_incrementais(self):
+        self._cenario()
+
+        # Médio: 115 após as compras; 5 restantes a 115 + 5 a 100 = 107.50
+        # PEPS: restam 5 do lote de 130 e 5 do lote de 100 = 1150
+        self.assertEqual(self._estado(), (10, Decimal('107.5000'), Decimal('1075.00'), Decimal('1150.00'), 0))
+        self.assertEqual(
+            list(CamadaCustoFIFO.objects.filter(quantidade_restante__gt=0).order_by('id_camada')
+                 .values_list('custo_unitario', 'quantidade_restante')),
+            [(Decimal('130.0000'), 5), (Decimal('100.0000'), 5)]
+        )
+
+    def test_saida_sem_camada_fica_pendente(self):
+        self._mov('ENTRADA', 2, Decimal('50.00'))
+        Produto.objects.filter(pk=self.produto.pk).update(estoque_atual=10)
+        self._mov('SAIDA', 5)
+        self.assertEqual(self._estado()[3:], (Decimal('0.00'), 3))
+
+        self._mov('ENTRADA', 4, Decimal('80.00'))
+        self.assertEqual(self._estado()[3:], (Decimal('80.00'), 0))
+
+    def test_reconstrucao_reproduz_o_estado_incremental(self):
+        self._cenario()
+        incremental = self._estado()
+        ValorizacaoEstoque.objects.all().delete()
+        CamadaCustoFIFO.objects.all().delete()
+
+        call_command('reconstruir_valorizacao', stdout=StringIO())
+
+        self.assertEqual(self._estado(), incremental)
+        self.assertEqual(CamadaCustoFIFO.objects.filter(quantidade_restante__gt=0).count(), 2)
+
+    def test_venda_balcao_atualiza_valorizacao(self):
+        self._mov('ENTRADA', 10, Decimal('100.00'))
+
+        APIClient().post('/api/vendas/', {
+            'itens': [{'produto': self.produto.pk, 'quantidade': 4, 'valor_unitario': '300.00'}]
+        }, format='json')
+
+        self.assertEqual(self._estado()[:4], (6, Decimal('100.0000'), Decimal('600.00'), Decimal('600.00')))
+
+    def test_relatorio(self):
+        self._cenario()
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin_valor', is_staff=True))
+
+        response = client.get('/api/estoque/valorizacao/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totais']['valor_fifo'], Decimal('1150.00'))
+        self.assertEqual(response.data['produtos'][0]['produto__nome'], "Pneu")
@@ -0,0 +1,72 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from usuarios.models import Fornecedor
+from .models import Produto, Venda, ItemVenda, MovimentacaoEstoque
+
+
+class VendaEmLoteTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='forn_lote', password='123')
+        self.fornecedor = Fornecedor.objects.create(user=self.user, nome="Fornecedor", cnpj="22222222000122")
+        self.produtos = [
+            Produto.objects.create(
+                fornecedor=self.fornecedor, nome=f"Peça {i}", custo=5, preco_venda=10, estoque_atual=100
+            )
+            for i in range(30)
+        ]
+
+    def _vender(self, produtos, quantidade=1):
+        data = {'itens': [
+            {'produto': p.id_produto, 'quantidade': quantidade, 'valor_unitario': 10.00} for p in produtos
+        ]}
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post('/api/vendas/', data, format='json')
+        return response, len(consultas)
+
+    def test_numero_de_consultas_nao_depende_da_quantidade_de_itens(self):
+        response_1, consultas_1 = self._vender(self.produtos[:1])
+        response_30, consultas_30 = self._vender(self.produtos)
+
+        self.assertEqual(response_1.status_code, 201)
+        self.assertEqual(response_30.status_code, 201)
+        self.assertEqual(consultas_1, consultas_30)
+        self.assertEqual(len(response_30.data['itens']), 30)
+        self.assertEqual(float(response_30.data['total']), 300.00)
+
+    def test_itens_e_historico_gravados(self):
+        response, _ = self._vender(self.produtos[:3], quantidade=2)
+
+        venda = Venda.objects.get(pk=response.data['id_venda'])
+        self.assertEqual(ItemVenda.objects.filter(venda=venda).count(), 3)
+        self.assertEqual(MovimentacaoEstoque.objects.filter(venda=venda, tipo_movimentacao='SAIDA').count(), 3)
+        self.assertEqual(response.data['itens'][0]['nome_produto'], "Peça 0")
+        for produto in self.produtos[:3]:
+            produto.refresh_from_db()
+            self.assertEqual(produto.estoque_atual, 98)
+
+    def test_linhas_repetidas_do_mesmo_produto_somam_no_estoque(self):
+        """Duas linhas de 60 do mesmo produto excedem o saldo de 100 e a venda inteira é recusada"""
+        produto = self.produtos[0]
+        data = {'itens': [
+            {'produto': produto.id_produto, 'quantidade': 60, 'valor_unitario': 10.00},
+            {'produto': produto.id_produto, 'quantidade': 60, 'valor_unitario': 10.00},
+        ]}
+        response = self.client.post('/api/vendas/', data, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("superior ao estoque disponível", str(response.data))
+        produto.refresh_from_db()
+        self.assertEqual(produto.estoque_atual, 100)
+        self.assertEqual(Venda.objects.count(), 0)
+
+    def test_produto_inexistente_e_quantidade_invalida(self):
+        inexistente = {'itens': [{'produto': 9999, 'quantidade': 1, 'valor_unitario': 10.00}]}
+        negativa = {'itens': [{'produto': self.produtos[0].id_produto, 'quantidade': -1, 'valor_unitario': 10.00}]}
+
+        self.assertEqual(self.client.post('/api/vendas/', inexistente, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/vendas/', negativa, format='json').status_code, 400)
+        self.assertEqual(Venda.objects.count(), 0)
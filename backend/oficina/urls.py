@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrcamentoViewSet, ItemMovimentacaoViewSet, VendaViewSet, ChecklistViewSet, LaudoTecnicoViewSet, ProdutoViewSet, OrdemServicoViewSet, MovimentacaoEstoqueViewSet, NotificacaoViewSet, PedidoCompraViewSet
+from .views import OrcamentoViewSet, ItemMovimentacaoViewSet, VendaViewSet, ChecklistViewSet, LaudoTecnicoViewSet, ProdutoViewSet, OrdemServicoViewSet, MovimentacaoEstoqueViewSet, NotificacaoViewSet, PedidoCompraViewSet, valorizacao_estoque
 from usuarios.views import FornecedorViewSet
 
 router = DefaultRouter()
@@ -18,4 +18,5 @@ router.register(r'pedidos-compra', PedidoCompraViewSet, basename='pedido-compra'
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('estoque/valorizacao/', valorizacao_estoque, name='valorizacao-estoque'),
 ]
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Valorização do estoque (custo médio ponderado e PEPS/FIFO).
+
+O estado de cada produto (ValorizacaoEstoque) e as camadas PEPS em aberto
+(CamadaCustoFIFO) são atualizados junto com cada movimentação gravada, então o
+relatório só lê o estado atual em vez de reprocessar o histórico.
+
+- ENTRADA: recalcula o custo médio e abre uma camada com o custo da compra
+  (sem custo_unitario, usa o custo de cadastro do produto).
+- SAIDA: baixa a quantidade pelo custo médio (que não muda) e consome as
+  camadas mais antigas. Saídas sem camada disponível ficam em `fifo_pendente`
+  e são cobertas pelas próximas entradas.
+
+O comando reconstruir_valorizacao refaz tudo a partir do histórico.
+"""
+from collections import defaultdict, deque
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import Produto, ValorizacaoEstoque, CamadaCustoFIFO
+
+CENTAVO = Decimal('0.01')
+CASAS_CUSTO = Decimal('0.0001')
+
+
+def _novo_custo_medio(quantidade_antes, custo_medio, quantidade, custo):
+    # Estoque negativo (OS pode baixar sem saldo) não pesa no custo médio
+    base = max(quantidade_antes, 0)
+    return ((base * custo_medio + quantidade * custo) / (base + quantidade)).quantize(CASAS_CUSTO)
+
+
+def registrar_movimentos(movimentos):
+    """
+    Aplica na valorização uma lista de movimentações já gravadas (uma ou um lote
+    de bulk_create), com consultas fixas: trava os estados e as camadas abertas
+    dos produtos envolvidos, processa em memória e grava tudo em lote.
+    Deve rodar na mesma transação que gravou as movimentações.
+    """
+    movimentos = [m for m in movimentos if m.quantidade > 0]
+    if not movimentos:
+        return
+
+    produto_ids = {m.produto_id for m in movimentos}
+    com_saida = {m.produto_id for m in movimentos if m.tipo_movimentacao == 'SAIDA'}
+
+    with transaction.atomic():
+        estados = {
+            estado.produto_id: estado
+            for estado in ValorizacaoEstoque.objects.select_for_update().filter(produto_id__in=produto_ids)
+        }
+        for produto_id in produto_ids - estados.keys():
+            estados[produto_id] = ValorizacaoEstoque(produto_id=produto_id)
+
+        sem_custo = {
+            m.produto_id for m in movimentos if m.tipo_movimentacao == 'ENTRADA' and m.custo_unitario is None
+        }
+        custos_cadastro = dict(Produto.objects.filter(pk__in=sem_custo).values_list('pk', 'custo')) if sem_custo else {}
+
+        camadas = defaultdict(deque)
+        if com_saida:
+            abertas = CamadaCustoFIFO.objects.select_for_update().filter(
+                produto_id__in=com_saida, quantidade_restante__gt=0
+            ).order_by('produto_id', 'id_camada')
+            for camada in abertas:
+                camadas[camada.produto_id].append(camada)
+
+        novas_camadas, camadas_alteradas = [], {}
+
+        for mov in movimentos:
+            estado = estados[mov.produto_id]
+            quantidade = mov.quantidade
+
+            if mov.tipo_movimentacao == 'ENTRADA':
+                custo = Decimal(str(
+                    mov.custo_unitario if mov.custo_unitario is not None else custos_cadastro[mov.produto_id]
+                ))
+                estado.custo_medio = _novo_custo_medio(estado.quantidade, estado.custo_medio, quantidade, custo)
+                estado.quantidade += quantidade
+
+                cobertas = min(estado.fifo_pendente, quantidade)
+                estado.fifo_pendente -= cobertas
+                if quantidade > cobertas:
+                    camada = CamadaCustoFIFO(
+                        produto_id=mov.produto_id, custo_unitario=custo,
+                        quantidade_inicial=quantidade, quantidade_restante=quantidade - cobertas,
+                        data_entrada=mov.data_movimentacao,
+                    )
+                    novas_camadas.append(camada)
+                    camadas[mov.produto_id].append(camada)
+                    estado.valor_fifo += camada.quantidade_restante * custo
+            else:
+                estado.quantidade -= quantidade
+                fila = camadas[mov.produto_id]
+                while quantidade and fila:
+                    camada = fila[0]
+                    consumidas = min(camada.quantidade_restante, quantidade)
+                    camada.quantidade_restante -= consumidas
+                    quantidade -= consumidas
+                    estado.valor_fifo -= consumidas * camada.custo_unitario
+                    if camada.pk:
+                        camadas_alteradas[camada.pk] = camada
+                    if not camada.quantidade_restante:
+                        fila.popleft()
+                estado.fifo_pendente += quantidade
+
+            estado.valor_medio = (max(estado.quantidade, 0) * estado.custo_medio).quantize(CENTAVO)
+            estado.valor_fifo = Decimal(estado.valor_fifo).quantize(CENTAVO)
+
+        # Um único upsert grava estados novos e existentes
+        ValorizacaoEstoque.objects.bulk_create(
+            estados.values(),
+            update_conflicts=True,
+            unique_fields=['produto'],
+            update_fields=['quantidade', 'custo_medio', 'valor_medio', 'valor_fifo', 'fifo_pendente', 'data_atualizacao'],
+        )
+        # Camada aberta e consumida no mesmo lote é gravada já zerada (fica fora do índice parcial)
+        CamadaCustoFIFO.objects.bulk_create(novas_camadas)
+        CamadaCustoFIFO.objects.bulk_update(camadas_alteradas.values(), ['quantidade_restante'])
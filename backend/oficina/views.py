@@ -1,13 +1,20 @@
 from rest_framework import viewsets, status, serializers
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from django.conf import settings
 from django.db import models, transaction
+from django.db.models import Count, Sum
+from django.http import Http404
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import date
+import heapq
+from itertools import islice
 from .models import (
     Orcamento, ItemMovimentacao, Venda, ItemVenda, 
     Checklist, LaudoTecnico, Produto, OrdemServico, 
-    Notificacao, MovimentacaoEstoque, PedidoCompra
+    Notificacao, MovimentacaoEstoque, PedidoCompra, ValorizacaoEstoque
 )
 from .serializers import (
     OrcamentoSerializer, ItemMovimentacaoSerializer, 
@@ -15,10 +22,16 @@ from .serializers import (
     ProdutoSerializer, OrdemServicoSerializer, NotificacaoSerializer,
     MovimentacaoEstoqueSerializer, PedidoCompraSerializer
 )
-from usuarios.models import Fornecedor
+from .idempotencia import idempotente
+from .numeracao import proximo_numero_os
+from .estoque import reservar_orcamento, EstoqueInsuficiente
+from .saldos import saldo_em
+from .arquivo import instante, limite_arquivamento, movimento_arquivado, movimentos_arquivados
+from .alertas import contar_nao_lidas, notificacoes_nao_lidas, invalidar_contagem
+from usuarios.principal import principal
 
 class OrcamentoViewSet(viewsets.ModelViewSet):
-    queryset = Orcamento.objects.all()
+    queryset = Orcamento.objects.select_related('veiculo', 'mecanico', 'cliente', 'checklist', 'agendamento')
     serializer_class = OrcamentoSerializer
 
     @action(detail=True, methods=['post'])
@@ -56,43 +69,48 @@ class OrcamentoViewSet(viewsets.ModelViewSet):
         return Response({"mensagem": "Orçamento finalizado e notificação enviada."}, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['post'])
+    @idempotente
     def aprovar(self, request, pk=None):
         """Aprovar orçamento e criar Ordem de Serviço (PB08)"""
         orcamento = self.get_object()
 
-        if orcamento.status != 'PENDENTE':
-            return Response(
-                {'erro': 'Orçamento já foi aprovado ou rejeitado'},
-                status=status.HTTP_400_BAD_REQUEST
+        with transaction.atomic():
+            # Trava o orçamento: duas aprovações simultâneas não geram duas OS
+            orcamento = Orcamento.objects.select_for_update().get(pk=orcamento.pk)
+
+            if orcamento.status != 'PENDENTE':
+                return Response(
+                    {'erro': 'Orçamento já foi aprovado ou rejeitado'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Reservar as peças do orçamento: outro orçamento ou a venda balcão não podem usá-las.
+            # O que não há em estoque precisa ser comprado: a OS nasce aguardando as peças
+            faltando = reservar_orcamento(orcamento)
+
+            # Criar OS (número único reservado no contador do ano)
+            ordem_servico = OrdemServico.objects.create(
+                numero_os=proximo_numero_os(),
+                orcamento=orcamento,
+                veiculo=orcamento.veiculo,
+                mecanico_responsavel=orcamento.mecanico,
+                status='AGUARDANDO_PECAS' if faltando else 'EM_ANDAMENTO'
             )
 
-        # Gerar número único de OS
-        ultimo_numero = OrdemServico.objects.aggregate(models.Max('numero_os'))['numero_os__max']
-        if ultimo_numero is None:
-            numero_os_gerado = 1
-        else:
-            try:
-                numero_os_gerado = int(ultimo_numero) + 1
-            except ValueError:
-                numero_os_gerado = 1
-
-        # Criar OS
-        ordem_servico = OrdemServico.objects.create(
-            numero_os=str(numero_os_gerado),
-            orcamento=orcamento,
-            veiculo=orcamento.veiculo,
-            mecanico_responsavel=orcamento.mecanico,
-            status='EM_ANDAMENTO'
-        )
-
-        # Atualizar status do orçamento
-        orcamento.status = 'APROVADO'
-        orcamento.save()
+            # Atualizar status do orçamento
+            orcamento.status = 'APROVADO'
+            orcamento.save(update_fields=['status'])
 
+        nomes = dict(Produto.objects.filter(pk__in=faltando).values_list('pk', 'nome'))
         return Response({
             'mensagem': 'Orçamento aprovado com sucesso',
             'numero_os': ordem_servico.numero_os,
-            'id_os': ordem_servico.id_os
+            'id_os': ordem_servico.id_os,
+            'status_os': ordem_servico.status,
+            'pecas_pendentes': [
+                {'produto': produto_id, 'nome': nomes.get(produto_id), 'quantidade': quantidade}
+                for produto_id, quantidade in faltando.items()
+            ],
         })
 
     @action(detail=True, methods=['post'])
@@ -112,7 +130,7 @@ class OrcamentoViewSet(viewsets.ModelViewSet):
         # Atualiza Status
         orcamento.status = 'REJEITADO'
         # Opcional: Salvar motivo se houver campo no model (request.data.get('motivo'))
-        orcamento.save()
+        orcamento.save(update_fields=['status'])
 
         return Response({"mensagem": "Orçamento rejeitado."}, status=status.HTTP_200_OK)
 
@@ -121,10 +139,11 @@ class ItemMovimentacaoViewSet(viewsets.ModelViewSet):
     serializer_class = ItemMovimentacaoSerializer
 
 class VendaViewSet(viewsets.ModelViewSet):
-    queryset = Venda.objects.all()
+    queryset = Venda.objects.prefetch_related('itens__produto')
     serializer_class = VendaSerializer
     permission_classes = [AllowAny]
 
+    @idempotente
     def create(self, request, *args, **kwargs):
         """
         Sobrescreve o create para garantir atomicidade.
@@ -172,13 +191,9 @@ class LaudoTecnicoViewSet(viewsets.ModelViewSet):
         # Assumiremos que o frontend envia o ID ou o backend pega do user.
         # Vamos manter simples: se enviado no serializer, usa. Se não, tenta user.
         
-        mecanico = None
-        if self.request.user and self.request.user.is_authenticated:
-            if hasattr(self.request.user, 'mecanico'):
-                mecanico = self.request.user.mecanico
-        
-        if mecanico:
-            serializer.save(mecanico=mecanico)
+        atual = principal(self.request)
+        if atual.is_mecanico:
+            serializer.save(mecanico_id=atual.perfil_id)
         else:
             serializer.save()
 
@@ -198,38 +213,65 @@ class ProdutoViewSet(viewsets.ModelViewSet):
         - Admin: vê todos
         - Outros (mecânicos, vendas balcão): vê todos os produtos
         """
-        user = self.request.user
-        
-        # Se não autenticado ou é mecânico/outros → retorna todos os produtos
-        if not user.is_authenticated:
-            return Produto.objects.all()
+        queryset = Produto.objects.select_related('fornecedor')
         
-        # Se é admin → retorna todos
-        if user.is_staff:
-            return Produto.objects.all()
+        # Fornecedor autenticado (não admin) → apenas seus produtos;
+        # não autenticado, admin ou mecânico/outros → todos os produtos
+        atual = principal(self.request)
+        if atual.is_fornecedor:
+            queryset = queryset.filter(fornecedor_id=atual.perfil_id)
         
-        # Se é fornecedor → retorna apenas seus produtos
-        try:
-            fornecedor = Fornecedor.objects.get(user=user)
-            queryset = Produto.objects.filter(fornecedor=fornecedor)
-        except Fornecedor.DoesNotExist:
-            # Se não é fornecedor (ex: mecânico), retorna todos os produtos
-            queryset = Produto.objects.all()
-        
-        # Filtro de Estoque Baixo (PB10)
+        # Filtro de Estoque Baixo (PB10) - usa a coluna gerada deficit_estoque (índice parcial)
         estoque_baixo = self.request.query_params.get('estoque_baixo', None)
         if estoque_baixo == 'true':
-            queryset = queryset.filter(estoque_atual__lt=F('estoque_minimo'))
+            queryset = queryset.filter(deficit_estoque__gt=0)
             
         return queryset
 
+    @action(detail=False, methods=['get'], url_path='estoque-baixo')
+    def estoque_baixo(self, request):
+        """
+        Produtos abaixo do estoque mínimo, do maior para o menor déficit (PB10).
+        Aceita ?limite=N para trazer só os mais críticos.
+        """
+        queryset = self.get_queryset().filter(deficit_estoque__gt=0).order_by('-deficit_estoque', 'id_produto')
+
+        limite = request.query_params.get('limite', None)
+        if limite and limite.isdigit():
+            queryset = queryset[:int(limite)]
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'], url_path='estoque-em')
+    def estoque_em(self, request, pk=None):
+        """
+        Saldo do produto ao fim de uma data: ?data=AAAA-MM-DD (PB11).
+        Parte do fechamento diário mais próximo em vez de somar todo o histórico.
+        """
+        produto = self.get_object()
+        try:
+            data = date.fromisoformat(request.query_params.get('data', ''))
+        except ValueError:
+            return Response(
+                {'erro': 'Informe a data no formato AAAA-MM-DD (?data=2025-01-31)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        saldo, fechamento = saldo_em(produto, data)
+        return Response({
+            'produto': produto.pk,
+            'data': data,
+            'estoque': saldo,
+            'fechamento_base': fechamento,
+        })
+
     def perform_create(self, serializer):
         """TC05 - Cenário 1: Vínculo Automático do Fornecedor"""
-        try:
-            fornecedor = Fornecedor.objects.get(user=self.request.user)
-            serializer.save(fornecedor=fornecedor)
-        except Fornecedor.DoesNotExist:
+        atual = principal(self.request)
+        if not atual.is_fornecedor:
             raise serializers.ValidationError("Apenas fornecedores podem cadastrar produtos.")
+        serializer.save(fornecedor_id=atual.perfil_id)
         
 class OrdemServicoViewSet(viewsets.ModelViewSet):
     """
@@ -254,28 +296,21 @@ class OrdemServicoViewSet(viewsets.ModelViewSet):
             'orcamento'
         ).all()
         
-        user = self.request.user
+        # Papel vem do token (usuarios/principal.py), sem consultar o perfil
+        atual = principal(self.request)
         
         # Admin vê tudo
-        if user.is_staff:
+        if atual.is_admin:
             pass  # Não filtra nada
+        elif atual.is_mecanico:
+            # Mecânico vê apenas suas OS
+            queryset = queryset.filter(mecanico_responsavel_id=atual.perfil_id)
+        elif atual.is_cliente:
+            # Cliente vê apenas OS dos seus veículos
+            queryset = queryset.filter(veiculo__cliente_id=atual.perfil_id)
         else:
-            # Verificar se é mecânico
-            try:
-                from usuarios.models import Mecanico
-                mecanico = Mecanico.objects.get(user=user)
-                # Mecânico vê apenas suas OS
-                queryset = queryset.filter(mecanico_responsavel=mecanico)
-            except Mecanico.DoesNotExist:
-                # Se não for mecânico, assume que é cliente
-                try:
-                    from usuarios.models import Cliente
-                    cliente = Cliente.objects.get(user=user)
-                    # Cliente vê apenas OS dos seus veículos
-                    queryset = queryset.filter(veiculo__cliente=cliente)
-                except Cliente.DoesNotExist:
-                    # Se não for nem mecânico nem cliente, retorna vazio
-                    queryset = queryset.none()
+            # Se não for nem mecânico nem cliente, retorna vazio
+            queryset = queryset.none()
 
         # Filtros opcionais por query params
         veiculo_id = self.request.query_params.get('veiculo', None)
@@ -297,14 +332,21 @@ class NotificacaoViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        queryset = Notificacao.objects.all()
+        queryset = Notificacao.objects.select_related('produto')
         
         # Filtrar por não lidas (PB12 - TC12 Cenário 2)
         nao_lidas = self.request.query_params.get('nao_lidas', None)
         if nao_lidas == 'true':
-            queryset = queryset.filter(lida=False)
+            queryset = queryset.filter(lida=False, resolvida=False)
         
-        return queryset.order_by('-data_criacao')
+        queryset = queryset.order_by('-data_criacao')
+
+        # Só as mais recentes (ex.: ?limite=3 no painel)
+        limite = self.request.query_params.get('limite', None)
+        if self.action == 'list' and limite and limite.isdigit():
+            queryset = queryset[:int(limite)]
+
+        return queryset
 
     @action(detail=True, methods=['post'])
     def marcar_lida(self, request, pk=None):
@@ -314,6 +356,44 @@ class NotificacaoViewSet(viewsets.ModelViewSet):
         notificacao.save()
         return Response({'status': 'Notificação marcada como lida'})
 
+    @action(detail=False, methods=['get'])
+    def contagem(self, request):
+        """Quantidade de notificações não lidas, para o badge do painel"""
+        return Response({'nao_lidas': contar_nao_lidas()})
+
+    @action(detail=False, methods=['post'])
+    def marcar_todas_lidas(self, request):
+        """Marca todas as notificações não lidas como lidas com um único UPDATE"""
+        marcadas = notificacoes_nao_lidas().update(lida=True)
+        invalidar_contagem()
+        return Response({'status': 'Notificações marcadas como lidas', 'marcadas': marcadas})
+
+def _instante_do_filtro(valor):
+    """data_inicio/data_fim da query string (data ou data e hora) como datetime com fuso"""
+    if not valor:
+        return None
+    instante_filtro = parse_datetime(valor)
+    if instante_filtro is None:
+        data_filtro = parse_date(valor)
+        if data_filtro is None:
+            return None
+        return instante(data_filtro)
+    if timezone.is_naive(instante_filtro):
+        instante_filtro = timezone.make_aware(instante_filtro)
+    return instante_filtro
+
+
+def _paginacao(request):
+    """(limit, offset) da query string, dentro dos limites de MOVIMENTACOES_POR_PAGINA*"""
+    def inteiro(nome, padrao):
+        try:
+            return max(int(request.query_params.get(nome, padrao)), 0)
+        except (TypeError, ValueError):
+            return padrao
+    limite = min(inteiro('limit', settings.MOVIMENTACOES_POR_PAGINA), settings.MOVIMENTACOES_POR_PAGINA_MAX)
+    return limite, inteiro('offset', 0)
+
+
 class MovimentacaoEstoqueViewSet(viewsets.ModelViewSet):
     """
     ViewSet para Movimentações de Estoque (PB11)
@@ -348,6 +428,50 @@ class MovimentacaoEstoqueViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-data_movimentacao')
 
+    def list(self, request, *args, **kwargs):
+        """
+        Lista da mais recente para a mais antiga, uma página por vez: parâmetros
+        limit (padrão MOVIMENTACOES_POR_PAGINA, no máximo MOVIMENTACOES_POR_PAGINA_MAX)
+        e offset. Resposta: {"resultados": [...], "proximo": offset da página
+        seguinte ou null na última}. Meses antigos ficam no arquivo frio (ver
+        arquivo.py); sempre que o período pedido alcança o limite do arquivo (sem
+        data_inicio também alcança), eles são mesclados às movimentações ativas,
+        lendo só os meses que a página usa.
+        """
+        limite, deslocamento = _paginacao(request)
+        inicio = _instante_do_filtro(request.query_params.get('data_inicio', None))
+        fim = _instante_do_filtro(request.query_params.get('data_fim', None))
+
+        # Uma linha a mais diz se existe página seguinte
+        ativas = self.get_queryset()[:deslocamento + limite + 1]
+        if inicio is not None and inicio >= instante(limite_arquivamento()):
+            pagina = list(ativas[deslocamento:])
+        else:
+            arquivadas = movimentos_arquivados(
+                inicio, fim,
+                produto=request.query_params.get('produto', None),
+                tipo=request.query_params.get('tipo', None),
+            )
+            mescladas = heapq.merge(
+                ativas.iterator(), arquivadas, key=lambda mov: mov.data_movimentacao, reverse=True
+            )
+            pagina = list(islice(mescladas, deslocamento, deslocamento + limite + 1))
+        proximo = deslocamento + limite if len(pagina) > limite else None
+        return Response({
+            'resultados': self.get_serializer(pagina[:limite], many=True).data,
+            'proximo': proximo,
+        })
+
+    def retrieve(self, request, *args, **kwargs):
+        """Movimentação pelo id; as que já foram para o arquivo frio também são encontradas"""
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            movimentacao = movimento_arquivado(kwargs['pk'])
+            if movimentacao is None:
+                raise
+            return Response(self.get_serializer(movimentacao).data)
+
     def get_permissions(self):
         """Apenas Admin pode criar ENTRADA manual"""
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -364,19 +488,22 @@ class PedidoCompraViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
+        atual = principal(self.request)
         
         # Admin vê todos os pedidos
-        if user.is_staff:
-            return PedidoCompra.objects.all()
-        
-        # Fornecedor vê apenas seus pedidos
-        try:
-            fornecedor = Fornecedor.objects.get(user=user)
-            return PedidoCompra.objects.filter(fornecedor=fornecedor)
-        except Fornecedor.DoesNotExist:
+        if atual.is_admin:
+            queryset = PedidoCompra.objects.all()
+        elif atual.is_fornecedor:
+            # Fornecedor vê apenas seus pedidos (sugestões só chegam a ele depois de confirmadas)
+            queryset = PedidoCompra.objects.filter(fornecedor_id=atual.perfil_id).exclude(status='SUGERIDO')
+        else:
             return PedidoCompra.objects.none()
 
+        status_pedido = self.request.query_params.get('status', None)
+        if status_pedido:
+            queryset = queryset.filter(status=status_pedido)
+        return queryset
+
     def perform_create(self, serializer):
         """Admin cria pedido - preenche automaticamente o fornecedor e valor_unitario do produto"""
         produto = serializer.validated_data['produto']
@@ -392,6 +519,7 @@ class PedidoCompraViewSet(viewsets.ModelViewSet):
         )
 
     @action(detail=True, methods=['post'])
+    @idempotente
     def aprovar(self, request, pk=None):
         """
         Fornecedor aprova o pedido:
@@ -399,52 +527,52 @@ class PedidoCompraViewSet(viewsets.ModelViewSet):
         2. Cria entrada de estoque na oficina
         """
         pedido = self.get_object()
-        
-        # Validações
-        if pedido.status != 'PENDENTE':
-            return Response(
-                {'erro': 'Este pedido já foi processado'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        produto = pedido.produto
-        
-        # Verifica se fornecedor tem estoque
-        if produto.estoque_atual < pedido.quantidade:
-            return Response(
-                {'erro': f'Estoque insuficiente. Disponível: {produto.estoque_atual}'},
-                status=status.HTTP_400_BAD_REQUEST
+
+        with transaction.atomic():
+            # Trava o pedido: duas aprovações simultâneas não movimentam o estoque duas vezes
+            pedido = PedidoCompra.objects.select_for_update().select_related('produto__fornecedor').get(pk=pedido.pk)
+
+            # Validações
+            if pedido.status != 'PENDENTE':
+                return Response(
+                    {'erro': 'Este pedido já foi processado'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            produto = pedido.produto
+
+            # 1. Registra saída no estoque do fornecedor (o saldo é baixado pelo próprio histórico)
+            try:
+                MovimentacaoEstoque.objects.create(
+                    produto=produto,
+                    tipo_movimentacao='SAIDA',
+                    quantidade=pedido.quantidade,
+                    observacao=f'Venda para Oficina - Pedido #{pedido.id_pedido}'
+                )
+            except EstoqueInsuficiente as e:
+                return Response(
+                    {'erro': f'Estoque insuficiente. Disponível: {e.disponivel}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            estoque_fornecedor = produto.estoque_atual
+
+            # 2. Registra entrada no estoque da oficina (movimentação separada)
+            MovimentacaoEstoque.objects.create(
+                produto=produto,
+                tipo_movimentacao='ENTRADA',
+                quantidade=pedido.quantidade,
+                custo_unitario=pedido.valor_unitario,
+                observacao=f'Compra do Fornecedor {produto.fornecedor.nome} - Pedido #{pedido.id_pedido}'
             )
-        
-        # 1. Diminui estoque do fornecedor
-        produto.estoque_atual -= pedido.quantidade
-        produto.save()
-        
-        # 2. Registra saída no estoque do fornecedor
-        MovimentacaoEstoque.objects.create(
-            produto=produto,
-            tipo_movimentacao='SAIDA',
-            quantidade=pedido.quantidade,
-            observacao=f'Venda para Oficina - Pedido #{pedido.id_pedido}'
-        )
-        
-        # 3. Registra entrada no estoque da oficina (movimentação separada)
-        MovimentacaoEstoque.objects.create(
-            produto=produto,
-            tipo_movimentacao='ENTRADA',
-            quantidade=pedido.quantidade,
-            custo_unitario=pedido.valor_unitario,
-            observacao=f'Compra do Fornecedor {produto.fornecedor.nome} - Pedido #{pedido.id_pedido}'
-        )
-        
-        # 4. Atualiza status do pedido
-        pedido.status = 'APROVADO'
-        pedido.data_aprovacao = timezone.now()
-        pedido.save()
-        
+
+            # 3. Atualiza status do pedido
+            pedido.status = 'APROVADO'
+            pedido.data_aprovacao = timezone.now()
+            pedido.save()
+
         return Response({
             'mensagem': 'Pedido aprovado com sucesso!',
-            'estoque_fornecedor': produto.estoque_atual,
+            'estoque_fornecedor': estoque_fornecedor,
             'estoque_oficina': produto.estoque_atual  # Após a entrada
         })
 
@@ -464,4 +592,81 @@ class PedidoCompraViewSet(viewsets.ModelViewSet):
         pedido.observacao = f'Rejeitado: {motivo}'
         pedido.save()
         
-        return Response({'mensagem': 'Pedido rejeitado'})
\ No newline at end of file
+        return Response({'mensagem': 'Pedido rejeitado'})
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def sugestoes(self, request):
+        """
+        Pedidos sugeridos pela previsão de demanda (comando sugerir_pedidos_compra),
+        agrupados por fornecedor para o admin revisar.
+        URL: /api/pedidos-compra/sugestoes/
+        """
+        sugestoes = (
+            PedidoCompra.objects.filter(status='SUGERIDO')
+            .select_related('produto', 'fornecedor')
+            .order_by('fornecedor_id', 'produto__nome')
+        )
+        fornecedores = {}
+        for pedido in sugestoes:
+            grupo = fornecedores.setdefault(pedido.fornecedor_id, {
+                'fornecedor': pedido.fornecedor_id,
+                'fornecedor_nome': pedido.fornecedor.nome,
+                'valor_total': 0,
+                'pedidos': [],
+            })
+            grupo['valor_total'] += pedido.valor_total
+            grupo['pedidos'].append(PedidoCompraSerializer(pedido).data)
+        return Response(list(fornecedores.values()))
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def confirmar_sugestoes(self, request):
+        """
+        Admin confirma sugestões: viram pedidos PENDENTE e aparecem para o fornecedor.
+        Body: {"ids": [1, 2, ...]} ou {"fornecedor": <id>} (todas as sugestões dele).
+        URL: /api/pedidos-compra/confirmar_sugestoes/
+        """
+        ids = request.data.get('ids')
+        fornecedor = request.data.get('fornecedor')
+        if not ids and not fornecedor:
+            return Response(
+                {'erro': 'Informe "ids" ou "fornecedor"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        sugestoes = PedidoCompra.objects.filter(status='SUGERIDO')
+        if ids:
+            sugestoes = sugestoes.filter(pk__in=ids)
+        if fornecedor:
+            sugestoes = sugestoes.filter(fornecedor_id=fornecedor)
+        confirmados = sugestoes.update(status='PENDENTE', data_pedido=timezone.now())
+
+        return Response({'confirmados': confirmados})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def valorizacao_estoque(request):
+    """
+    Valor do estoque por custo médio e por PEPS (FIFO), lido do estado mantido
+    a cada movimentação (ver valorizacao.py) - sem reprocessar o histórico.
+    Filtros: ?fornecedor=<id>; ?limite=N produtos de maior valor (padrão 50).
+    """
+    estados = ValorizacaoEstoque.objects.all()
+    fornecedor = request.query_params.get('fornecedor', None)
+    if fornecedor:
+        estados = estados.filter(produto__fornecedor_id=fornecedor)
+
+    totais = estados.aggregate(
+        produtos=Count('produto'),
+        quantidade=Sum('quantidade'),
+        valor_medio=Sum('valor_medio'),
+        valor_fifo=Sum('valor_fifo'),
+    )
+
+    limite = request.query_params.get('limite', '50')
+    limite = int(limite) if limite.isdigit() else 50
+    produtos = estados.order_by('-valor_medio').values(
+        'produto', 'produto__nome', 'quantidade', 'custo_medio', 'valor_medio', 'valor_fifo', 'fifo_pendente'
+    )[:limite]
+
+    return Response({'totais': totais, 'produtos': list(produtos)})
@@ -1,37 +1,139 @@
+"""
+Autenticação: login por username, e-mail ou CPF/CNPJ (EmailOrUsernameModelBackend)
+e JWT com cache do usuário (JWTAuthenticationComCache).
+
+Toda requisição autenticada por JWT carregava a linha de auth.User do banco.
+Aqui o usuário fica no cache local do processo (CACHES['usuarios'], TTL curto),
+com a chave `usuario:<id>:<versão do token>`. O painel do mecânico dispara ~10
+GETs em paralelo: uma leitura do banco serve todos.
+- salvar ou excluir o User (sinais em signals.py) apaga a entrada;
+- `revogar_tokens` incrementa VersaoToken: os tokens emitidos antes deixam de
+  valer (a versão deles não confere com a do banco) e a entrada é apagada.
+Outros processos percebem alterações em até o TTL do cache.
+"""
+import logging
+import time
+
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.contrib.auth.hashers import identify_hasher
+from django.core.cache import caches
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .identificadores import formas_de_login, tipo_de
+from .senhas import gastar_hash, verificar_senha
+from .models import VersaoToken
 
 User = get_user_model()
 
+logger = logging.getLogger('usuarios.login')
+
+CLAIM_VERSAO = 'versao'
+
+
+def _cache():
+    return caches['usuarios']
+
+
+def _chave(user_id, versao):
+    return f'usuario:{user_id}:{versao}'
+
+
+def versao_dos_tokens(user_id):
+    return VersaoToken.objects.filter(user_id=user_id).values_list('versao', flat=True).first() or 0
+
+
+def invalidar_usuario(user_id):
+    """Apaga o usuário do cache deste processo"""
+    versao = _cache().get(f'usuario:{user_id}')
+    if versao is not None:
+        _cache().delete_many([f'usuario:{user_id}', _chave(user_id, versao)])
+
+
+def revogar_tokens(user):
+    """Invalida todos os tokens já emitidos para o usuário (sair de todas as sessões)"""
+    VersaoToken.objects.get_or_create(user_id=user.pk)
+    VersaoToken.objects.filter(user_id=user.pk).update(versao=F('versao') + 1)
+    invalidar_usuario(user.pk)
+
+
+class JWTAuthenticationComCache(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token sem identificação de usuário.')
+        # Tokens emitidos antes da versão existir valem como versão 0
+        versao = validated_token.get(CLAIM_VERSAO, 0)
+
+        chave = _chave(user_id, versao)
+        user = _cache().get(chave)
+        if user is None:
+            user = (
+                User.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                .annotate(versao_atual=Coalesce('versao_token__versao', 0))
+                .first()
+            )
+            if user is None:
+                raise AuthenticationFailed('Usuário não encontrado.', code='user_not_found')
+            if user.versao_atual != versao:
+                raise AuthenticationFailed('Token revogado.', code='token_revoked')
+            _cache().set_many({chave: user, f'usuario:{user_id}': versao})
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('Usuário inativo.', code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed('A senha do usuário foi alterada.', code='password_changed')
+        return user
+
+
 class EmailOrUsernameModelBackend(ModelBackend):
+    """
+    Login por username (diferenciando maiúsculas), e-mail (sem diferenciar) ou
+    CPF/CNPJ (com ou sem pontuação): uma consulta indexada em IdentificadorLogin.
+    Se mais de um usuário tiver o mesmo e-mail ou documento, vale o mais antigo.
+    """
     def authenticate(self, request, username=None, password=None, **kwargs):
-        print(f"--- TENTATIVA DE LOGIN ---")
-        print(f"Buscando usuário: {username}")
-        
-        if username is None:
-            return None
-            
-        try:
-            # Tenta encontrar usuário por CPF (username) OU Email
-            user = User.objects.get(Q(username=username) | Q(email=username))
-            print(f"Usuário encontrado: {user.username} (Email: {user.email})")
-        except User.DoesNotExist:
-            print("Usuário NÃO encontrado no banco.")
+        if username is None or password is None:
             return None
-        except User.MultipleObjectsReturned:
-            print("Múltiplos usuários encontrados. Pegando o primeiro.")
-            user = User.objects.filter(Q(username=username) | Q(email=username)).order_by('id').first()
-
-        # Verifica a senha
-        if user.check_password(password):
-            print("Senha CORRETA.")
-            if self.user_can_authenticate(user):
-                print("Usuário ativo. Login autorizado.")
-                return user
-            else:
-                print("Usuário inativo.")
+
+        inicio = time.perf_counter()
+        user = (
+            User.objects.filter(formas_de_login(username))
+            .order_by('pk')
+            .first()
+        )
+        busca_ms = (time.perf_counter() - inicio) * 1000
+
+        # O hash roda no pool limitado de senhas.py (LoginSobrecarregado/503 se estiver cheio)
+        if user is None:
+            # Mesmo custo de uma senha errada: não revela quais identificadores existem
+            gastar_hash(password)
+            resultado = 'nao_encontrado'
+        elif not verificar_senha(password, user.password):
+            resultado = 'senha_incorreta'
+        elif not self.user_can_authenticate(user):
+            resultado = 'inativo'
         else:
-            print("Senha INCORRETA.")
-            
-        return None
\ No newline at end of file
+            resultado = 'sucesso'
+            if identify_hasher(user.password).must_update(user.password):
+                # Hash com parâmetros antigos: regrava com os atuais (como User.check_password faz)
+                user.set_password(password)
+                user.save(update_fields=['password'])
+
+        logger.info('login %s', resultado, extra={
+            'evento': 'login',
+            'resultado': resultado,
+            'tipo_identificador': tipo_de(username),
+            'user_id': user.pk if user else None,
+            'busca_ms': round(busca_ms, 2),
+            'total_ms': round((time.perf_counter() - inicio) * 1000, 2),
+        })
+        return user if resultado == 'sucesso' else None
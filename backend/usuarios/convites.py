@@ -0,0 +1,69 @@
+"""
+Convites para o usuário definir a própria senha (ConviteAcesso).
+
+Senha não vai por e-mail: a mensagem leva um código de uso único, que vale
+IMPORTACAO_CONVITE_DIAS dias e é trocado pela senha em api/convites/aceitar/.
+O banco guarda só o SHA-256 do código. A importação em lote (importacao.py)
+grava os convites com bulk_create; o cadastro avulso usa `criar_convite`.
+"""
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ConviteAcesso
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def novo_token():
+    return secrets.token_urlsafe(32)
+
+
+def validade():
+    """Data de expiração de um convite criado agora"""
+    return timezone.now() + timedelta(days=settings.IMPORTACAO_CONVITE_DIAS)
+
+
+def texto_convite(user, token, expira_em):
+    """Corpo do e-mail de convite"""
+    return (
+        f"Olá {user.first_name or user.username},\n\n"
+        f"Seu cadastro foi feito pela oficina.\n"
+        f"Login: {user.username}\n"
+        f"Código para definir sua senha: {token}\n"
+        f"O código vale até {timezone.localtime(expira_em):%d/%m/%Y}."
+    )
+
+
+def criar_convite(user):
+    """Grava o convite do usuário; devolve (token, expira_em). O token só existe aqui"""
+    token = novo_token()
+    expira_em = validade()
+    ConviteAcesso.objects.create(user=user, token_hash=hash_token(token), expira_em=expira_em)
+    return token, expira_em
+
+
+def aceitar_convite(token, senha):
+    """
+    Define a senha do usuário do convite; devolve o usuário ou None se o convite não vale.
+    Senha fraca (AUTH_PASSWORD_VALIDATORS) levanta ValidationError e o convite continua valendo.
+    """
+    with transaction.atomic():
+        convite = ConviteAcesso.objects.select_for_update().select_related('user').filter(
+            token_hash=hash_token(token or ''), usado_em__isnull=True, expira_em__gt=timezone.now()
+        ).first()
+        if convite is None:
+            return None
+        validate_password(senha, user=convite.user)
+        convite.usado_em = timezone.now()
+        convite.save(update_fields=['usado_em'])
+        convite.user.set_password(senha)
+        convite.user.save(update_fields=['password'])
+        return convite.user
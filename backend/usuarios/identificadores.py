@@ -0,0 +1,79 @@
+"""
+Identificadores de login (IdentificadorLogin).
+
+O login aceita username, e-mail ou CPF/CNPJ, com ou sem pontuação. E-mail não
+diferencia maiúsculas; username diferencia, como no Django (que aceita "Ana"
+e "ana" como usuários distintos). Em vez de comparar na hora (OR entre colunas
+sem índice), cada forma aceita é gravada normalizada em IdentificadorLogin e o
+login faz uma única consulta indexada por `identificador` (`formas_de_login`).
+
+Os sinais (signals.py) mantêm a tabela quando User, Cliente, Mecanico ou
+Fornecedor são salvos. Quem grava em lote (bulk_create, update) deve chamar
+`sincronizar` para os usuários afetados.
+"""
+import re
+
+from django.db.models import Q
+
+from .models import Cliente, Fornecedor, IdentificadorLogin, Mecanico
+
+_PONTUACAO_DOCUMENTO = re.compile(r'[\s.\-/]')
+
+
+TIPOS = ('USERNAME', 'EMAIL', 'DOCUMENTO')
+
+
+def normalizar(valor, tipo=None):
+    """
+    Forma canônica de um identificador do `tipo`: CPF/CNPJ só dígitos, e-mail em
+    minúsculas, username como está. Sem tipo (chave do limite de tentativas),
+    tudo o que não é documento vai para minúsculas.
+    """
+    valor = (valor or '').strip()
+    digitos = _PONTUACAO_DOCUMENTO.sub('', valor)
+    if tipo in (None, 'DOCUMENTO') and digitos.isdigit() and len(digitos) in (11, 14):
+        return digitos
+    if tipo == 'USERNAME':
+        return valor
+    return valor.lower()
+
+
+def formas_de_login(valor):
+    """Q que acha, em IdentificadorLogin, o que foi digitado no login lido como cada tipo"""
+    condicao = Q()
+    for tipo in TIPOS:
+        condicao |= Q(identificadores_login__tipo=tipo, identificadores_login__identificador=normalizar(valor, tipo))
+    return condicao
+
+
+def tipo_de(valor):
+    """Tipo do identificador digitado (para os logs): EMAIL, DOCUMENTO ou USERNAME"""
+    if '@' in valor:
+        return 'EMAIL'
+    if normalizar(valor).isdigit():
+        return 'DOCUMENTO'
+    return 'USERNAME'
+
+
+def sincronizar(user_id, tipo, valores):
+    """Deixa os identificadores `tipo` do usuário iguais a `valores` (normalizados)"""
+    novos = {normalizar(valor, tipo) for valor in valores if valor}
+    novos.discard('')
+    IdentificadorLogin.objects.filter(user_id=user_id, tipo=tipo).exclude(identificador__in=novos).delete()
+    IdentificadorLogin.objects.bulk_create(
+        [IdentificadorLogin(user_id=user_id, tipo=tipo, identificador=valor) for valor in novos],
+        ignore_conflicts=True,
+    )
+
+
+def sincronizar_usuario(user):
+    sincronizar(user.pk, 'USERNAME', [user.username])
+    sincronizar(user.pk, 'EMAIL', [user.email])
+
+
+def documentos_do_usuario(user_id):
+    """CPF/CNPJ dos perfis ligados ao usuário"""
+    documentos = []
+    for modelo, campo in ((Cliente, 'cpf'), (Mecanico, 'cpf'), (Fornecedor, 'cnpj')):
+        documentos += modelo.objects.filter(user_id=user_id).values_list(campo, flat=True)
+    return documentos
@@ -0,0 +1,319 @@
+"""
+Importação de clientes e veículos por CSV (cadastro inicial de uma oficina).
+
+Cadastrar pela API custa, por linha, as consultas dos UniqueValidator e um
+hash PBKDF2 da senha em create_user. Aqui o arquivo é lido em fluxo e gravado
+em lotes de IMPORTACAO_LINHAS_POR_LOTE linhas, cada lote na sua transação:
+- CPF e placa são normalizados (CPF como 000.000.000-00, placa como ABC-1234
+  ou ABC1D23 no padrão Mercosul) antes de qualquer comparação;
+- os duplicados são achados em memória, contra conjuntos montados com uma
+  consulta por lote (clientes por CPF, usernames, placas) e contra as linhas
+  anteriores do próprio arquivo;
+- User, Cliente, Veiculo, IdentificadorLogin e ConviteAcesso são gravados com
+  bulk_create (que não dispara os sinais: os identificadores de login são
+  gravados aqui), e os e-mails de convite vão para a caixa de saída.
+
+Os usuários nascem sem senha utilizável (SENHA_CONVITE, sem hash nenhum) e
+definem a própria senha com o token do convite (api/convites/aceitar/).
+Linha de CPF já cadastrado só acrescenta o veículo ao cliente existente.
+Linha inválida não é gravada e volta na lista de erros, com o número da linha.
+"""
+import csv
+import re
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from oficina.emails import enfileirar_emails
+from veiculos.models import Veiculo
+from .convites import hash_token, novo_token, texto_convite, validade
+from .identificadores import normalizar
+from .models import Cliente, ConviteAcesso, IdentificadorLogin
+
+COLUNAS_OBRIGATORIAS = ('nome', 'cpf', 'telefone', 'endereco')
+COLUNAS_VEICULO = ('placa', 'modelo', 'marca', 'ano')
+ERROS_MAXIMOS = 1000  # Erros guardados com detalhe; os demais só contam
+
+# Marcador de senha inutilizável (has_usable_password() é False); o usuário
+# define a senha pelo convite. Constante: nada de hash por linha.
+SENHA_CONVITE = UNUSABLE_PASSWORD_PREFIX + 'convite'
+
+OBRIGATORIO = 'Este campo é obrigatório.'
+
+_NAO_DIGITOS = re.compile(r'\D')
+_NAO_ALFANUMERICOS = re.compile(r'[^0-9A-Z]')
+_PLACA_ANTIGA = re.compile(r'^[A-Z]{3}[0-9]{4}$')
+_PLACA_MERCOSUL = re.compile(r'^[A-Z]{3}[0-9][A-Z][0-9]{2}$')
+
+
+class ArquivoInvalido(Exception):
+    """O arquivo todo não pode ser importado (vazio ou sem as colunas obrigatórias)"""
+
+
+def _formatar_cpf(digitos):
+    return f'{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}'
+
+
+def _cpf_valido(digitos):
+    if len(digitos) != 11 or digitos == digitos[0] * 11:
+        return False
+    for tamanho in (9, 10):
+        soma = sum(int(d) * peso for d, peso in zip(digitos, range(tamanho + 1, 1, -1)))
+        if (soma * 10) % 11 % 10 != int(digitos[tamanho]):
+            return False
+    return True
+
+
+def normalizar_cpf(valor):
+    """CPF no formato 000.000.000-00, ou None se os dígitos verificadores não batem"""
+    digitos = _NAO_DIGITOS.sub('', valor or '')
+    return _formatar_cpf(digitos) if _cpf_valido(digitos) else None
+
+
+def normalizar_placa(valor):
+    """Placa em maiúsculas: ABC-1234 (modelo antigo) ou ABC1D23 (Mercosul); None se não for placa"""
+    placa = _NAO_ALFANUMERICOS.sub('', (valor or '').upper())
+    if _PLACA_ANTIGA.match(placa):
+        return f'{placa[:3]}-{placa[3:]}'
+    if _PLACA_MERCOSUL.match(placa):
+        return placa
+    return None
+
+
+def ler_csv(arquivo):
+    """
+    Linhas do CSV (arquivo texto já aberto), uma a uma: (número da linha, dict).
+    Aceita ';' ou ',' como separador e cabeçalho em qualquer caixa.
+    """
+    cabecalho = arquivo.readline().lstrip('\ufeff')
+    if not cabecalho.strip():
+        raise ArquivoInvalido('Arquivo vazio.')
+    separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    colunas = [coluna.strip().lower() for coluna in next(csv.reader([cabecalho], delimiter=separador))]
+    faltando = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in colunas]
+    if faltando:
+        raise ArquivoInvalido(f'Colunas obrigatórias ausentes: {", ".join(faltando)}.')
+
+    leitor = csv.reader(arquivo, delimiter=separador)
+    for valores in leitor:
+        if any(valor.strip() for valor in valores):
+            # +1: o cabeçalho foi lido fora do leitor
+            yield leitor.line_num + 1, dict(zip(colunas, (valor.strip() for valor in valores)))
+
+
+def _validar_linha(dados):
+    """(cliente, veiculo ou None, erros) de uma linha do CSV"""
+    erros = {}
+    cliente = {campo: dados.get(campo, '') for campo in ('nome', 'telefone', 'endereco')}
+    for campo, tamanho in (('nome', 255), ('telefone', 20), ('endereco', None)):
+        if not cliente[campo]:
+            erros[campo] = OBRIGATORIO
+        elif tamanho and len(cliente[campo]) > tamanho:
+            erros[campo] = f'No máximo {tamanho} caracteres.'
+
+    if not dados.get('cpf'):
+        erros['cpf'] = OBRIGATORIO
+    else:
+        cliente['cpf'] = normalizar_cpf(dados['cpf'])
+        if cliente['cpf'] is None:
+            erros['cpf'] = 'CPF inválido.'
+
+    cliente['email'] = dados.get('email') or None
+    if cliente['email']:
+        try:
+            validate_email(cliente['email'])
+        except ValidationError:
+            erros['email'] = 'E-mail inválido.'
+
+    veiculo = None
+    if any(dados.get(campo) for campo in COLUNAS_VEICULO):
+        veiculo = {campo: dados.get(campo, '') for campo in ('modelo', 'marca')}
+        placa = normalizar_placa(dados.get('placa'))
+        if placa is None:
+            erros['placa'] = 'Placa inválida.' if dados.get('placa') else OBRIGATORIO
+        veiculo['placa'] = placa
+        for campo in ('modelo', 'marca'):
+            if not veiculo[campo]:
+                erros[campo] = OBRIGATORIO
+            elif len(veiculo[campo]) > 100:
+                erros[campo] = 'No máximo 100 caracteres.'
+        try:
+            veiculo['ano'] = int(dados.get('ano', ''))
+            if not 1900 <= veiculo['ano'] <= timezone.now().year + 1:
+                erros['ano'] = 'Ano fora do intervalo.'
+        except ValueError:
+            erros['ano'] = 'Ano inválido.' if dados.get('ano') else OBRIGATORIO
+
+    return cliente, veiculo, erros
+
+
+class Importacao:
+    """
+    Uma importação em andamento. `executar(arquivo)` lê e grava tudo; os
+    contadores, os erros e os convites ficam no objeto.
+
+    Os tokens dos convites só existem aqui (o banco guarda o hash): os de quem
+    tem e-mail seguem na mensagem, os de quem não tem ficam em `convites` para
+    serem entregues pela oficina. Com guardar_convites=True, `convites` traz todos.
+    Com acordar_despachante=False os e-mails ficam para o worker enviar_emails.
+    """
+
+    def __init__(self, enviar_convites=True, guardar_convites=False, acordar_despachante=True):
+        self.enviar_convites = enviar_convites
+        self.acordar_despachante = acordar_despachante
+        self.guardar_convites = guardar_convites
+        self.linhas_por_lote = settings.IMPORTACAO_LINHAS_POR_LOTE
+        self.linhas = 0
+        self.clientes_criados = 0
+        self.veiculos_criados = 0
+        self.emails_enfileirados = 0
+        self.total_erros = 0
+        self.erros = []
+        self.convites = []
+        # CPF -> id_cliente (do banco ou criado nesta importação) e placas já vistas
+        self._clientes = {}
+        self._placas = set()
+
+    def executar(self, arquivo):
+        lote = []
+        for numero, dados in ler_csv(arquivo):
+            self.linhas += 1
+            cliente, veiculo, erros = _validar_linha(dados)
+            if erros:
+                self._erro(numero, erros)
+                continue
+            lote.append((numero, cliente, veiculo))
+            if len(lote) >= self.linhas_por_lote:
+                self._gravar(lote)
+                lote = []
+        if lote:
+            self._gravar(lote)
+        return self
+
+    def resumo(self):
+        return {
+            'linhas': self.linhas,
+            'clientes_criados': self.clientes_criados,
+            'veiculos_criados': self.veiculos_criados,
+            'emails_enfileirados': self.emails_enfileirados,
+            'total_erros': self.total_erros,
+            'erros': self.erros,
+        }
+
+    def _erro(self, numero, erros):
+        self.total_erros += 1
+        if len(self.erros) < ERROS_MAXIMOS:
+            self.erros.append({'linha': numero, 'erros': erros})
+
+    def _gravar(self, lote):
+        # Conjuntos de duplicados: uma consulta por tabela para o lote inteiro
+        cpfs = {cliente['cpf'] for _, cliente, _ in lote} - self._clientes.keys()
+        if cpfs:
+            # O cadastro pela API aceita o CPF com ou sem pontuação: procura as duas formas
+            formas = cpfs | {_NAO_DIGITOS.sub('', cpf) for cpf in cpfs}
+            for cpf, id_cliente in Cliente.objects.filter(cpf__in=formas).values_list('cpf', 'pk'):
+                self._clientes[_formatar_cpf(_NAO_DIGITOS.sub('', cpf))] = id_cliente
+        usernames = {_NAO_DIGITOS.sub('', cpf) for cpf in cpfs - self._clientes.keys()}
+        ocupados = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        placas = {veiculo['placa'] for _, _, veiculo in lote if veiculo} - self._placas
+        if placas:
+            formas = placas | {placa.replace('-', '') for placa in placas}
+            for placa in Veiculo.objects.filter(placa__in=formas).values_list('placa', flat=True):
+                self._placas.add(normalizar_placa(placa))
+
+        novos = {}  # CPF -> (User, Cliente)
+        veiculos = []  # (CPF, Veiculo)
+        placas_do_lote = set()
+        gravadas = []  # Números das linhas que vão para o banco
+        for numero, cliente, veiculo in lote:
+            cpf = cliente['cpf']
+            username = _NAO_DIGITOS.sub('', cpf)
+            erros = {}
+            if cpf not in self._clientes and cpf not in novos and username in ocupados:
+                erros['cpf'] = 'Usuário já existe'
+            if veiculo and (veiculo['placa'] in self._placas or veiculo['placa'] in placas_do_lote):
+                erros['placa'] = 'Placa já cadastrada'
+            if erros:
+                self._erro(numero, erros)
+                continue
+
+            if cpf not in self._clientes and cpf not in novos:
+                user = User(
+                    username=username, email=cliente['email'] or '', first_name=cliente['nome'][:150],
+                    password=SENHA_CONVITE,
+                )
+                novos[cpf] = (user, Cliente(**cliente))
+            if veiculo:
+                placas_do_lote.add(veiculo['placa'])
+                veiculos.append((cpf, Veiculo(**veiculo)))
+            gravadas.append(numero)
+
+        try:
+            with transaction.atomic():
+                convites = self._gravar_no_banco(novos, veiculos)
+        except IntegrityError:
+            # Outro cadastro gravou o mesmo CPF ou placa depois da consulta: nada do lote ficou.
+            # As linhas recusadas acima já estão nos erros
+            for cpf in novos:
+                self._clientes.pop(cpf, None)
+            for numero in gravadas:
+                self._erro(numero, {'lote': 'Conflito com um cadastro feito durante a importação. Envie a linha de novo.'})
+            return
+
+        self._placas |= placas_do_lote
+        self.clientes_criados += len(novos)
+        self.veiculos_criados += len(veiculos)
+        self.convites += convites
+
+    def _gravar_no_banco(self, novos, veiculos):
+        users = User.objects.bulk_create([user for user, _ in novos.values()])
+        clientes = []
+        for user, cliente in novos.values():
+            cliente.user_id = user.pk
+            clientes.append(cliente)
+        Cliente.objects.bulk_create(clientes)
+        for cpf, (_, cliente) in novos.items():
+            self._clientes[cpf] = cliente.pk
+
+        for cpf, veiculo in veiculos:
+            veiculo.cliente_id = self._clientes[cpf]
+        Veiculo.objects.bulk_create([veiculo for _, veiculo in veiculos])
+
+        # bulk_create não dispara os sinais que mantêm os identificadores de login
+        identificadores = []
+        for user, cliente in novos.values():
+            for tipo, valor in (('USERNAME', user.username), ('EMAIL', user.email), ('DOCUMENTO', cliente.cpf)):
+                if valor:
+                    identificadores.append(
+                        IdentificadorLogin(user_id=user.pk, tipo=tipo, identificador=normalizar(valor, tipo))
+                    )
+        IdentificadorLogin.objects.bulk_create(identificadores)
+
+        expira_em = validade()
+        tokens = [(user, novo_token()) for user in users]
+        ConviteAcesso.objects.bulk_create([
+            ConviteAcesso(user_id=user.pk, token_hash=hash_token(token), expira_em=expira_em) for user, token in tokens
+        ])
+
+        convites, mensagens = [], []
+        for user, token in tokens:
+            if user.email and self.enviar_convites:
+                mensagens.append(
+                    ('Bem-vindo ao SGOM - Defina sua senha', texto_convite(user, token, expira_em), [user.email])
+                )
+                if not self.guardar_convites:
+                    continue
+            convites.append({'username': user.username, 'nome': user.first_name, 'email': user.email, 'token': token})
+        enfileirar_emails(mensagens, acordar=self.acordar_despachante)
+        self.emails_enfileirados += len(mensagens)
+        return convites
+
+
+def importar(arquivo, **opcoes):
+    """Importa o CSV aberto em `arquivo`; devolve a Importacao com o resumo"""
+    return Importacao(**opcoes).executar(arquivo)
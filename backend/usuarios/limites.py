@@ -0,0 +1,75 @@
+"""
+Limite de tentativas de login (token bucket), aplicado em api/token/.
+
+Cada IP e cada identificador digitado têm um balde com `capacidade` fichas,
+repostas continuamente à taxa de `por_minuto`. Cada tentativa gasta uma ficha
+dos dois baldes; com um deles vazio a resposta é 429 com Retry-After, antes de
+qualquer consulta ou hash de senha.
+
+O estado dos baldes fica no cache do Django indicado em LOGIN_LIMITE_CACHE:
+o LocMemCache padrão limita cada processo; um cache compartilhado (Redis,
+Memcached) faz o limite valer para todos. A leitura e a gravação de um balde
+acontecem sob uma trava do processo.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from .identificadores import normalizar
+
+_trava = threading.Lock()
+
+
+class BaldeDeFichas:
+    def __init__(self, nome, capacidade, por_minuto):
+        self.nome = nome
+        self.capacidade = capacidade
+        self.por_segundo = por_minuto / 60
+
+    def consumir(self, chave, agora=None):
+        """Gasta uma ficha; devolve (permitido, segundos até a próxima ficha)"""
+        agora = time.time() if agora is None else agora
+        cache = caches[settings.LOGIN_LIMITE_CACHE]
+        chave = f'login:{self.nome}:{chave}'
+        # Depois disso o balde estaria cheio de novo: a entrada pode expirar
+        expira = int(self.capacidade / self.por_segundo) + 1
+
+        with _trava:
+            fichas, instante = cache.get(chave, (self.capacidade, agora))
+            fichas = min(self.capacidade, fichas + (agora - instante) * self.por_segundo)
+            if fichas < 1:
+                cache.set(chave, (fichas, agora), expira)
+                return False, (1 - fichas) / self.por_segundo
+            cache.set(chave, (fichas - 1, agora), expira)
+            return True, 0
+
+
+def baldes():
+    return (
+        BaldeDeFichas('ip', **settings.LOGIN_LIMITE_IP),
+        BaldeDeFichas('identificador', **settings.LOGIN_LIMITE_IDENTIFICADOR),
+    )
+
+
+class LimiteLogin(BaseThrottle):
+    """Throttle do DRF para a view de login: um balde por IP e um por identificador"""
+
+    def allow_request(self, request, view):
+        por_ip, por_identificador = baldes()
+        # Sem tipo: variar maiúsculas não abre um balde novo
+        identificador = normalizar(str(request.data.get('username', '')))
+        self.espera = 0
+        for balde, chave in ((por_ip, self.get_ident(request)), (por_identificador, identificador)):
+            if not chave:
+                continue
+            permitido, espera = balde.consumir(chave)
+            if not permitido:
+                self.espera = espera
+                return False
+        return True
+
+    def wait(self):
+        return self.espera
@@ -0,0 +1,37 @@
+"""
+Logs estruturados (uma linha JSON por registro) gravados fora da thread da requisição.
+
+HandlerAssincrono só põe o registro numa fila; uma thread (QueueListener)
+formata e escreve. Configurado em settings.LOGGING para o logger 'usuarios.login'.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Atributos que todo LogRecord tem; o resto veio em `extra=` e vai para o JSON
+_PADRAO = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class FormatadorJSON(logging.Formatter):
+    def format(self, record):
+        dados = {
+            'momento': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+        }
+        dados.update({chave: valor for chave, valor in vars(record).items() if chave not in _PADRAO})
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class HandlerAssincrono(QueueHandler):
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        destino = logging.StreamHandler(stream or sys.stderr)
+        destino.setFormatter(FormatadorJSON())
+        self.listener = QueueListener(self.queue, destino, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)
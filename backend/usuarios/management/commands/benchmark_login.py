@@ -0,0 +1,77 @@
+import random
+import time
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from usuarios.identificadores import normalizar
+from usuarios.models import Cliente, IdentificadorLogin
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark do login: separa o custo da busca do usuário (IdentificadorLogin) do custo do "
+        "hash da senha, e mede o authenticate() completo com username, e-mail e CPF."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=2000, help='Usuários criados para o teste')
+        parser.add_argument('--tentativas', type=int, default=500, help='Buscas por etapa')
+        parser.add_argument('--hashes', type=int, default=20, help='Verificações de senha (cada uma leva ~centenas de ms)')
+
+    def handle(self, *args, **options):
+        n_usuarios, n_tentativas = options['usuarios'], options['tentativas']
+        sufixo = time.time_ns() % 10**9
+        senha = 'senha-benchmark'
+        hash_senha = make_password(senha)  # Um hash só: o PBKDF2 de cada usuário não interessa aqui
+
+        users = []
+        for i in range(n_usuarios):
+            user = User(username=f'bench{sufixo}_{i}', email=f'Bench{sufixo}_{i}@Sgom.local', password=hash_senha)
+            users.append(user)
+        User.objects.bulk_create(users, batch_size=1000)
+        users = list(User.objects.filter(username__startswith=f'bench{sufixo}_').order_by('pk'))
+        cpfs = [f'{(sufixo * 1000 + i) % 10**11:011d}' for i in range(n_usuarios)]
+        Cliente.objects.bulk_create([
+            Cliente(nome=user.username, cpf=f'{c[:3]}.{c[3:6]}.{c[6:9]}-{c[9:]}', telefone='-', endereco='-', user=user)
+            for user, c in zip(users, cpfs)
+        ], batch_size=1000)
+        # bulk_create não dispara os sinais: grava os identificadores direto
+        IdentificadorLogin.objects.bulk_create([
+            IdentificadorLogin(user=user, tipo=tipo, identificador=normalizar(valor))
+            for user, cpf in zip(users, cpfs)
+            for tipo, valor in (('USERNAME', user.username), ('EMAIL', user.email), ('DOCUMENTO', cpf))
+        ], batch_size=3000)
+
+        try:
+            formas = []
+            for indice in random.choices(range(n_usuarios), k=n_tentativas):
+                user, c = users[indice], cpfs[indice]
+                formas += [user.username.upper(), user.email, f'{c[:3]}.{c[3:6]}.{c[6:9]}-{c[9:]}', c]
+
+            inicio = time.perf_counter()
+            for identificador in formas:
+                User.objects.filter(identificadores_login__identificador=normalizar(identificador)).order_by('pk').first()
+            busca = (time.perf_counter() - inicio) / len(formas)
+
+            inicio = time.perf_counter()
+            for user in users[:options['hashes']]:
+                user.check_password(senha)
+            hash_ = (time.perf_counter() - inicio) / options['hashes']
+
+            inicio = time.perf_counter()
+            autenticados = sum(
+                authenticate(username=identificador, password=senha) is not None
+                for identificador in formas[:options['hashes']]
+            )
+            total = (time.perf_counter() - inicio) / options['hashes']
+
+            self.stdout.write(
+                f"busca: {busca * 1000:.3f} ms ({1 / busca:.0f}/s) | "
+                f"hash da senha: {hash_ * 1000:.1f} ms ({1 / hash_:.1f}/s) | "
+                f"authenticate(): {total * 1000:.1f} ms, {autenticados}/{options['hashes']} aceitos"
+            )
+        finally:
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
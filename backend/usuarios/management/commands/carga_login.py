@@ -0,0 +1,90 @@
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIClient
+
+from usuarios.senhas import pool
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga local: mede a latência de requisições comuns da API sozinhas e durante "
+        "uma rajada de logins com senha errada em api/token/ (vários IPs), mostrando o efeito do "
+        "limite de tentativas e do pool de hash de senha."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=4, help='Threads fazendo requisições comuns')
+        parser.add_argument('--atacantes', type=int, default=16, help='Threads tentando logar')
+        parser.add_argument('--ips', type=int, default=64, help='IPs diferentes usados pelos atacantes')
+        parser.add_argument('--duracao', type=float, default=5, help='Segundos de cada fase')
+        parser.add_argument('--url', default='/api/servicos/', help='Endpoint das requisições comuns')
+
+    def handle(self, *args, **options):
+        sufixo = time.time_ns()
+        alvo = User.objects.create_user(username=f'carga_{sufixo}', password='senha-certa')
+        try:
+            normal = self._fase(options, alvo, atacantes=0)
+            tempestade, logins = self._fase(options, alvo, atacantes=options['atacantes'], com_logins=True)
+        finally:
+            alvo.delete()
+
+        self.stdout.write(f"sem logins:  {self._resumo(normal)}")
+        self.stdout.write(f"com rajada:  {self._resumo(tempestade)}")
+        self.stdout.write(
+            "logins: " + ', '.join(f"{status}: {total}" for status, total in sorted(logins.items()))
+        )
+        self.stdout.write(f"pool de hash: {pool().metricas()}")
+
+    def _fase(self, options, alvo, atacantes, com_logins=False):
+        fim = time.perf_counter() + options['duracao']
+        latencias, logins = [], Counter()
+        trava = threading.Lock()
+
+        def cliente():
+            # Exceções viram 500: o sinal usado pelo test client para repassá-las não é seguro entre threads
+            client = APIClient(SERVER_NAME='localhost', raise_request_exception=False)
+            try:
+                while time.perf_counter() < fim:
+                    inicio = time.perf_counter()
+                    client.get(options['url'])
+                    with trava:
+                        latencias.append(time.perf_counter() - inicio)
+            finally:
+                connection.close()
+
+        def atacante():
+            client = APIClient(SERVER_NAME='localhost', raise_request_exception=False)
+            try:
+                while time.perf_counter() < fim:
+                    resp = client.post(
+                        '/api/token/',
+                        {'username': random.choice([alvo.username, f'x{random.random()}']), 'password': 'errada'},
+                        format='json',
+                        REMOTE_ADDR=f'10.0.{random.randrange(options["ips"]) // 256}.{random.randrange(256)}',
+                    )
+                    with trava:
+                        logins[resp.status_code] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=cliente) for _ in range(options['clientes'])]
+        threads += [threading.Thread(target=atacante) for _ in range(atacantes)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return (latencias, logins) if com_logins else latencias
+
+    def _resumo(self, latencias):
+        if len(latencias) < 2:
+            return 'sem amostras suficientes'
+        ms = sorted(l * 1000 for l in latencias)
+        p95 = ms[int(len(ms) * 0.95) - 1]
+        return f"{len(ms)} requisições | p50 {statistics.median(ms):.1f} ms | p95 {p95:.1f} ms | máx {ms[-1]:.1f} ms"
@@ -0,0 +1,58 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from usuarios.importacao import ArquivoInvalido, Importacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa clientes e veículos de um CSV (colunas nome, cpf, telefone, endereco e, opcionais, "
+        "email, placa, modelo, marca, ano; separador ';' ou ','). Os clientes recebem um convite para "
+        "definir a senha: por e-mail, ou na planilha de --convites para quem não tem e-mail."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do CSV (UTF-8)')
+        parser.add_argument('--convites', help='Grava aqui um CSV com os tokens de convite (username, nome, email, token)')
+        parser.add_argument('--todos-convites', action='store_true', help='Em --convites, inclui também quem recebeu por e-mail')
+        parser.add_argument('--sem-email', action='store_true', help='Não enfileira os e-mails de convite')
+
+    def handle(self, *args, **options):
+        # Os e-mails de um arquivo grande ficam para o worker, sem disputar o banco com a importação
+        importacao = Importacao(
+            enviar_convites=not options['sem_email'], guardar_convites=options['todos_convites'],
+            acordar_despachante=False,
+        )
+        inicio = time.perf_counter()
+        try:
+            with open(options['arquivo'], encoding='utf-8-sig', newline='') as arquivo:
+                importacao.executar(arquivo)
+        except (OSError, ArquivoInvalido) as erro:
+            raise CommandError(str(erro))
+        segundos = time.perf_counter() - inicio
+
+        for erro in importacao.erros:
+            detalhes = '; '.join(f'{campo}: {mensagem}' for campo, mensagem in erro['erros'].items())
+            self.stderr.write(f"linha {erro['linha']}: {detalhes}")
+        if importacao.total_erros > len(importacao.erros):
+            self.stderr.write(f"... e mais {importacao.total_erros - len(importacao.erros)} linha(s) com erro.")
+
+        if options['convites']:
+            with open(options['convites'], 'w', encoding='utf-8', newline='') as saida:
+                escritor = csv.DictWriter(saida, fieldnames=['username', 'nome', 'email', 'token'], delimiter=';')
+                escritor.writeheader()
+                escritor.writerows(importacao.convites)
+        elif importacao.convites:
+            self.stderr.write(
+                f"{len(importacao.convites)} convite(s) não enviado(s) por e-mail: use --convites para obter os tokens."
+            )
+
+        self.stdout.write(
+            f"{importacao.linhas} linha(s) em {segundos:.1f}s: {importacao.clientes_criados} cliente(s) e "
+            f"{importacao.veiculos_criados} veículo(s) criados, {importacao.emails_enfileirados} e-mail(s) de "
+            f"convite na caixa de saída, {importacao.total_erros} linha(s) com erro."
+        )
+        if importacao.emails_enfileirados:
+            self.stdout.write("Os e-mails saem pelo worker: manage.py enviar_emails.")
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0002_administrador'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fornecedor',
+            name='prazo_entrega_dias',
+            field=models.PositiveIntegerField(default=7),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_fornecedor_prazo_entrega_dias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mecanico',
+            name='os_abertas',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
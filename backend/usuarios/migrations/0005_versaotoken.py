@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 21:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0004_mecanico_os_abertas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoToken',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='versao_token', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('versao', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
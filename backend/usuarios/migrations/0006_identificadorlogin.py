@@ -0,0 +1,62 @@
+# Generated by Django 6.0 on 2026-10-18 22:10
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _normalizar(valor):
+    # Cópia de usuarios.identificadores.normalizar (migrations não importam o código atual)
+    valor = (valor or '').strip()
+    digitos = re.sub(r'[\s.\-/]', '', valor)
+    if digitos.isdigit() and len(digitos) in (11, 14):
+        return digitos
+    return valor.lower()
+
+
+def preencher_identificadores(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    IdentificadorLogin = apps.get_model('usuarios', 'IdentificadorLogin')
+
+    linhas = set()
+    for user_id, username, email in User.objects.values_list('pk', 'username', 'email').iterator():
+        linhas.add((user_id, 'USERNAME', _normalizar(username)))
+        if email:
+            linhas.add((user_id, 'EMAIL', _normalizar(email)))
+    for modelo, campo in (('Cliente', 'cpf'), ('Mecanico', 'cpf'), ('Fornecedor', 'cnpj')):
+        perfis = apps.get_model('usuarios', modelo).objects.filter(user__isnull=False)
+        for user_id, documento in perfis.values_list('user_id', campo).iterator():
+            if documento:
+                linhas.add((user_id, 'DOCUMENTO', _normalizar(documento)))
+
+    IdentificadorLogin.objects.bulk_create(
+        [IdentificadorLogin(user_id=u, tipo=t, identificador=i) for u, t, i in linhas if i],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0005_versaotoken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentificadorLogin',
+            fields=[
+                ('id_identificador', models.AutoField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('USERNAME', 'Username'), ('EMAIL', 'E-mail'), ('DOCUMENTO', 'CPF/CNPJ')], max_length=10)),
+                ('identificador', models.CharField(max_length=254)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='identificadores_login', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'tipo', 'identificador'), name='identificador_login_unico')],
+                'indexes': [models.Index(fields=['identificador', 'user'], name='identificador_login_idx')],
+            },
+        ),
+        migrations.RunPython(preencher_identificadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 23:55
+
+from django.db import migrations
+
+
+def regravar_usernames(apps, schema_editor):
+    # Os usernames foram gravados em minúsculas (0006); agora ficam como estão em auth.User
+    User = apps.get_model('auth', 'User')
+    IdentificadorLogin = apps.get_model('usuarios', 'IdentificadorLogin')
+
+    IdentificadorLogin.objects.filter(tipo='USERNAME').delete()
+    IdentificadorLogin.objects.bulk_create(
+        (
+            IdentificadorLogin(user_id=user_id, tipo='USERNAME', identificador=username.strip())
+            for user_id, username in User.objects.values_list('pk', 'username').iterator()
+            if username.strip()
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0007_conviteacesso'),
+    ]
+
+    operations = [
+        migrations.RunPython(regravar_usernames, migrations.RunPython.noop),
+    ]
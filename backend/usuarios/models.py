@@ -23,6 +23,8 @@ class Mecanico(models.Model):
 
     is_mecanico = models.BooleanField(default=True)
     user = models.OneToOneField('auth.User', on_delete=models.CASCADE, related_name='mecanico', null=True, blank=True)
+    # OS não concluídas/canceladas do mecânico, mantido pelos sinais de OrdemServico (oficina/signals.py)
+    os_abertas = models.IntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"{self.nome} ({self.cpf})"
@@ -34,6 +36,8 @@ class Fornecedor(models.Model):
     telefone = models.CharField(max_length=20)
     endereco = models.CharField(max_length=255)
     data_cadastro = models.DateTimeField(auto_now_add=True)
+    # Dias entre o pedido e a entrega, usado no ponto de pedido (oficina/previsao.py)
+    prazo_entrega_dias = models.PositiveIntegerField(default=7)
 
     def __str__(self):
         return f"{self.nome} ({self.cnpj})"
@@ -46,4 +50,63 @@ class Administrador(models.Model):
     telefone = models.CharField(max_length=20, blank=True, null=True)
 
     def __str__(self):
-        return self.nome
\ No newline at end of file
+        return self.nome
+
+
+class VersaoToken(models.Model):
+    """
+    Versão dos tokens JWT do usuário. Cada token leva a versão em que foi emitido;
+    revogar (authentication.revogar_tokens) incrementa e invalida todos os anteriores.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='versao_token')
+    versao = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} (v{self.versao})"
+
+
+class IdentificadorLogin(models.Model):
+    """
+    Formas aceitas no login para cada usuário, já normalizadas (ver identificadores.py):
+    username como está, e-mail em minúsculas, CPF/CNPJ só com os dígitos. Mantida pelos sinais
+    de User, Cliente, Mecanico e Fornecedor; o login faz uma consulta indexada aqui.
+    """
+    TIPO_CHOICES = [
+        ('USERNAME', 'Username'),
+        ('EMAIL', 'E-mail'),
+        ('DOCUMENTO', 'CPF/CNPJ'),
+    ]
+
+    id_identificador = models.AutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='identificadores_login')
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    identificador = models.CharField(max_length=254)
+
+    def __str__(self):
+        return f"{self.identificador} ({self.tipo})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'tipo', 'identificador'], name='identificador_login_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['identificador', 'user'], name='identificador_login_idx'),
+        ]
+
+
+class ConviteAcesso(models.Model):
+    """
+    Convite para o usuário definir a própria senha (convites.py). Usado na
+    importação em lote (importacao.py) e nos cadastros feitos pela oficina, para
+    que senha nenhuma vá por e-mail: guarda só o SHA-256 do token, que vai por
+    e-mail ou na planilha de convites.
+    """
+    id_convite = models.AutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='convites_acesso')
+    token_hash = models.CharField(max_length=64, unique=True)
+    expira_em = models.DateTimeField()
+    usado_em = models.DateTimeField(null=True, blank=True)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Convite de {self.user} (expira {self.expira_em:%d/%m/%Y})"
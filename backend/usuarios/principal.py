@@ -0,0 +1,97 @@
+"""
+Papel do usuário logado (admin, mecânico, cliente ou fornecedor).
+
+O papel e o id do perfil são resolvidos uma vez, no login
+(CustomTokenObtainPairSerializer), e assinados no token JWT nos claims
+CLAIM_PAPEL / CLAIM_PERFIL. A cada requisição `principal(request)` só lê o
+token: nenhuma consulta. Tokens emitidos antes disso (sem os claims), sessão
+e force_authenticate dos testes caem em `resolver_papel`, que faz uma única
+consulta (nenhuma para staff). O resultado fica guardado na própria requisição.
+"""
+from django.contrib.auth.models import User
+
+CLAIM_PAPEL = 'papel'
+CLAIM_PERFIL = 'perfil_id'
+
+ADMIN = 'admin'
+MECANICO = 'mecanico'
+CLIENTE = 'cliente'
+FORNECEDOR = 'fornecedor'
+
+
+class Principal:
+    """Quem está fazendo a requisição: papel e id do perfil (Mecanico, Cliente ou Fornecedor)"""
+    __slots__ = ('user', 'papel', 'perfil_id', 'nome')
+
+    def __init__(self, user, papel=None, perfil_id=None, nome=None):
+        self.user = user
+        self.papel = papel
+        self.perfil_id = perfil_id
+        self.nome = nome
+
+    @property
+    def is_admin(self):
+        return self.papel == ADMIN
+
+    @property
+    def is_mecanico(self):
+        return self.papel == MECANICO
+
+    @property
+    def is_cliente(self):
+        return self.papel == CLIENTE
+
+    @property
+    def is_fornecedor(self):
+        return self.papel == FORNECEDOR
+
+    def __repr__(self):
+        return f"Principal({self.user.pk}, {self.papel}, {self.perfil_id})"
+
+
+def resolver_papel(user):
+    """
+    Principal do usuário lido do banco, em uma consulta. Mesma precedência do
+    login: admin (staff/superuser), mecânico, cliente, fornecedor.
+    """
+    if not user or not user.is_authenticated:
+        return Principal(user)
+
+    perfis = User.objects.filter(pk=user.pk).values_list(
+        'administrador__nome',
+        'mecanico__pk', 'mecanico__nome',
+        'cliente__pk', 'cliente__nome',
+        'fornecedor_perfil__pk', 'fornecedor_perfil__nome',
+    ).first()
+    if perfis is None:
+        return Principal(user)
+    admin_nome, mecanico_id, mecanico_nome, cliente_id, cliente_nome, fornecedor_id, fornecedor_nome = perfis
+
+    if user.is_staff or user.is_superuser:
+        return Principal(user, ADMIN, None, admin_nome or user.username)
+    if mecanico_id is not None:
+        return Principal(user, MECANICO, mecanico_id, mecanico_nome)
+    if cliente_id is not None:
+        return Principal(user, CLIENTE, cliente_id, cliente_nome)
+    if fornecedor_id is not None:
+        return Principal(user, FORNECEDOR, fornecedor_id, fornecedor_nome)
+    return Principal(user, None, None, user.username)
+
+
+def principal(request):
+    """Principal da requisição: dos claims do token, ou do banco se o token não os tiver"""
+    atual = getattr(request, '_principal', None)
+    if atual is not None:
+        return atual
+
+    token = getattr(request, 'auth', None)
+    user = request.user
+    if token is not None and hasattr(token, 'get') and CLAIM_PAPEL in token:
+        atual = Principal(user, token.get(CLAIM_PAPEL), token.get(CLAIM_PERFIL))
+    elif user.is_authenticated and (user.is_staff or user.is_superuser):
+        # Admin não tem perfil a buscar (o nome só importa no login)
+        atual = Principal(user, ADMIN)
+    else:
+        atual = resolver_papel(user)
+    request._principal = atual
+    return atual
@@ -0,0 +1,100 @@
+"""
+Verificação de senha do login num pool limitado de threads.
+
+O hash da senha (PBKDF2) é a parte cara do login. Rodando direto no worker da
+requisição, uma rajada de logins ocupa todos os workers e toda a CPU. Aqui no
+máximo LOGIN_HASH_THREADS hashes rodam ao mesmo tempo (o hashlib libera o GIL
+durante o cálculo) e no máximo LOGIN_HASH_FILA esperam; além disso o login
+é recusado na hora com 503, sem gastar CPU. O resto da API segue com a
+CPU que sobra.
+
+As threads só calculam o hash: nada de banco. A atualização de hash antigo
+(quando o hasher pede) é feita pelo chamador, na thread da requisição.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class LoginSobrecarregado(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Muitos logins em andamento. Tente novamente em instantes.'
+    default_code = 'login_sobrecarregado'
+
+
+class _Pool:
+    def __init__(self, threads, fila):
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='hash-senha')
+        self.vagas = threading.BoundedSemaphore(threads + fila)
+        self.trava = threading.Lock()
+        self.threads = threads
+        self.fila = fila
+        self.pendentes = 0
+        self.executados = 0
+        self.recusados = 0
+        self.segundos = 0.0
+
+    def executar(self, funcao, *args):
+        if not self.vagas.acquire(blocking=False):
+            with self.trava:
+                self.recusados += 1
+            raise LoginSobrecarregado()
+        with self.trava:
+            self.pendentes += 1
+        futuro = self.executor.submit(self._medir, funcao, *args)
+        try:
+            return futuro.result(timeout=settings.LOGIN_HASH_TIMEOUT)
+        except TimeoutError:
+            # O hash termina sozinho e libera a vaga; a requisição não espera mais
+            raise LoginSobrecarregado()
+
+    def _medir(self, funcao, *args):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args)
+        finally:
+            with self.trava:
+                self.pendentes -= 1
+                self.executados += 1
+                self.segundos += time.perf_counter() - inicio
+            self.vagas.release()
+
+    def metricas(self):
+        with self.trava:
+            em_execucao = min(self.pendentes, self.threads)
+            return {
+                'threads': self.threads,
+                'em_execucao': em_execucao,
+                'na_fila': self.pendentes - em_execucao,
+                'capacidade_fila': self.fila,
+                'executados': self.executados,
+                'recusados': self.recusados,
+                'hash_medio_ms': round(self.segundos / self.executados * 1000, 1) if self.executados else None,
+            }
+
+
+_pool = None
+_trava_pool = threading.Lock()
+
+
+def pool():
+    global _pool
+    with _trava_pool:
+        if _pool is None:
+            _pool = _Pool(settings.LOGIN_HASH_THREADS, settings.LOGIN_HASH_FILA)
+        return _pool
+
+
+def verificar_senha(senha, hash_senha):
+    """check_password no pool; LoginSobrecarregado se o pool e a fila estão cheios"""
+    return pool().executar(check_password, senha, hash_senha)
+
+
+def gastar_hash(senha):
+    """Mesmo custo de uma verificação, para usuário inexistente (não revela quem existe)"""
+    pool().executar(make_password, senha)
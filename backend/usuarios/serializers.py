@@ -3,6 +3,8 @@ from rest_framework.validators import UniqueValidator
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.models import User
 from .models import Mecanico, Cliente, Fornecedor, Administrador
+from .principal import resolver_papel, CLAIM_PAPEL, CLAIM_PERFIL
+from .authentication import versao_dos_tokens, CLAIM_VERSAO
 
 class MecanicoSerializer(serializers.ModelSerializer):
     cpf = serializers.CharField(
@@ -148,7 +150,7 @@ class FornecedorSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Fornecedor
-        fields = ['id', 'nome', 'cnpj', 'telefone', 'endereco', 'password', 'email']
+        fields = ['id', 'nome', 'cnpj', 'telefone', 'endereco', 'prazo_entrega_dias', 'password', 'email']
 
     def create(self, validated_data):
         password = validated_data.pop('password')
@@ -166,40 +168,28 @@ class FornecedorSerializer(serializers.ModelSerializer):
         return fornecedor
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # Papel e perfil vão assinados no token (o access herda os claims do refresh),
+        # assim as views não precisam consultar o perfil a cada requisição (ver principal.py)
+        token = super().get_token(user)
+        atual = resolver_papel(user)
+        user._principal = atual
+        token[CLAIM_PAPEL] = atual.papel
+        token[CLAIM_PERFIL] = atual.perfil_id
+        token[CLAIM_VERSAO] = versao_dos_tokens(user.pk)
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
-        user = self.user
-
-        # Inicializa flags
-        is_mecanico = False
-        is_cliente = False
-        is_fornecedor = False
-        is_admin = False
-        user_name = user.username
-
-        # Verifica tipo de usuário
-        if user.is_staff or user.is_superuser:  
-            is_admin = True
-            if hasattr(user, 'administrador'):
-                user_name = user.administrador.nome
-            else:
-                user_name = user.username
-        elif hasattr(user, 'mecanico'):
-            is_mecanico = True
-            user_name = user.mecanico.nome
-        elif hasattr(user, 'cliente'):
-            is_cliente = True
-            user_name = user.cliente.nome
-        elif hasattr(user, 'fornecedor'):
-            is_fornecedor = True
-            user_name = user.fornecedor.nome
+        atual = self.user._principal
 
         # Adiciona ao payload
-        data['is_mecanico'] = is_mecanico
-        data['is_cliente'] = is_cliente
-        data['is_fornecedor'] = is_fornecedor
-        data['is_admin'] = is_admin  
-        data['user_name'] = user_name
+        data['is_mecanico'] = atual.is_mecanico
+        data['is_cliente'] = atual.is_cliente
+        data['is_fornecedor'] = atual.is_fornecedor
+        data['is_admin'] = atual.is_admin
+        data['user_name'] = atual.nome
 
         return data
 
@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidar_usuario, revogar_tokens
+from .identificadores import documentos_do_usuario, normalizar, sincronizar, sincronizar_usuario
+from .models import Cliente, Fornecedor, IdentificadorLogin, Mecanico
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def descartar_usuario_em_cache(sender, instance, **kwargs):
+    """O próximo request com token deste usuário relê a linha (ver authentication.py)"""
+    invalidar_usuario(instance.pk)
+
+
+# Papel e perfil vão assinados no token (principal.py): quem muda de papel perde os tokens emitidos
+PAPEL = ('is_staff', 'is_superuser')
+
+
+def _papel(user):
+    # Pelo __dict__: campo adiado (only/defer) fica None em vez de custar uma consulta
+    return tuple(user.__dict__.get(campo) for campo in PAPEL)
+
+
+@receiver(post_init, sender=User)
+def lembrar_papel(sender, instance, **kwargs):
+    instance._papel_salvo = _papel(instance)
+
+
+@receiver(post_save, sender=User)
+def revogar_tokens_ao_mudar_papel(sender, instance, created=False, raw=False, **kwargs):
+    anterior, atual = instance._papel_salvo, _papel(instance)
+    instance._papel_salvo = atual
+    if created or raw:
+        return
+    if any(antes is not None and antes != depois for antes, depois in zip(anterior, atual)):
+        revogar_tokens(instance)
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=Mecanico)
+@receiver(post_save, sender=Fornecedor)
+def revogar_tokens_ao_criar_perfil(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw and instance.user_id:
+        revogar_tokens(instance.user)
+
+
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=Mecanico)
+@receiver(post_delete, sender=Fornecedor)
+def revogar_tokens_ao_excluir_perfil(sender, instance, origin=None, **kwargs):
+    # Na exclusão do próprio User (cascade) os tokens já deixam de valer
+    if instance.user_id and getattr(origin, 'model', type(origin)) is not User:
+        revogar_tokens(instance.user)
+
+
+@receiver(post_save, sender=User)
+def atualizar_identificadores_do_usuario(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Username e e-mail aceitos no login (o update_last_login do login não mexe neles)"""
+    if raw or (update_fields is not None and not {'username', 'email'} & set(update_fields)):
+        return
+    sincronizar_usuario(instance)
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=Mecanico)
+@receiver(post_save, sender=Fornecedor)
+def atualizar_documentos_do_usuario(sender, instance, raw=False, **kwargs):
+    """CPF/CNPJ do perfil também serve de login para o usuário ligado a ele"""
+    if raw or not instance.user_id:
+        return
+    sincronizar(instance.user_id, 'DOCUMENTO', documentos_do_usuario(instance.user_id))
+
+
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=Mecanico)
+@receiver(post_delete, sender=Fornecedor)
+def remover_documento_do_usuario(sender, instance, **kwargs):
+    # Só apaga: o perfil pode estar saindo junto com o próprio User (cascade)
+    if instance.user_id:
+        documento = instance.cnpj if sender is Fornecedor else instance.cpf
+        IdentificadorLogin.objects.filter(
+            user_id=instance.user_id, tipo='DOCUMENTO', identificador=normalizar(documento, 'DOCUMENTO')
+        ).delete()
@@ -0,0 +1,52 @@
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from usuarios.models import Mecanico
+
+
+class CacheUsuarioJWTTests(APITestCase):
+    def setUp(self):
+        caches['usuarios'].clear()
+        self.user = User.objects.create_user(username='mec_cache', password='senha123')
+        Mecanico.objects.create(
+            nome='Mec Cache', cpf='444.555.666-77', telefone='(83) 90000-0010', email='mec.cache@sgom.local',
+            user=self.user
+        )
+        resp = self.client.post('/api/token/', {'username': 'mec_cache', 'password': 'senha123'}, format='json')
+        self.access = resp.data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def _consultas_de_usuario(self, consultas):
+        return [q for q in consultas if q['sql'].startswith('SELECT') and 'FROM "auth_user"' in q['sql']]
+
+    def test_painel_le_o_usuario_uma_vez(self):
+        with CaptureQueriesContext(connection) as consultas:
+            for _ in range(10):
+                self.assertEqual(self.client.get('/api/ordens-servico/').status_code, 200)
+
+        self.assertEqual(len(self._consultas_de_usuario(consultas)), 1)
+
+    def test_alterar_o_usuario_descarta_o_cache(self):
+        self.client.get('/api/ordens-servico/')
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get('/api/ordens-servico/').status_code, 401)
+
+    def test_revogar_invalida_os_tokens_emitidos(self):
+        self.assertEqual(self.client.get('/api/ordens-servico/').status_code, 200)
+
+        self.assertEqual(self.client.post('/api/token/revogar/').status_code, 200)
+
+        self.assertEqual(self.client.get('/api/ordens-servico/').status_code, 401)
+        antigo_sem_versao = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {antigo_sem_versao}')
+        self.assertEqual(self.client.get('/api/ordens-servico/').status_code, 401)
+
+        # Um login novo recebe a versão atual
+        resp = self.client.post('/api/token/', {'username': 'mec_cache', 'password': 'senha123'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.data['access']}")
+        self.assertEqual(self.client.get('/api/ordens-servico/').status_code, 200)
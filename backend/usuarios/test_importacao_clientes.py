@@ -0,0 +1,167 @@
+import io
+import re
+from unittest import mock
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from oficina.emails import despachar_pendentes
+from oficina.models import EmailPendente
+from usuarios.importacao import ArquivoInvalido, Importacao, importar, normalizar_cpf, normalizar_placa
+from usuarios.models import Cliente, ConviteAcesso, IdentificadorLogin
+from veiculos.models import Veiculo
+
+
+def gerar_cpf(n):
+    """CPF válido (com dígitos verificadores) a partir de um número"""
+    digitos = f'{n:09d}'
+    for tamanho in (9, 10):
+        soma = sum(int(d) * peso for d, peso in zip(digitos, range(tamanho + 1, 1, -1)))
+        digitos += str(soma * 10 % 11 % 10)
+    return digitos
+
+
+def csv_de(linhas, cabecalho='nome;cpf;telefone;email;endereco;placa;modelo;marca;ano'):
+    return io.StringIO('\n'.join([cabecalho] + linhas) + '\n')
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_DESPACHO_IMEDIATO=False)
+class ImportacaoClientesTests(TestCase):
+    def test_normaliza_cpf_e_placa(self):
+        self.assertEqual(normalizar_cpf('529 982 247-25'), '529.982.247-25')
+        self.assertIsNone(normalizar_cpf('529.982.247-26'))
+        self.assertIsNone(normalizar_cpf('111.111.111-11'))
+        self.assertEqual(normalizar_placa('abc 1234'), 'ABC-1234')
+        self.assertEqual(normalizar_placa('abc-1d23'), 'ABC1D23')
+        self.assertIsNone(normalizar_placa('AB-123'))
+
+    def test_cria_clientes_veiculos_e_convites(self):
+        cpf = gerar_cpf(1)
+        arquivo = csv_de([
+            f'Ana;{cpf};83 90000-0001;Ana@Email.com;Rua A;abc1234;Gol;VW;2019',
+            f'Ana;{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]};83 90000-0001;;Rua A;XYZ1D23;Uno;Fiat;2015',
+            f'Bruno;{gerar_cpf(2)};83 90000-0002;;Rua B;;;;',
+        ])
+        importacao = importar(arquivo)
+
+        self.assertEqual((importacao.clientes_criados, importacao.veiculos_criados, importacao.total_erros), (2, 2, 0))
+        ana = Cliente.objects.get(nome='Ana')
+        self.assertEqual(ana.cpf, normalizar_cpf(cpf))
+        self.assertEqual(set(ana.veiculos.values_list('placa', flat=True)), {'ABC-1234', 'XYZ1D23'})
+        self.assertEqual(ana.user.username, cpf)
+        self.assertFalse(ana.user.has_usable_password())
+        self.assertEqual(
+            set(IdentificadorLogin.objects.filter(user=ana.user).values_list('tipo', 'identificador')),
+            {('USERNAME', cpf), ('EMAIL', 'ana@email.com'), ('DOCUMENTO', cpf)},
+        )
+        self.assertEqual(ConviteAcesso.objects.count(), 2)
+        # Sem e-mail, o token volta para ser entregue pela oficina
+        self.assertEqual([convite['username'] for convite in importacao.convites], [gerar_cpf(2)])
+
+        despachar_pendentes()
+        self.assertEqual(len(mail.outbox), 1)
+        token = re.search(r'senha: (\S+)', mail.outbox[0].body).group(1)
+        # Enviado, o código não fica na caixa de saída
+        self.assertFalse(EmailPendente.objects.filter(mensagem__contains=token).exists())
+
+        # Senha fraca não gasta o convite
+        resposta = APIClient().post('/api/convites/aceitar/', {'token': token, 'password': '123'}, format='json')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertTrue(resposta.data['erro'])
+
+        resposta = APIClient().post('/api/convites/aceitar/', {'token': token, 'password': 'nova-senha'}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(authenticate(username='ana@email.com', password='nova-senha'), ana.user)
+        resposta = APIClient().post('/api/convites/aceitar/', {'token': token, 'password': 'outra'}, format='json')
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_duplicados_e_linhas_invalidas(self):
+        cpf_existente = gerar_cpf(10)
+        cliente = Cliente.objects.create(nome='Antigo', cpf=cpf_existente, telefone='-', endereco='-')
+        Veiculo.objects.create(placa='ABC-1234', modelo='Gol', marca='VW', ano=2019, cliente=cliente)
+        User.objects.create_user(username=gerar_cpf(11), password='x')
+
+        importacao = importar(csv_de([
+            f'Antigo;{normalizar_cpf(cpf_existente)};-;;-;DEF5678;Uno;Fiat;2010',  # 2: veículo novo do cliente existente
+            f'Novo;{gerar_cpf(12)};-;;-;abc-1234;Uno;Fiat;2010',                   # 3: placa já no banco
+            f'Outro;{gerar_cpf(13)};-;;-;DEF-5678;Uno;Fiat;2010',                  # 4: placa repetida no arquivo
+            f'Usuario;{gerar_cpf(11)};-;;-;;;;',                                   # 5: username ocupado
+            'Errado;123.456.789-00;-;email;-;ZZZ;;;abc',                          # 6: vários campos inválidos
+        ]))
+
+        self.assertEqual((importacao.clientes_criados, importacao.veiculos_criados), (0, 1))
+        self.assertEqual(Veiculo.objects.get(placa='DEF-5678').cliente, cliente)
+        erros = {erro['linha']: erro['erros'] for erro in importacao.erros}
+        self.assertEqual(erros[3], {'placa': 'Placa já cadastrada'})
+        self.assertEqual(erros[4], {'placa': 'Placa já cadastrada'})
+        self.assertEqual(erros[5], {'cpf': 'Usuário já existe'})
+        self.assertEqual(set(erros[6]), {'cpf', 'email', 'placa', 'modelo', 'marca', 'ano'})
+        self.assertEqual(importacao.total_erros, 4)
+
+    def test_conflito_na_gravacao_nao_conta_a_linha_duas_vezes(self):
+        Veiculo.objects.create(
+            placa='ABC-1234', modelo='Gol', marca='VW', ano=2019,
+            cliente=Cliente.objects.create(nome='Antigo', cpf=gerar_cpf(30), telefone='-', endereco='-'),
+        )
+        with mock.patch.object(Importacao, '_gravar_no_banco', side_effect=IntegrityError):
+            importacao = importar(csv_de([
+                f'Novo;{gerar_cpf(31)};-;;-;ABC1234;Uno;Fiat;2010',  # 2: placa já no banco
+                f'Outro;{gerar_cpf(32)};-;;-;;;;',                    # 3: cai no conflito
+            ]))
+
+        self.assertEqual(importacao.total_erros, 2)
+        self.assertEqual([erro['linha'] for erro in importacao.erros], [2, 3])
+        self.assertEqual(importacao.erros[0]['erros'], {'placa': 'Placa já cadastrada'})
+        self.assertIn('lote', importacao.erros[1]['erros'])
+
+    @override_settings(IMPORTACAO_LINHAS_POR_LOTE=100)
+    def test_consultas_nao_crescem_com_as_linhas(self):
+        def contar(inicio, quantidade):
+            linhas = [
+                f'Cliente {n};{gerar_cpf(n)};-;c{n}@email.com;-;AAA{n:04d};Gol;VW;2019'
+                for n in range(inicio, inicio + quantidade)
+            ]
+            with CaptureQueriesContext(connection) as consultas:
+                importacao = importar(csv_de(linhas))
+            self.assertEqual(importacao.clientes_criados, quantidade)
+            return len(consultas)
+
+        self.assertEqual(contar(100, 5), contar(200, 80))
+
+    def test_arquivo_sem_colunas_obrigatorias(self):
+        with self.assertRaises(ArquivoInvalido):
+            importar(csv_de([], cabecalho='nome,placa'))
+
+
+class ImportacaoPorUploadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', password='x', is_staff=True)
+
+    def _enviar(self, conteudo):
+        arquivo = SimpleUploadedFile('clientes.csv', conteudo.encode('utf-8-sig'), content_type='text/csv')
+        return self.client.post('/api/clientes/importar/', {'arquivo': arquivo}, format='multipart')
+
+    def test_admin_importa_csv(self):
+        self.client.force_authenticate(self.admin)
+        resposta = self._enviar(f'Nome,CPF,Telefone,Endereco\nCarla,{gerar_cpf(20)},-,Rua C\nSem CPF,,-,Rua D\n')
+
+        self.assertEqual(resposta.status_code, 207)
+        self.assertEqual(resposta.data['clientes_criados'], 1)
+        self.assertEqual(resposta.data['erros'], [{'linha': 3, 'erros': {'cpf': 'Este campo é obrigatório.'}}])
+        self.assertEqual(resposta.data['convites'][0]['username'], gerar_cpf(20))
+
+        resposta = self._enviar('nome,placa\nCarla,ABC1234\n')
+        self.assertEqual(resposta.status_code, 400)
+
+    def test_somente_admin(self):
+        cliente = User.objects.create_user(username='cliente', password='x')
+        self.client.force_authenticate(cliente)
+        self.assertEqual(self._enviar(f'nome,cpf,telefone,endereco\nX,{gerar_cpf(21)},-,-\n').status_code, 403)
+        self.assertFalse(Cliente.objects.exists())
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from usuarios.limites import BaldeDeFichas
+from usuarios.senhas import LoginSobrecarregado, _Pool
+
+
+class LimiteLoginTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        User.objects.create_user(username='limite', password='senha123')
+        self.client = APIClient()
+
+    def test_balde_repoe_as_fichas_com_o_tempo(self):
+        balde = BaldeDeFichas('teste', capacidade=2, por_minuto=60)
+        self.assertEqual(balde.consumir('x', agora=100)[0], True)
+        self.assertEqual(balde.consumir('x', agora=100)[0], True)
+        permitido, espera = balde.consumir('x', agora=100.25)
+        self.assertFalse(permitido)
+        self.assertAlmostEqual(espera, 0.75)
+        self.assertTrue(balde.consumir('x', agora=101.5)[0])
+        # Outra chave tem o próprio balde
+        self.assertTrue(balde.consumir('y', agora=100.25)[0])
+
+    @override_settings(LOGIN_LIMITE_IDENTIFICADOR={'capacidade': 2, 'por_minuto': 1})
+    def test_rajada_no_mesmo_identificador_recebe_429(self):
+        respostas = [
+            self.client.post('/api/token/', {'username': 'LIMITE', 'password': 'errada'}, format='json')
+            for _ in range(3)
+        ]
+        self.assertEqual([r.status_code for r in respostas], [401, 401, 429])
+        self.assertIn('Retry-After', respostas[2])
+
+        # Outro identificador do mesmo IP continua podendo tentar
+        resp = self.client.post('/api/token/', {'username': 'outro', 'password': 'x'}, format='json')
+        self.assertEqual(resp.status_code, 401)
+
+    @override_settings(LOGIN_LIMITE_IP={'capacidade': 1, 'por_minuto': 1})
+    def test_limite_por_ip(self):
+        self.client.post('/api/token/', {'username': 'a', 'password': 'x'}, format='json', REMOTE_ADDR='10.0.0.1')
+        bloqueado = self.client.post('/api/token/', {'username': 'b', 'password': 'x'}, format='json', REMOTE_ADDR='10.0.0.1')
+        outro_ip = self.client.post('/api/token/', {'username': 'c', 'password': 'x'}, format='json', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual((bloqueado.status_code, outro_ip.status_code), (429, 401))
+
+
+class PoolHashTests(TestCase):
+    def test_pool_cheio_recusa_na_hora(self):
+        pool = _Pool(threads=1, fila=1)
+        liberar = threading.Event()
+        ocupando = [
+            threading.Thread(target=pool.executar, args=(liberar.wait,)) for _ in range(2)
+        ]
+        for thread in ocupando:
+            thread.start()
+        while pool.metricas()['na_fila'] < 1:
+            time.sleep(0.001)
+
+        with self.assertRaises(LoginSobrecarregado):
+            pool.executar(lambda: True)
+        metricas = pool.metricas()
+        self.assertEqual((metricas['em_execucao'], metricas['na_fila'], metricas['recusados']), (1, 1, 1))
+
+        liberar.set()
+        for thread in ocupando:
+            thread.join()
+        self.assertEqual(pool.executar(lambda: 'ok'), 'ok')
+        self.assertEqual(pool.metricas()['executados'], 3)
@@ -0,0 +1,56 @@
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from usuarios.models import Cliente, IdentificadorLogin
+
+
+class LoginPorIdentificadorTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='joana', email='Joana.Silva@Email.com', password='senha123')
+        self.cliente = Cliente.objects.create(
+            nome='Joana', cpf='123.456.789-09', telefone='(83) 90000-0011', email='joana.silva@email.com',
+            user=self.user
+        )
+
+    def test_aceita_username_email_e_cpf(self):
+        for identificador in ['joana', 'JOANA.Silva@email.com', '123.456.789-09', '12345678909']:
+            with self.subTest(identificador=identificador):
+                self.assertEqual(authenticate(username=identificador, password='senha123'), self.user)
+        self.assertIsNone(authenticate(username='joana', password='errada'))
+        self.assertIsNone(authenticate(username='ninguem', password='senha123'))
+
+    def test_username_diferencia_maiusculas(self):
+        # O Django aceita "Joana" e "joana" como usuários distintos: cada um entra na sua conta
+        outra = User.objects.create_user(username='Joana', password='outra123')
+        self.assertEqual(authenticate(username='Joana', password='outra123'), outra)
+        self.assertIsNone(authenticate(username='Joana', password='senha123'))
+        self.assertIsNone(authenticate(username='JOANA', password='senha123'))
+        self.assertEqual(authenticate(username='joana', password='senha123'), self.user)
+
+    def test_busca_em_uma_consulta(self):
+        with CaptureQueriesContext(connection) as consultas:
+            authenticate(username='123.456.789-09', password='senha123')
+        self.assertEqual(len(consultas), 1)
+
+    def test_identificadores_acompanham_os_cadastros(self):
+        self.user.email = 'nova@email.com'
+        self.user.save()
+        self.cliente.cpf = '987.654.321-00'
+        self.cliente.save()
+
+        self.assertEqual(
+            set(IdentificadorLogin.objects.filter(user=self.user).values_list('tipo', 'identificador')),
+            {('USERNAME', 'joana'), ('EMAIL', 'nova@email.com'), ('DOCUMENTO', '98765432100')},
+        )
+        self.cliente.delete()
+        self.assertFalse(IdentificadorLogin.objects.filter(user=self.user, tipo='DOCUMENTO').exists())
+
+    def test_registra_a_tentativa_em_log_estruturado(self):
+        with self.assertLogs('usuarios.login', level='INFO') as logs:
+            authenticate(username='Joana.Silva@email.com', password='errada')
+
+        registro = logs.records[0]
+        self.assertEqual((registro.resultado, registro.tipo_identificador), ('senha_incorreta', 'EMAIL'))
+        self.assertEqual(registro.user_id, self.user.pk)
@@ -0,0 +1,102 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from oficina.models import OrdemServico, Produto
+from usuarios.authentication import CLAIM_VERSAO, versao_dos_tokens
+from usuarios.models import Cliente, Fornecedor, Mecanico
+from usuarios.principal import CLAIM_PAPEL, CLAIM_PERFIL
+from veiculos.models import Veiculo
+
+
+class PapelNoTokenTests(APITestCase):
+    def setUp(self):
+        self.user_mecanico = User.objects.create_user(username='mec_token', password='senha123')
+        self.mecanico = Mecanico.objects.create(
+            nome='Mec Token', cpf='111.222.333-44', telefone='(83) 90000-0007', email='mec.token@sgom.local',
+            user=self.user_mecanico
+        )
+        self.outro_mecanico = Mecanico.objects.create(
+            nome='Outro', cpf='111.222.333-45', telefone='(83) 90000-0008', email='outro.token@sgom.local'
+        )
+        self.user_fornecedor = User.objects.create_user(username='forn_token', password='senha123')
+        self.fornecedor = Fornecedor.objects.create(nome='Peças Token', cnpj='11222333000144', user=self.user_fornecedor)
+
+        cliente = Cliente.objects.create(
+            nome='Cliente Token', cpf='555.666.777-88', telefone='(83) 90000-0009', email='cli.token@sgom.local'
+        )
+        veiculo = Veiculo.objects.create(placa='TOK-0001', modelo='Uno', marca='Fiat', ano=2012, cliente=cliente)
+        OrdemServico.objects.create(veiculo=veiculo, mecanico_responsavel=self.mecanico)
+        OrdemServico.objects.create(veiculo=veiculo, mecanico_responsavel=self.outro_mecanico)
+
+    def _login(self, username):
+        resp = self.client.post('/api/token/', {'username': username, 'password': 'senha123'}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        return resp
+
+    def test_login_assina_papel_e_perfil(self):
+        resp = self._login('mec_token')
+        self.assertTrue(resp.data['is_mecanico'])
+        self.assertEqual(resp.data['user_name'], 'Mec Token')
+
+        token = AccessToken(resp.data['access'])
+        self.assertEqual((token[CLAIM_PAPEL], token[CLAIM_PERFIL]), ('mecanico', self.mecanico.pk))
+
+    def test_fornecedor_e_reconhecido_no_login(self):
+        resp = self._login('forn_token')
+        self.assertTrue(resp.data['is_fornecedor'])
+        self.assertEqual(AccessToken(resp.data['access'])[CLAIM_PERFIL], self.fornecedor.pk)
+
+    def test_mudar_papel_ou_perfil_revoga_os_tokens(self):
+        def token_vale(access):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+            return self.client.get('/api/ordens-servico/').status_code == 200
+
+        # last_login e outros campos não mexem no papel
+        access = self._login('mec_token').data['access']
+        self.user_mecanico.first_name = 'Mec'
+        self.user_mecanico.save()
+        self.assertTrue(token_vale(access))
+
+        self.user_mecanico.is_staff = True
+        self.user_mecanico.save()
+        self.assertFalse(token_vale(access))
+
+        access = self._login('forn_token').data['access']
+        cliente = Cliente.objects.create(
+            nome='Fornecedor Cliente', cpf='555.666.777-99', telefone='-', endereco='-', user=self.user_fornecedor
+        )
+        self.assertFalse(token_vale(access))
+
+        access = self._login('forn_token').data['access']
+        cliente.delete()
+        self.assertFalse(token_vale(access))
+
+        # Excluir o User leva o perfil junto sem tropeçar na revogação
+        self.user_fornecedor.delete()
+        self.assertFalse(User.objects.filter(username='forn_token').exists())
+
+    def test_listagem_nao_consulta_o_perfil(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self._login('mec_token').data['access']}")
+
+        with CaptureQueriesContext(connection) as consultas:
+            resp = self.client.get('/api/ordens-servico/')
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data), 1)
+        self.assertFalse([q for q in consultas if '"usuarios_mecanico"."user_id" =' in q['sql']])
+
+    def test_token_antigo_sem_claims_usa_o_banco(self):
+        token = AccessToken.for_user(self.user_fornecedor)
+        # Sem papel nem perfil, mas da versão atual (criar o perfil revogou a anterior)
+        token[CLAIM_VERSAO] = versao_dos_tokens(self.user_fornecedor.pk)
+        Produto.objects.create(fornecedor=self.fornecedor, nome='Filtro', custo=10, preco_venda=20)
+        Produto.objects.create(
+            fornecedor=Fornecedor.objects.create(nome='Outro', cnpj='99888777000166'), nome='Vela', custo=5, preco_venda=9
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        resp = self.client.get('/api/produtos/')
+
+        self.assertEqual([p['nome'] for p in resp.data], ['Filtro'])
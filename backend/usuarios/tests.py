@@ -1,9 +1,13 @@
+import re
+
 from rest_framework.test import APITestCase
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.core import mail
 from django.test import override_settings
 from usuarios.models import Mecanico, Cliente
+from oficina.emails import despachar_pendentes
+from oficina.models import EmailPendente
 
 
 class PB19CadastroMecanicosTests(APITestCase):
@@ -54,12 +58,20 @@ class PB19CadastroMecanicosTests(APITestCase):
         nomes = [m['nome'] for m in list_response.data]
         self.assertIn('Roberto Alves', nomes)
 
-        # And o sistema envia credenciais por email
+        # And o sistema envia credenciais por email (pela caixa de saída)
+        despachar_pendentes()
         self.assertEqual(len(mail.outbox), 1)
         email_sent = mail.outbox[0]
         self.assertIn('roberto.alves@oficina.com', email_sent.to)
         self.assertIn('Login:', email_sent.body)
-        self.assertIn('Senha:', email_sent.body)
+        # A senha não vai por e-mail nem fica na caixa de saída: vai um código para definir outra
+        self.assertNotIn('senha_segura_123', email_sent.body)
+        self.assertFalse(EmailPendente.objects.filter(mensagem__contains='senha_segura_123').exists())
+        token = re.search(r'senha: (\S+)', email_sent.body).group(1)
+        self.assertEqual(EmailPendente.objects.get().mensagem, '')
+        response = self.client.post('/api/convites/aceitar/', {'token': token, 'password': 'outra_senha_456'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(User.objects.get(pk=mec.user.pk).check_password('outra_senha_456'))
 
         # And o usuário de autenticação é criado e vinculado
         mecanico = Mecanico.objects.get(cpf=cpf)
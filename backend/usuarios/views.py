@@ -1,14 +1,23 @@
+import io
+
 from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.utils.crypto import get_random_string
-from django.core.mail import send_mail
-from django.conf import settings
+from oficina.emails import enfileirar_email
 from .forms import MecanicoForm
 from rest_framework import viewsets, status, permissions
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser, AllowAny, IsAuthenticated
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import MultiPartParser
 from .models import Mecanico, Cliente, Fornecedor, Administrador
 from .serializers import MecanicoSerializer, ClienteSerializer, FornecedorSerializer, AdministradorSerializer
+from .principal import principal
+from .authentication import revogar_tokens
+from .senhas import pool
+from .importacao import ArquivoInvalido, Importacao
+from .convites import aceitar_convite, criar_convite, texto_convite
 
 
 def cadastrar_mecanico(request):
@@ -65,21 +74,13 @@ class MecanicoViewSet(viewsets.ModelViewSet):
         mecanico = Mecanico.objects.create(user=user, **dados_validados)
 
         # 5. ENVIAR E-MAIL (PB19 Requisito)
+        # A senha não vai no e-mail (ficaria gravada na caixa de saída): vai um convite para o
+        # mecânico definir a própria senha (ver convites.py)
+        token, expira_em = criar_convite(user)
         subject = 'Bem-vindo ao SGOM - Cadastro Realizado'
-        message = (
-            f"Olá {nome},\n\n"
-            f"Seu acesso foi criado com sucesso.\n"
-            f"Login: {username}\n"
-            # ATENÇÃO: Enviar senha por e-mail não é seguro, mas atende ao requisito de confirmação
-            # Se preferir segurança, remova a linha abaixo.
-            f"Senha: {password}\n\n" 
-            f"Acesse o sistema para começar."
-        )
-        from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'no-reply@sgom.local')
-        try:
-            send_mail(subject, message, from_email, [email], fail_silently=True)
-        except Exception:
-            pass
+        message = texto_convite(user, token, expira_em)
+        # Gravado na caixa de saída; o envio não segura a resposta (ver oficina/emails.py)
+        enfileirar_email(subject, message, [email])
 
         # 6. RESPOSTA FINAL
         data = MecanicoSerializer(mecanico).data
@@ -152,14 +153,41 @@ class ClienteViewSet(viewsets.ModelViewSet):
             user.delete()
         return response
     
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser], parser_classes=[MultiPartParser])
+    def importar(self, request):
+        """
+        Importa clientes e veículos de um CSV enviado no campo "arquivo" (ver
+        usuarios/importacao.py). As linhas válidas são gravadas mesmo que outras
+        falhem. Os tokens de convite de quem não tem e-mail voltam em "convites".
+        URL: /api/clientes/importar/
+        """
+        enviado = request.FILES.get('arquivo')
+        if enviado is None:
+            return Response({'erro': 'Envie o CSV no campo "arquivo".'}, status=status.HTTP_400_BAD_REQUEST)
+
+        importacao = Importacao()
+        try:
+            importacao.executar(io.TextIOWrapper(enviado.file, encoding='utf-8-sig', newline=''))
+        except (ArquivoInvalido, UnicodeDecodeError) as erro:
+            return Response({'erro': f'Arquivo inválido: {erro}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = importacao.resumo()
+        data['convites'] = importacao.convites
+        gravou = importacao.clientes_criados or importacao.veiculos_criados
+        if not importacao.total_erros:
+            codigo = status.HTTP_201_CREATED
+        else:
+            codigo = status.HTTP_207_MULTI_STATUS if gravou else status.HTTP_400_BAD_REQUEST
+        return Response(data, status=codigo)
+
     def get_queryset(self):
-        user = self.request.user
+        atual = principal(self.request)
         # Se for superuser, staff ou MECÂNICO, vê tudo
-        if user.is_staff or hasattr(user, 'mecanico'):
+        if atual.is_admin or atual.is_mecanico:
             return Cliente.objects.all()
         # Se for cliente, vê só a si mesmo
-        if hasattr(user, 'cliente'):
-            return Cliente.objects.filter(user=user)
+        if atual.is_cliente:
+            return Cliente.objects.filter(pk=atual.perfil_id)
         return Cliente.objects.none()
     
 class FornecedorViewSet(viewsets.ModelViewSet):
@@ -176,3 +204,46 @@ class AdministradorViewSet(viewsets.ModelViewSet):
     queryset = Administrador.objects.all()
     serializer_class = AdministradorSerializer
     permission_classes = [IsAuthenticated]
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def revogar_sessoes(request):
+    """
+    Encerra todas as sessões do usuário logado: os tokens (access e refresh)
+    emitidos até agora deixam de ser aceitos.
+    URL: /api/token/revogar/
+    """
+    revogar_tokens(request.user)
+    return Response({'mensagem': 'Sessões encerradas. Faça login novamente.'})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metricas_login(request):
+    """
+    Ocupação do pool de hash de senha do login neste processo (fila, recusas, tempo médio).
+    URL: /api/token/metricas/
+    """
+    return Response(pool().metricas())
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def aceitar_convite_view(request):
+    """
+    Define a senha de um usuário a partir do token do convite (importação ou cadastro).
+    Body: {"token": "...", "password": "..."}
+    URL: /api/convites/aceitar/
+    """
+    token = request.data.get('token')
+    senha = request.data.get('password')
+    if not token or not senha:
+        return Response({'erro': 'Informe "token" e "password".'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        user = aceitar_convite(token, senha)
+    except ValidationError as erro:
+        return Response({'erro': erro.messages}, status=status.HTTP_400_BAD_REQUEST)
+    if user is None:
+        return Response({'erro': 'Convite inválido, expirado ou já utilizado.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'mensagem': 'Senha definida. Faça login.', 'username': user.username})
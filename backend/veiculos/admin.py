@@ -10,13 +10,13 @@ class VeiculoAdmin(admin.ModelAdmin):
 
 @admin.register(Servico)
 class ServicoAdmin(admin.ModelAdmin):
-    list_display = ['id_servico', 'descricao', 'preco_base']
+    list_display = ['id_servico', 'descricao', 'preco_base', 'duracao_minutos']
     search_fields = ['descricao']
     list_filter = ['preco_base']
     ordering = ['descricao']
     fieldsets = (
         ('Informações Básicas', {
-            'fields': ('descricao', 'preco_base')
+            'fields': ('descricao', 'preco_base', 'duracao_minutos')
         }),
         ('Detalhes', {
             'fields': ('detalhes_padrao',),
@@ -0,0 +1,160 @@
+"""
+Agenda dos mecânicos: horários ocupados e busca de horários livres.
+
+Os agendamentos ativos de vários mecânicos num período são lidos em uma
+consulta (ocupacao) e o resto é feito em memória: cada mecânico tem a lista
+de intervalos ocupados ordenada por início, que é varrida contra o expediente
+(AGENDA_EXPEDIENTE_INICIO/FIM nos AGENDA_DIAS_UTEIS).
+
+A carga de cada mecânico (minutos agendados no dia em CargaMecanico e
+Mecanico.os_abertas) é mantida pelos sinais e usada na atribuição automática.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from usuarios.models import Mecanico
+from .models import Agendamento, CargaMecanico, DURACAO_MAXIMA
+
+
+def conflitos_de_horario(mecanico, inicio, fim, agendamento=None):
+    """
+    Agendamentos ativos do mecânico que se sobrepõem a [inicio, fim).
+    Quem conflita começa entre inicio - DURACAO_MAXIMA e fim, então a consulta
+    lê só esse trecho do índice (mecanico, horario_inicio), por maior que seja o histórico.
+    """
+    conflitos = Agendamento.objects.filter(
+        mecanico=mecanico,
+        horario_inicio__gt=inicio - DURACAO_MAXIMA,
+        horario_inicio__lt=fim,
+        horario_fim__gt=inicio,
+    ).exclude(status='CANCELADO')
+    # Excluir o próprio agendamento se for atualização
+    if agendamento is not None:
+        conflitos = conflitos.exclude(pk=agendamento.pk)
+    return conflitos
+
+
+def ocupacao(mecanico_ids, inicio, fim):
+    """{mecanico_id: [(inicio, fim), ...]} dos agendamentos ativos em [inicio, fim), ordenados"""
+    agendamentos = (
+        Agendamento.objects
+        .filter(
+            mecanico_id__in=mecanico_ids,
+            horario_inicio__gt=inicio - DURACAO_MAXIMA,
+            horario_inicio__lt=fim,
+            horario_fim__gt=inicio,
+        )
+        .exclude(status='CANCELADO')
+        .order_by('mecanico_id', 'horario_inicio')
+        .values_list('mecanico_id', 'horario_inicio', 'horario_fim')
+    )
+    ocupados = defaultdict(list)
+    for mecanico_id, comeca, termina in agendamentos:
+        ocupados[mecanico_id].append((comeca, termina))
+    return ocupados
+
+
+def esta_livre(ocupados, inicio, fim):
+    """
+    [inicio, fim) não se sobrepõe à lista de ocupados (ordenada por início, como
+    em ocupacao). Só olha quem começa entre inicio - DURACAO_MAXIMA e fim.
+    """
+    posicao = bisect_left(ocupados, (fim,))
+    while posicao > 0:
+        posicao -= 1
+        comeca, termina = ocupados[posicao]
+        if comeca <= inicio - DURACAO_MAXIMA:
+            break
+        if termina > inicio:
+            return False
+    return True
+
+
+def expedientes(inicio, fim):
+    """Janelas de expediente (início, fim) em cada dia útil entre inicio e fim, recortadas por eles"""
+    abre = time.fromisoformat(settings.AGENDA_EXPEDIENTE_INICIO)
+    fecha = time.fromisoformat(settings.AGENDA_EXPEDIENTE_FIM)
+    dia = timezone.localtime(inicio).date()
+    ultimo = timezone.localtime(fim).date()
+
+    janelas = []
+    while dia <= ultimo:
+        if dia.weekday() in settings.AGENDA_DIAS_UTEIS:
+            comeca = max(timezone.make_aware(datetime.combine(dia, abre)), inicio)
+            termina = min(timezone.make_aware(datetime.combine(dia, fecha)), fim)
+            if comeca < termina:
+                janelas.append((comeca, termina))
+        dia += timedelta(days=1)
+    return janelas
+
+
+def horarios_livres(mecanico_ids, inicio, fim, duracao):
+    """
+    {mecanico_id: [(inicio, fim), ...]} com os horários de tamanho `duracao` que
+    cabem no expediente sem sobrepor agendamentos. Em cada intervalo livre os
+    horários são oferecidos em sequência, a partir do início do intervalo.
+    """
+    inicio = max(inicio, timezone.now())
+    ocupados = ocupacao(mecanico_ids, inicio, fim)
+    janelas = expedientes(inicio, fim)
+
+    livres = {}
+    for mecanico_id in mecanico_ids:
+        agenda = ocupados.get(mecanico_id, [])
+        horarios = []
+        proximo = 0  # Os ocupados vêm ordenados: a varredura nunca volta atrás
+        for abre, fecha in janelas:
+            cursor = abre
+            while proximo < len(agenda) and agenda[proximo][1] <= cursor:
+                proximo += 1
+            indice = proximo
+            while cursor + duracao <= fecha:
+                if indice < len(agenda) and agenda[indice][0] < cursor + duracao:
+                    # Sobrepõe o próximo ocupado: pula para o fim dele
+                    cursor = max(cursor, agenda[indice][1])
+                    indice += 1
+                    continue
+                horarios.append((cursor, cursor + duracao))
+                cursor += duracao
+        livres[mecanico_id] = horarios
+    return livres
+
+
+def contribuicao(mecanico_id, inicio, fim, status):
+    """(mecanico_id, dia, minutos) que o agendamento soma em CargaMecanico, ou None se cancelado"""
+    if status == 'CANCELADO' or not mecanico_id:
+        return None
+    return mecanico_id, timezone.localtime(inicio).date(), int((fim - inicio).total_seconds() // 60)
+
+
+def somar_carga(mecanico_id, dia, minutos):
+    if not minutos:
+        return
+    CargaMecanico.objects.get_or_create(mecanico_id=mecanico_id, data=dia)
+    CargaMecanico.objects.filter(mecanico_id=mecanico_id, data=dia).update(
+        minutos_agendados=F('minutos_agendados') + minutos
+    )
+
+
+def escolher_mecanico(inicio, fim, excluir=()):
+    """
+    Mecânico livre em [inicio, fim) com a menor carga: horas agendadas no dia
+    + OS abertas (comparado em minutos). Uma consulta, lendo os contadores.
+    """
+    minutos_no_dia = CargaMecanico.objects.filter(
+        mecanico=OuterRef('pk'), data=timezone.localtime(inicio).date()
+    ).values('minutos_agendados')
+    return (
+        Mecanico.objects
+        .exclude(pk__in=excluir)
+        .filter(~Exists(conflitos_de_horario(OuterRef('pk'), inicio, fim)))
+        .annotate(carga=Coalesce(Subquery(minutos_no_dia), Value(0)) + F('os_abertas') * 60)
+        .order_by('carga', 'pk')
+        .first()
+    )
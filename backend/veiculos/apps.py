@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class VeiculosConfig(AppConfig):
     name = 'veiculos'
+
+    def ready(self):
+        import veiculos.signals
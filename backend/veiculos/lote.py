@@ -0,0 +1,150 @@
+"""
+Criação de agendamentos em lote (frotas e recorrências).
+
+Em vez de rodar a validação completa (e a consulta de conflito) linha a linha,
+o lote faz um número fixo de consultas:
+- clientes, veículos, serviços e mecânicos de todas as linhas (uma consulta cada);
+- os agendamentos ativos dos mecânicos no período do lote (agenda.ocupacao);
+- a carga diária, quando alguma linha pede atribuição automática.
+Os conflitos são checados em memória, contra a agenda de cada mecânico, que
+recebe também as linhas já aceitas do próprio lote. As linhas válidas são
+gravadas com um bulk_create numa única transação; as inválidas voltam com o erro.
+"""
+import calendar
+from bisect import insort
+from collections import defaultdict
+from datetime import timedelta
+
+from django.utils import timezone
+
+from usuarios.models import Cliente, Mecanico
+from .agenda import contribuicao, esta_livre, ocupacao, somar_carga
+from .models import Agendamento, CargaMecanico, Servico, Veiculo, DURACAO_PADRAO, DURACAO_MAXIMA
+
+LOTE_MAXIMO = 500
+
+
+def _somar_meses(instante, meses):
+    local = timezone.localtime(instante)
+    total = local.month - 1 + meses
+    ano, mes = local.year + total // 12, total % 12 + 1
+    dia = min(local.day, calendar.monthrange(ano, mes)[1])
+    return timezone.make_aware(local.replace(tzinfo=None, year=ano, month=mes, day=dia))
+
+
+def expandir_recorrencia(agendamento, frequencia, intervalo, ocorrencias):
+    """Repete a linha base `ocorrencias` vezes, mantendo a duração"""
+    inicio = agendamento['horario_inicio']
+    duracao = (agendamento['horario_fim'] - inicio) if agendamento.get('horario_fim') else None
+    linhas = []
+    for n in range(ocorrencias):
+        if frequencia == 'MENSAL':
+            comeca = _somar_meses(inicio, n * intervalo)
+        else:
+            passo = timedelta(days=1 if frequencia == 'DIARIA' else 7)
+            comeca = inicio + passo * intervalo * n
+        linhas.append({**agendamento, 'horario_inicio': comeca, 'horario_fim': comeca + duracao if duracao else None})
+    return linhas
+
+
+def _validar_linha(linha, clientes, veiculos, servicos, mecanicos, agora):
+    """Erros da linha no formato do AgendamentoSerializer (ou {})"""
+    for campo, mapa in (('cliente', clientes), ('veiculo', veiculos), ('servico', servicos)):
+        if linha[campo] not in mapa:
+            return {campo: 'Registro não encontrado.'}
+    if linha.get('mecanico') and linha['mecanico'] not in mecanicos:
+        return {'mecanico': 'Registro não encontrado.'}
+    if veiculos[linha['veiculo']].cliente_id != linha['cliente']:
+        return {'veiculo': 'O veículo selecionado não pertence ao cliente informado.'}
+
+    inicio, fim = linha['horario_inicio'], linha['horario_fim']
+    if inicio < agora:
+        return {'horario_inicio': 'Não é possível agendar no passado.'}
+    if fim <= inicio:
+        return {'horario_fim': 'O fim deve ser após o início.'}
+    if fim - inicio > DURACAO_MAXIMA:
+        return {'horario_fim': f'Um agendamento pode durar no máximo {DURACAO_MAXIMA.seconds // 3600} horas.'}
+    return {}
+
+
+def criar_em_lote(linhas):
+    """
+    Valida e grava as linhas (dicionários com ids, já convertidos pelo
+    AgendamentoLoteItemSerializer). Devolve, na ordem das linhas, o Agendamento
+    criado ou o dicionário de erros. Deve rodar numa transação: trava os
+    mecânicos envolvidos enquanto confere a agenda.
+    """
+    for linha in linhas:
+        if not linha.get('horario_fim'):
+            linha['horario_fim'] = linha['horario_inicio'] + DURACAO_PADRAO
+
+    clientes = Cliente.objects.in_bulk({linha['cliente'] for linha in linhas})
+    veiculos = Veiculo.objects.in_bulk({linha['veiculo'] for linha in linhas})
+    servicos = Servico.objects.in_bulk({linha['servico'] for linha in linhas})
+
+    # Travados em ordem de pk; com atribuição automática todos são candidatos
+    automatica = any(not linha.get('mecanico') for linha in linhas)
+    mecanicos = Mecanico.objects.select_for_update().order_by('pk')
+    if not automatica:
+        mecanicos = mecanicos.filter(pk__in={linha['mecanico'] for linha in linhas})
+    mecanicos = {mecanico.pk: mecanico for mecanico in mecanicos}
+
+    agora = timezone.now()
+    resultados = [_validar_linha(linha, clientes, veiculos, servicos, mecanicos, agora) for linha in linhas]
+    validas = [linha for linha, erros in zip(linhas, resultados) if not erros]
+    if not validas:
+        return resultados
+
+    ocupados = ocupacao(
+        list(mecanicos),
+        min(linha['horario_inicio'] for linha in validas),
+        max(linha['horario_fim'] for linha in validas),
+    )
+    cargas = {}
+    if automatica:
+        dias = {timezone.localtime(linha['horario_inicio']).date() for linha in validas}
+        cargas = {
+            (mecanico_id, dia): minutos
+            for mecanico_id, dia, minutos in CargaMecanico.objects.filter(
+                mecanico_id__in=mecanicos, data__in=dias
+            ).values_list('mecanico_id', 'data', 'minutos_agendados')
+        }
+
+    novos = []
+    deltas = defaultdict(int)
+    for indice, linha in enumerate(linhas):
+        if resultados[indice]:
+            continue
+        inicio, fim = linha['horario_inicio'], linha['horario_fim']
+        dia = timezone.localtime(inicio).date()
+
+        if linha.get('mecanico'):
+            mecanico = mecanicos[linha['mecanico']]
+            if not esta_livre(ocupados[mecanico.pk], inicio, fim):
+                resultados[indice] = {'horario_inicio': 'Horário já ocupado para o mecânico.'}
+                continue
+        else:
+            livres = [m for m in mecanicos.values() if esta_livre(ocupados[m.pk], inicio, fim)]
+            if not livres:
+                resultados[indice] = {'mecanico': 'Nenhum mecânico livre neste horário.'}
+                continue
+            mecanico = min(livres, key=lambda m: (cargas.get((m.pk, dia), 0) + m.os_abertas * 60, m.pk))
+
+        agendamento = Agendamento(
+            cliente=clientes[linha['cliente']], veiculo=veiculos[linha['veiculo']],
+            servico=servicos[linha['servico']], mecanico=mecanico,
+            horario_inicio=inicio, horario_fim=fim, preco=linha['preco'],
+        )
+        # A própria linha passa a ocupar a agenda para as seguintes
+        insort(ocupados[mecanico.pk], (inicio, fim))
+        _, dia, minutos = contribuicao(mecanico.pk, inicio, fim, agendamento.status)
+        cargas[mecanico.pk, dia] = cargas.get((mecanico.pk, dia), 0) + minutos
+        deltas[mecanico.pk, dia] += minutos
+        resultados[indice] = agendamento
+        novos.append(agendamento)
+
+    # bulk_create não dispara os sinais: a carga é somada uma vez por mecânico e dia
+    Agendamento.objects.bulk_create(novos)
+    for (mecanico_id, dia), minutos in deltas.items():
+        somar_carga(mecanico_id, dia, minutos)
+    return resultados
@@ -0,0 +1,88 @@
+# Generated by Django 6.0 on 2026-10-18 19:40
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def preencher_horario_fim(apps, schema_editor):
+    # Agendamentos sem fim usavam 1 hora calculada na consulta; agora o valor fica gravado
+    Agendamento = apps.get_model('veiculos', 'Agendamento')
+    Agendamento.objects.filter(horario_fim__isnull=True).update(horario_fim=F('horario_inicio') + timedelta(hours=1))
+
+
+CONFLITOS_LISTADOS = 20
+
+
+def verificar_conflitos(apps, schema_editor):
+    """
+    A restrição de exclusão não aceita NOT VALID: com dados conflitantes o ALTER TABLE
+    falharia com um erro genérico. Antes dele, lista o que precisa ser corrigido.
+    """
+    Agendamento = apps.get_model('veiculos', 'Agendamento')
+    problemas = [
+        f"agendamento {pk}: horario_fim ({fim}) não é posterior a horario_inicio ({inicio})"
+        for pk, inicio, fim in Agendamento.objects.filter(horario_fim__lte=F('horario_inicio'))
+        .order_by('pk').values_list('pk', 'horario_inicio', 'horario_fim')[:CONFLITOS_LISTADOS]
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT a.id_agendamento, b.id_agendamento, a.mecanico_id FROM veiculos_agendamento a '
+            'JOIN veiculos_agendamento b ON a.mecanico_id = b.mecanico_id AND a.id_agendamento < b.id_agendamento '
+            'AND a.horario_inicio < b.horario_fim AND b.horario_inicio < a.horario_fim '
+            "WHERE a.status <> 'CANCELADO' AND b.status <> 'CANCELADO' "
+            'AND a.horario_inicio < a.horario_fim AND b.horario_inicio < b.horario_fim '
+            'ORDER BY a.id_agendamento, b.id_agendamento LIMIT %s',
+            [CONFLITOS_LISTADOS],
+        )
+        problemas += [
+            f"agendamentos {a} e {b} do mecânico {mecanico} se sobrepõem"
+            for a, b, mecanico in cursor.fetchall()
+        ]
+    if problemas:
+        raise RuntimeError(
+            "Não é possível criar a restrição agendamento_sem_sobreposicao. Corrija os horários ou "
+            "cancele um dos agendamentos (status CANCELADO) e rode a migração de novo:\n  "
+            + "\n  ".join(problemas)
+        )
+
+
+def criar_restricao_sem_sobreposicao(apps, schema_editor):
+    # Só no Postgres: o banco recusa dois agendamentos ativos do mesmo mecânico no mesmo intervalo
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    verificar_conflitos(apps, schema_editor)
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        'ALTER TABLE veiculos_agendamento ADD CONSTRAINT agendamento_sem_sobreposicao '
+        'EXCLUDE USING gist (mecanico_id WITH =, tstzrange(horario_inicio, horario_fim) WITH &&) '
+        "WHERE (status <> 'CANCELADO')"
+    )
+
+
+def remover_restricao_sem_sobreposicao(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE veiculos_agendamento DROP CONSTRAINT IF EXISTS agendamento_sem_sobreposicao')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veiculos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_horario_fim, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='agendamento',
+            name='horario_fim',
+            field=models.DateTimeField(blank=True),
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['mecanico', 'horario_inicio'], name='agendamento_mec_inicio_idx'),
+        ),
+        migrations.RunPython(criar_restricao_sem_sobreposicao, remover_restricao_sem_sobreposicao),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veiculos', '0002_agendamento_horario_fim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servico',
+            name='duracao_minutos',
+            field=models.PositiveIntegerField(default=60, verbose_name='Duração (minutos)'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-18 20:30
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+def calcular_cargas(apps, schema_editor):
+    # Carga inicial dos contadores a partir dos agendamentos e OS existentes
+    Agendamento = apps.get_model('veiculos', 'Agendamento')
+    CargaMecanico = apps.get_model('veiculos', 'CargaMecanico')
+    Mecanico = apps.get_model('usuarios', 'Mecanico')
+
+    minutos = defaultdict(int)
+    agendamentos = Agendamento.objects.exclude(status='CANCELADO').values_list(
+        'mecanico_id', 'horario_inicio', 'horario_fim'
+    )
+    for mecanico_id, inicio, fim in agendamentos.iterator():
+        minutos[mecanico_id, timezone.localtime(inicio).date()] += int((fim - inicio).total_seconds() // 60)
+    CargaMecanico.objects.bulk_create(
+        [CargaMecanico(mecanico_id=m, data=d, minutos_agendados=total) for (m, d), total in minutos.items()],
+        batch_size=5000,
+    )
+
+    abertas = Mecanico.objects.annotate(
+        total=Count('ordemservico', filter=~Q(ordemservico__status__in=['CONCLUIDA', 'CANCELADA']))
+    ).filter(total__gt=0)
+    for mecanico in abertas:
+        Mecanico.objects.filter(pk=mecanico.pk).update(os_abertas=mecanico.total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0021_arquivo_movimentacao'),
+        ('usuarios', '0004_mecanico_os_abertas'),
+        ('veiculos', '0003_servico_duracao_minutos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CargaMecanico',
+            fields=[
+                ('id_carga', models.AutoField(primary_key=True, serialize=False)),
+                ('data', models.DateField()),
+                ('minutos_agendados', models.IntegerField(default=0)),
+                ('mecanico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cargas', to='usuarios.mecanico')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('mecanico', 'data'), name='carga_por_mecanico_e_dia')],
+            },
+        ),
+        migrations.RunPython(calcular_cargas, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from datetime import timedelta
 from django.db import models
 from django.core.exceptions import ValidationError
 from usuarios.models import Cliente
@@ -21,6 +22,8 @@ class Servico(models.Model):
     preco_base = models.DecimalField(max_digits=10, decimal_places=2)
 
     detalhes_padrao = models.TextField(blank=True, null=True, verbose_name="Detalhamento Padrão")
+    # Tamanho do horário oferecido na busca de horários livres (ver agenda.py)
+    duracao_minutos = models.PositiveIntegerField(default=60, verbose_name="Duração (minutos)")
 
     def __str__(self):
         return self.descricao
@@ -29,6 +32,13 @@ class Servico(models.Model):
         if self.preco_base < 0:
             raise ValidationError("O preço do serviço não pode ser negativo.")
 
+# Duração assumida quando o agendamento é criado sem horario_fim
+DURACAO_PADRAO = timedelta(hours=1)
+# Limita quanto antes do novo horário um agendamento conflitante pode começar,
+# o que mantém a checagem de conflito num trecho curto do índice (mecanico, horario_inicio)
+DURACAO_MAXIMA = timedelta(hours=12)
+
+
 # PB01: Agendamento de serviços
 class Agendamento(models.Model):
     STATUS_CHOICES = [
@@ -44,14 +54,44 @@ class Agendamento(models.Model):
     servico = models.ForeignKey('veiculos.Servico', on_delete=models.PROTECT)
 
     horario_inicio = models.DateTimeField()
-    horario_fim = models.DateTimeField(blank=True, null=True)
+    # Sempre preenchido (padrão aplicado no save) para a checagem de conflito comparar colunas
+    horario_fim = models.DateTimeField(blank=True)
 
     preco = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='AGENDADO')
     criado_em = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        if self.horario_fim is None:
+            self.horario_fim = self.horario_inicio + DURACAO_PADRAO
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['horario_inicio']
+        indexes = [
+            # Conflito de horário e agenda do mecânico (ver AgendamentoSerializer.validate)
+            models.Index(fields=['mecanico', 'horario_inicio'], name='agendamento_mec_inicio_idx'),
+        ]
 
     def __str__(self):
         return f"{self.servico.descricao} - {self.cliente.nome} - {self.horario_inicio}"
+
+
+class CargaMecanico(models.Model):
+    """
+    Minutos agendados do mecânico em cada dia (agendamentos não cancelados, pelo
+    dia de início), mantidos pelos sinais de Agendamento (veiculos/signals.py).
+    A atribuição automática lê a carga daqui em vez de somar agendamentos.
+    """
+    id_carga = models.AutoField(primary_key=True)
+    mecanico = models.ForeignKey('usuarios.Mecanico', on_delete=models.CASCADE, related_name='cargas')
+    data = models.DateField()
+    minutos_agendados = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.mecanico.nome} em {self.data:%d/%m/%Y}: {self.minutos_agendados} min"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['mecanico', 'data'], name='carga_por_mecanico_e_dia'),
+        ]
@@ -1,7 +1,10 @@
+from contextlib import contextmanager
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
-from django.db.models import Q
-from .models import Veiculo, Agendamento, Servico
+from django.db import IntegrityError, transaction
+from .models import Veiculo, Agendamento, Servico, DURACAO_PADRAO, DURACAO_MAXIMA
+from .agenda import conflitos_de_horario, escolher_mecanico
+from .lote import LOTE_MAXIMO
 from usuarios.models import Cliente, Mecanico
 from django.utils import timezone
 
@@ -52,10 +55,27 @@ class VeiculoSerializer(serializers.ModelSerializer):
             },
         }
 
+@contextmanager
+def horario_protegido():
+    """
+    No Postgres a restrição agendamento_sem_sobreposicao recusa a gravação que
+    passou pela validação junto com outra requisição simultânea; devolve o mesmo
+    erro de validação em vez de 500.
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as erro:
+        if 'agendamento_sem_sobreposicao' not in str(erro):
+            raise
+        raise serializers.ValidationError({'horario_inicio': 'Horário já ocupado para o mecânico.'})
+
+
 class AgendamentoSerializer(serializers.ModelSerializer):
     cliente = serializers.PrimaryKeyRelatedField(queryset=Cliente.objects.all(), required=True)
     veiculo = serializers.PrimaryKeyRelatedField(queryset=Veiculo.objects.all(), required=True)
-    mecanico = serializers.PrimaryKeyRelatedField(queryset=Mecanico.objects.all(), required=True)
+    # Sem mecânico, o agendamento vai para o mecânico livre com menor carga (ver agenda.escolher_mecanico)
+    mecanico = serializers.PrimaryKeyRelatedField(queryset=Mecanico.objects.all(), required=False, allow_null=True)
     servico = serializers.PrimaryKeyRelatedField(queryset=Servico.objects.all(), required=True)
     cliente_nome = serializers.SerializerMethodField()
     veiculo_placa = serializers.SerializerMethodField()
@@ -97,25 +117,27 @@ class AgendamentoSerializer(serializers.ModelSerializer):
                     'required': 'Este campo é obrigatório.',
                 }
             },
+            # Opcional na entrada; sem ele vale DURACAO_PADRAO
+            'horario_fim': {'required': False, 'allow_null': True},
         }
 
         # ✅ SOBRESCREVER O UPDATE PARA GARANTIR QUE SALVE
     def update(self, instance, validated_data):
         """Atualizar agendamento permitindo PATCH parcial"""
-        print(f"🔄 Atualizando agendamento #{instance.id_agendamento}")
-        print(f"📦 Dados validados: {validated_data}")
-        
         # Atualizar cada campo fornecido
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-            print(f"   ✅ {attr} = {value}")
         
-        instance.save()
-        print(f"💾 Agendamento salvo! Novo status: {instance.status}")
+        with horario_protegido():
+            instance.save()
         
         return instance
 
     def validate(self, attrs):
+        # Mecânico nulo quer dizer "atribuir automaticamente", o que só acontece na criação
+        if self.instance is not None and 'mecanico' in attrs and attrs['mecanico'] is None:
+            raise serializers.ValidationError({'mecanico': 'Informe o mecânico do agendamento.'})
+
         # ✅ Se for apenas atualização de status, não validar nada
         if self.instance and set(attrs.keys()) == {'status'}:
             return attrs
@@ -130,7 +152,7 @@ class AgendamentoSerializer(serializers.ModelSerializer):
             preco = attrs.get('preco')
             fim = attrs.get('horario_fim')
 
-            if not all([cliente, veiculo, mecanico, servico, inicio, preco]):
+            if not all([cliente, veiculo, servico, inicio, preco]):
                 raise serializers.ValidationError('Todos os campos obrigatórios devem ser preenchidos.')
         else:  # ATUALIZAÇÃO
             cliente = attrs.get('cliente', self.instance.cliente)
@@ -142,27 +164,27 @@ class AgendamentoSerializer(serializers.ModelSerializer):
             fim = attrs.get('horario_fim', self.instance.horario_fim)
 
         # ✅ Validações de data/hora (APENAS se horário foi fornecido/alterado)
-        if 'horario_inicio' in attrs:
-            if inicio < timezone.now():
+        if 'horario_inicio' in attrs or 'horario_fim' in attrs:
+            if 'horario_inicio' in attrs and inicio < timezone.now():
                 raise serializers.ValidationError({'horario_inicio': 'Não é possível agendar no passado.'})
-            
-            if fim and fim <= inicio:
+
+            # Fim sempre gravado: padrão na criação, mesma duração ao remarcar só o início
+            if not attrs.get('horario_fim'):
+                if self.instance and 'horario_fim' not in attrs:
+                    fim = inicio + (self.instance.horario_fim - self.instance.horario_inicio)
+                else:
+                    fim = inicio + DURACAO_PADRAO
+                attrs['horario_fim'] = fim
+
+            if fim <= inicio:
                 raise serializers.ValidationError({'horario_fim': 'O fim deve ser após o início.'})
+            if fim - inicio > DURACAO_MAXIMA:
+                raise serializers.ValidationError(
+                    {'horario_fim': f'Um agendamento pode durar no máximo {DURACAO_MAXIMA.seconds // 3600} horas.'}
+                )
 
             # ✅ Validar conflito de horário APENAS na criação ou se horário foi alterado
-            new_end = fim or (inicio + timezone.timedelta(hours=1))
-            
-            conflitos = Agendamento.objects.filter(mecanico=mecanico).filter(
-                Q(horario_inicio__lt=new_end) & (
-                    Q(horario_fim__gt=inicio) | Q(horario_fim__isnull=True, horario_inicio__lt=new_end)
-                )
-            )
-            
-            # Excluir o próprio agendamento se for atualização
-            if self.instance:
-                conflitos = conflitos.exclude(id_agendamento=self.instance.id_agendamento)
-            
-            if conflitos.exists():
+            if mecanico and conflitos_de_horario(mecanico, inicio, fim, self.instance).exists():
                 raise serializers.ValidationError({'horario_inicio': 'Horário já ocupado para o mecânico.'})
 
         # ✅ Validar veículo x cliente (APENAS se veículo foi fornecido/alterado)
@@ -174,12 +196,57 @@ class AgendamentoSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         # permite camada superior definir mecanico a partir do request, mas mantém create padrão
-        return super().create(validated_data)
+        with horario_protegido():
+            if validated_data.get('mecanico') is None:
+                validated_data['mecanico'] = self._atribuir_mecanico(
+                    validated_data['horario_inicio'], validated_data['horario_fim']
+                )
+            return super().create(validated_data)
+
+    def _atribuir_mecanico(self, inicio, fim):
+        """
+        Escolhe o mecânico livre de menor carga e trava a linha dele até o fim da
+        transação: atribuições simultâneas ao mesmo mecânico esperam e reveem o
+        conflito; se ele foi ocupado nesse meio tempo, passa para o próximo.
+        """
+        tentados = []
+        while True:
+            mecanico = escolher_mecanico(inicio, fim, excluir=tentados)
+            if mecanico is None:
+                raise serializers.ValidationError({'mecanico': 'Nenhum mecânico livre neste horário.'})
+            list(Mecanico.objects.select_for_update().filter(pk=mecanico.pk).values_list('pk'))
+            if not conflitos_de_horario(mecanico, inicio, fim).exists():
+                return mecanico
+            tentados.append(mecanico.pk)
     
+class AgendamentoLoteItemSerializer(serializers.Serializer):
+    """
+    Uma linha de agendamentos/lote/. Só converte os tipos: existência dos
+    registros, horários e conflitos são conferidos para o lote todo (ver lote.py).
+    """
+    cliente = serializers.IntegerField()
+    veiculo = serializers.IntegerField()
+    mecanico = serializers.IntegerField(required=False, allow_null=True)
+    servico = serializers.IntegerField()
+    horario_inicio = serializers.DateTimeField()
+    horario_fim = serializers.DateTimeField(required=False, allow_null=True)
+    preco = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+class RecorrenciaSerializer(serializers.Serializer):
+    """Regra de repetição de agendamentos/lote/: a linha base repetida `ocorrencias` vezes"""
+    FREQUENCIAS = [('DIARIA', 'Diária'), ('SEMANAL', 'Semanal'), ('MENSAL', 'Mensal')]
+
+    agendamento = AgendamentoLoteItemSerializer()
+    frequencia = serializers.ChoiceField(choices=FREQUENCIAS)
+    intervalo = serializers.IntegerField(min_value=1, default=1)
+    ocorrencias = serializers.IntegerField(min_value=1, max_value=LOTE_MAXIMO)
+
+
 class ServicoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Servico
-        fields = ['id_servico', 'descricao', 'preco_base', 'detalhes_padrao']
+        fields = ['id_servico', 'descricao', 'preco_base', 'detalhes_padrao', 'duracao_minutos']
 
     def validate_preco_base(self, value):
         """
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from .models import Agendamento
+from .agenda import contribuicao, somar_carga
+
+
+@receiver(pre_save, sender=Agendamento)
+def guardar_carga_anterior(sender, instance, **kwargs):
+    """Guarda a contribuição gravada antes da alteração, para calcular o delta"""
+    instance._carga_anterior = None
+    if instance.pk:
+        anterior = Agendamento.objects.filter(pk=instance.pk).values_list(
+            'mecanico_id', 'horario_inicio', 'horario_fim', 'status'
+        ).first()
+        if anterior:
+            instance._carga_anterior = contribuicao(*anterior)
+
+
+@receiver(post_save, sender=Agendamento)
+def atualizar_carga_mecanico(sender, instance, **kwargs):
+    """Aplica em CargaMecanico a diferença entre a contribuição anterior e a atual"""
+    anterior = getattr(instance, '_carga_anterior', None)
+    atual = contribuicao(instance.mecanico_id, instance.horario_inicio, instance.horario_fim, instance.status)
+    if anterior == atual:
+        return
+    if anterior:
+        somar_carga(anterior[0], anterior[1], -anterior[2])
+    if atual:
+        somar_carga(*atual)
+
+
+@receiver(post_delete, sender=Agendamento)
+def descontar_carga_mecanico(sender, instance, **kwargs):
+    atual = contribuicao(instance.mecanico_id, instance.horario_inicio, instance.horario_fim, instance.status)
+    if atual:
+        somar_carga(atual[0], atual[1], -atual[2])
@@ -0,0 +1,146 @@
+from datetime import datetime, time, timedelta
+from django.contrib.auth.models import User
+from django.core import mail
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from usuarios.models import Cliente, Mecanico
+from veiculos.models import Veiculo, Servico, Agendamento, CargaMecanico
+from oficina.emails import despachar_pendentes
+
+
+class AgendamentoLoteTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='recepcao_lote'))
+        self.mecanicos = [
+            Mecanico.objects.create(
+                nome=f'Mec Lote {i}', cpf=f'575.757.575-{i:02d}', telefone='(83) 90000-0005', email=f'lote{i}@sgom.local'
+            )
+            for i in range(2)
+        ]
+        self.cliente = Cliente.objects.create(
+            nome='Transportadora', cpf='797.979.797-97', telefone='(83) 90000-0006', email='transp@sgom.local'
+        )
+        self.veiculos = [
+            Veiculo.objects.create(placa=f'LOT-000{i}', modelo='Daily', marca='Iveco', ano=2020, cliente=self.cliente)
+            for i in range(3)
+        ]
+        self.servico = Servico.objects.create(descricao='Revisão de frota', preco_base=300)
+        self.url = reverse('agendamento-lote')
+        self.dia = timezone.localdate() + timedelta(days=3)
+
+    def _as(self, hora, dia=None):
+        return timezone.make_aware(datetime.combine(dia or self.dia, time(hora)))
+
+    def _linha(self, veiculo, hora, mecanico=None, **extra):
+        linha = {
+            'cliente': self.cliente.pk, 'veiculo': veiculo.pk, 'servico': self.servico.pk,
+            'horario_inicio': self._as(hora).isoformat(), 'preco': '300.00', **extra
+        }
+        if mecanico is not None:
+            linha['mecanico'] = mecanico.pk
+        return linha
+
+    def test_lista_com_conflito_dentro_do_lote(self):
+        mecanico = self.mecanicos[0]
+        resp = self.client.post(self.url, {'agendamentos': [
+            self._linha(self.veiculos[0], 9, mecanico),
+            self._linha(self.veiculos[1], 9, mecanico),   # mesmo horário da linha anterior
+            self._linha(self.veiculos[2], 10, mecanico),
+            {'cliente': self.cliente.pk},                 # incompleta
+        ]}, format='json')
+
+        self.assertEqual(resp.status_code, 207)
+        self.assertEqual(resp.data['criados'], 2)
+        self.assertEqual([r['criado'] for r in resp.data['resultados']], [True, False, True, False])
+        self.assertIn('horario_inicio', resp.data['resultados'][1]['erros'])
+        self.assertIn('veiculo', resp.data['resultados'][3]['erros'])
+        self.assertEqual(Agendamento.objects.filter(mecanico=mecanico).count(), 2)
+
+    def test_conflito_com_agendamento_existente(self):
+        mecanico = self.mecanicos[0]
+        Agendamento.objects.create(
+            cliente=self.cliente, veiculo=self.veiculos[0], mecanico=mecanico, servico=self.servico,
+            horario_inicio=self._as(8), horario_fim=self._as(10), preco=300
+        )
+        resp = self.client.post(self.url, {'agendamentos': [self._linha(self.veiculos[1], 9, mecanico)]}, format='json')
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.data['criados'], 0)
+
+    def test_recorrencia_semanal(self):
+        resp = self.client.post(self.url, {'recorrencia': {
+            'agendamento': self._linha(self.veiculos[0], 9, self.mecanicos[0],
+                                       horario_fim=self._as(11).isoformat()),
+            'frequencia': 'SEMANAL', 'intervalo': 2, 'ocorrencias': 3,
+        }}, format='json')
+
+        self.assertEqual(resp.status_code, 201)
+        inicios = list(Agendamento.objects.order_by('horario_inicio').values_list('horario_inicio', 'horario_fim'))
+        self.assertEqual(inicios, [
+            (self._as(9) + timedelta(weeks=2 * n), self._as(11) + timedelta(weeks=2 * n)) for n in range(3)
+        ])
+
+    def test_recorrencia_mensal_respeita_o_fim_do_mes(self):
+        dia = datetime(timezone.localdate().year + 1, 1, 31).date()
+        resp = self.client.post(self.url, {'recorrencia': {
+            'agendamento': {**self._linha(self.veiculos[0], 9, self.mecanicos[0]),
+                            'horario_inicio': self._as(9, dia).isoformat()},
+            'frequencia': 'MENSAL', 'ocorrencias': 3,
+        }}, format='json')
+
+        self.assertEqual(resp.status_code, 201)
+        datas = [timezone.localtime(a.horario_inicio) for a in Agendamento.objects.order_by('horario_inicio')]
+        self.assertEqual([(d.month, d.hour) for d in datas], [(1, 9), (2, 9), (3, 9)])
+        self.assertEqual([datas[0].day, datas[2].day], [31, 31])
+        self.assertIn(datas[1].day, (28, 29))
+
+    def test_atribuicao_automatica_distribui_o_lote(self):
+        resp = self.client.post(self.url, {'agendamentos': [
+            self._linha(veiculo, 9) for veiculo in self.veiculos
+        ]}, format='json')
+
+        self.assertEqual(resp.status_code, 207)
+        atribuidos = [r['agendamento']['mecanico'] for r in resp.data['resultados'] if r['criado']]
+        self.assertEqual(sorted(atribuidos), [m.pk for m in self.mecanicos])
+        self.assertIn('mecanico', resp.data['resultados'][2]['erros'])
+        for mecanico in self.mecanicos:
+            self.assertEqual(
+                CargaMecanico.objects.get(mecanico=mecanico, data=self.dia).minutos_agendados, 60
+            )
+
+    def test_consultas_nao_crescem_com_o_lote(self):
+        def contar(quantidade, hora_inicial):
+            linhas = [self._linha(self.veiculos[0], hora_inicial + n, self.mecanicos[0]) for n in range(quantidade)]
+            with CaptureQueriesContext(connection) as consultas:
+                resp = self.client.post(self.url, {'agendamentos': linhas}, format='json')
+            self.assertEqual(resp.status_code, 201)
+            return len(consultas)
+
+        contar(1, 7)  # cria a CargaMecanico do dia; as chamadas seguintes só a atualizam
+        self.assertEqual(contar(1, 8), contar(6, 10))
+
+    def test_lote_vazio_ou_grande_demais(self):
+        self.assertEqual(self.client.post(self.url, {'agendamentos': []}, format='json').status_code, 400)
+        linhas = [self._linha(self.veiculos[0], 9)] * 501
+        self.assertEqual(self.client.post(self.url, {'agendamentos': linhas}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, [self._linha(self.veiculos[0], 9)], format='json').status_code, 400)
+
+    @override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', DEFAULT_FROM_EMAIL='no-reply@sgom.local'
+    )
+    def test_lote_enfileira_confirmacao_dos_criados(self):
+        mecanico = self.mecanicos[0]
+        resp = self.client.post(self.url, {'agendamentos': [
+            self._linha(self.veiculos[0], 9, mecanico),
+            self._linha(self.veiculos[1], 9, mecanico),   # conflito: não gera e-mail
+            self._linha(self.veiculos[2], 10, mecanico),
+        ]}, format='json')
+
+        self.assertEqual(resp.status_code, 207)
+        self.assertEqual(despachar_pendentes(), (2, 0))
+        self.assertEqual([m.to for m in mail.outbox], [['transp@sgom.local']] * 2)
+        self.assertEqual(mail.outbox[0].subject, 'SGOM: Agendamento confirmado')
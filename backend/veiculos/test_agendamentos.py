@@ -7,6 +7,7 @@ from django.test import override_settings
 from django.core import mail
 from usuarios.models import Cliente, Mecanico
 from veiculos.models import Veiculo, Servico, Agendamento
+from oficina.emails import despachar_pendentes
 
 
 class PB01AgendamentoTests(APITestCase):
@@ -68,7 +69,9 @@ class PB01AgendamentoTests(APITestCase):
         self.assertIn('veiculo_placa', resp.data)
         self.assertIn('veiculo_modelo', resp.data)
         self.assertIn('servico_descricao', resp.data)
-        # Email de confirmação
+        # Email de confirmação: gravado na caixa de saída e enviado fora da requisição
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(despachar_pendentes(), (1, 0))
         self.assertEqual(len(mail.outbox), 1)
         self.assertIn(self.cliente.email, mail.outbox[0].to)
         self.assertIn('Agendamento confirmado', mail.outbox[0].subject)
@@ -80,8 +83,8 @@ class PB01AgendamentoTests(APITestCase):
         }
         resp = self.client.post(self.url_list, payload, format='json')
         self.assertEqual(resp.status_code, 400)
-        # Espera erros nos campos obrigatórios ausentes
-        for field in ['cliente', 'veiculo', 'mecanico', 'servico', 'horario_inicio']:
+        # Espera erros nos campos obrigatórios ausentes (mecânico é opcional: atribuição automática)
+        for field in ['cliente', 'veiculo', 'servico', 'horario_inicio']:
             self.assertIn(field, resp.data)
         # Mensagem localizada para horario_inicio
         self.assertIn('Este campo é obrigatório.', [str(e) for e in resp.data['horario_inicio']])
@@ -162,6 +165,56 @@ class PB01AgendamentoTests(APITestCase):
         self.assertIn('veiculo', resp.data)
         self.assertIn('O veículo selecionado não pertence ao cliente informado.', resp.data['veiculo'])
 
+    def _payload(self, inicio, fim=None):
+        payload = {
+            'cliente': self.cliente.id_cliente,
+            'veiculo': self.veiculo.id_veiculo,
+            'mecanico': self.mecanico.id_mecanico,
+            'servico': self.servico.id_servico,
+            'horario_inicio': inicio.isoformat(),
+            'preco': '150.00',
+        }
+        if fim:
+            payload['horario_fim'] = fim.isoformat()
+        return payload
+
+    def test_horario_fim_padrao_gravado(self):
+        inicio = timezone.now() + timedelta(days=1)
+        resp = self.client.post(self.url_list, self._payload(inicio), format='json')
+        self.assertEqual(resp.status_code, 201)
+        agendamento = Agendamento.objects.get(pk=resp.data['id_agendamento'])
+        self.assertEqual(agendamento.horario_fim, agendamento.horario_inicio + timedelta(hours=1))
+
+        # O fim padrão também conta no conflito
+        resp = self.client.post(self.url_list, self._payload(inicio + timedelta(minutes=45)), format='json')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_agendamento_cancelado_libera_horario(self):
+        inicio = timezone.now() + timedelta(days=1)
+        Agendamento.objects.create(
+            cliente=self.cliente, veiculo=self.veiculo, mecanico=self.mecanico, servico=self.servico,
+            horario_inicio=inicio, preco=100.00, status='CANCELADO'
+        )
+        resp = self.client.post(self.url_list, self._payload(inicio), format='json')
+        self.assertEqual(resp.status_code, 201)
+
+    def test_remarcar_inicio_mantem_duracao(self):
+        inicio = timezone.now() + timedelta(days=1)
+        resp = self.client.post(self.url_list, self._payload(inicio, inicio + timedelta(hours=2)), format='json')
+        url = reverse('agendamento-detail', args=[resp.data['id_agendamento']])
+
+        novo_inicio = inicio + timedelta(days=1)
+        resp = self.client.patch(url, {'horario_inicio': novo_inicio.isoformat()}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        agendamento = Agendamento.objects.get(pk=resp.data['id_agendamento'])
+        self.assertEqual(agendamento.horario_fim - agendamento.horario_inicio, timedelta(hours=2))
+
+    def test_duracao_maxima(self):
+        inicio = timezone.now() + timedelta(days=1)
+        resp = self.client.post(self.url_list, self._payload(inicio, inicio + timedelta(hours=13)), format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('horario_fim', resp.data)
+
 
 class PB02AgendamentosFuturosTests(APITestCase):
     def setUp(self):
@@ -0,0 +1,107 @@
+from datetime import datetime, time, timedelta
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from oficina.models import OrdemServico
+from usuarios.models import Cliente, Mecanico
+from veiculos.models import Veiculo, Servico, Agendamento, CargaMecanico
+
+
+class AtribuicaoMecanicoTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='recepcao_atribuicao'))
+        self.mecanicos = [
+            Mecanico.objects.create(
+                nome=f'Mec {i}', cpf=f'565.656.565-{i:02d}', telefone='(83) 90000-0003', email=f'mec{i}@sgom.local'
+            )
+            for i in range(3)
+        ]
+        self.cliente = Cliente.objects.create(
+            nome='Cliente Frota', cpf='787.878.787-87', telefone='(83) 90000-0004', email='frota@sgom.local'
+        )
+        self.veiculo = Veiculo.objects.create(placa='FRT-0001', modelo='Strada', marca='Fiat', ano=2021, cliente=self.cliente)
+        self.servico = Servico.objects.create(descricao='Revisão', preco_base=200)
+        self.url = reverse('agendamento-list')
+        self.dia = timezone.localdate() + timedelta(days=3)
+
+    def _as(self, hora):
+        return timezone.make_aware(datetime.combine(self.dia, time(hora)))
+
+    def _agendar(self, mecanico, inicio, fim, **extra):
+        return Agendamento.objects.create(
+            cliente=self.cliente, veiculo=self.veiculo, mecanico=mecanico, servico=self.servico,
+            horario_inicio=inicio, horario_fim=fim, preco=200, **extra
+        )
+
+    def _minutos(self, mecanico):
+        return CargaMecanico.objects.filter(mecanico=mecanico, data=self.dia).values_list(
+            'minutos_agendados', flat=True
+        ).first() or 0
+
+    def _post_sem_mecanico(self, hora):
+        return self.client.post(self.url, {
+            'cliente': self.cliente.pk, 'veiculo': self.veiculo.pk, 'servico': self.servico.pk,
+            'horario_inicio': self._as(hora).isoformat(), 'preco': '200.00',
+        }, format='json')
+
+    def test_escolhe_o_livre_de_menor_carga(self):
+        ocupado, carregado, com_os = self.mecanicos
+        self._agendar(ocupado, self._as(14), self._as(15))            # ocupado no horário pedido
+        self._agendar(carregado, self._as(8), self._as(11))           # 3h agendadas no dia
+        OrdemServico.objects.create(veiculo=self.veiculo, mecanico_responsavel=com_os)  # 1 OS aberta
+
+        resp = self._post_sem_mecanico(14)
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data['mecanico'], com_os.pk)
+
+    def test_sem_mecanico_livre(self):
+        for mecanico in self.mecanicos:
+            self._agendar(mecanico, self._as(9), self._as(12))
+
+        resp = self._post_sem_mecanico(10)
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('mecanico', resp.data)
+
+    def test_editar_nao_aceita_mecanico_nulo(self):
+        agendamento = self._agendar(self.mecanicos[0], self._as(8), self._as(9))
+        url = reverse('agendamento-detail', args=[agendamento.pk])
+
+        resp = self.client.patch(url, {'mecanico': None}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('mecanico', resp.data)
+        agendamento.refresh_from_db()
+        self.assertEqual(agendamento.mecanico, self.mecanicos[0])
+
+    def test_carga_diaria_acompanha_os_agendamentos(self):
+        mecanico, outro, _ = self.mecanicos
+        agendamento = self._agendar(mecanico, self._as(8), self._as(10))
+        self._agendar(mecanico, self._as(10), self._as(10) + timedelta(minutes=30))
+        self.assertEqual(self._minutos(mecanico), 150)
+
+        agendamento.mecanico = outro
+        agendamento.save()
+        self.assertEqual((self._minutos(mecanico), self._minutos(outro)), (30, 120))
+
+        agendamento.status = 'CANCELADO'
+        agendamento.save()
+        self.assertEqual(self._minutos(outro), 0)
+
+        Agendamento.objects.filter(mecanico=mecanico).get().delete()
+        self.assertEqual(self._minutos(mecanico), 0)
+
+    def test_os_abertas_acompanha_o_status(self):
+        mecanico = self.mecanicos[0]
+        os = OrdemServico.objects.create(veiculo=self.veiculo, mecanico_responsavel=mecanico)
+        OrdemServico.objects.create(veiculo=self.veiculo, mecanico_responsavel=mecanico)
+        mecanico.refresh_from_db()
+        self.assertEqual(mecanico.os_abertas, 2)
+
+        os.status = 'EM_ANDAMENTO'
+        os.save()
+        os.status = 'CONCLUIDA'
+        os.save()
+        mecanico.refresh_from_db()
+        self.assertEqual(mecanico.os_abertas, 1)
@@ -0,0 +1,87 @@
+from datetime import datetime, time, timedelta
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from usuarios.models import Cliente, Mecanico
+from veiculos.models import Veiculo, Servico, Agendamento
+
+
+class HorariosLivresTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='recepcao_livres'))
+        self.mecanico = Mecanico.objects.create(
+            nome='Mec Livres', cpf='121.212.121-21', telefone='(83) 90000-0001', email='mec.livres@sgom.local'
+        )
+        self.cliente = Cliente.objects.create(
+            nome='Cliente Livres', cpf='343.434.343-43', telefone='(83) 90000-0002', email='cli.livres@sgom.local'
+        )
+        self.veiculo = Veiculo.objects.create(placa='LVR-0001', modelo='Gol', marca='VW', ano=2018, cliente=self.cliente)
+        self.servico = Servico.objects.create(descricao='Alinhamento', preco_base=90, duracao_minutos=90)
+        self.url = reverse('agendamento-horarios-livres')
+
+        # Próxima segunda-feira com folga (o passado nunca é oferecido)
+        hoje = timezone.localdate() + timedelta(days=7)
+        self.segunda = hoje + timedelta(days=-hoje.weekday())
+
+    def _as(self, hora, minuto=0, dia=None):
+        return timezone.make_aware(datetime.combine(dia or self.segunda, time(hora, minuto)))
+
+    def _agendar(self, inicio, fim, status='AGENDADO', mecanico=None):
+        return Agendamento.objects.create(
+            cliente=self.cliente, veiculo=self.veiculo, mecanico=mecanico or self.mecanico, servico=self.servico,
+            horario_inicio=inicio, horario_fim=fim, preco=90, status=status
+        )
+
+    def _buscar(self, **params):
+        params.setdefault('inicio', self.segunda.isoformat())
+        params.setdefault('fim', self.segunda.isoformat())
+        return self.client.get(self.url, params)
+
+    def _horas(self, resposta):
+        return [
+            timezone.localtime(datetime.fromisoformat(h['inicio'])).strftime('%H:%M')
+            for h in resposta['horarios']
+        ]
+
+    def test_agenda_vazia_divide_o_expediente_pela_duracao(self):
+        resp = self._buscar(servico=self.servico.pk, mecanico=self.mecanico.pk)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self._horas(resp.data[0]), ['08:00', '09:30', '11:00', '12:30', '14:00', '15:30'])
+
+    def test_pula_horarios_ocupados_e_ignora_cancelados(self):
+        self._agendar(self._as(9), self._as(10, 30))
+        self._agendar(self._as(12, 30), self._as(17, 30))
+        self._agendar(self._as(8), self._as(9), status='CANCELADO')
+
+        resp = self._buscar(mecanico=self.mecanico.pk)
+
+        self.assertEqual(self._horas(resp.data[0]), ['08:00', '10:30', '11:30'])
+
+    def test_dias_fora_do_expediente(self):
+        domingo = self.segunda + timedelta(days=6)
+        resp = self._buscar(inicio=domingo.isoformat(), fim=domingo.isoformat(), mecanico=self.mecanico.pk)
+        self.assertEqual(resp.data[0]['horarios'], [])
+
+    def test_consultas_fixas_para_muitos_mecanicos(self):
+        for i in range(50):
+            mecanico = Mecanico.objects.create(
+                nome=f'Mec {i}', cpf=f'000.000.000-{i:02d}', telefone='(83) 90000-0000', email=f'mec{i}@sgom.local'
+            )
+            self._agendar(self._as(10), self._as(11), mecanico=mecanico)
+
+        with CaptureQueriesContext(connection) as consultas:
+            resp = self._buscar(fim=(self.segunda + timedelta(days=29)).isoformat(), servico=self.servico.pk)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data), 51)
+        # Serviço, mecânicos e agendamentos do período
+        self.assertEqual(len(consultas), 3)
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self._buscar(fim=(self.segunda + timedelta(days=40)).isoformat()).status_code, 400)
+        self.assertEqual(self._buscar(servico=999999).status_code, 404)
@@ -1,25 +1,69 @@
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from django.shortcuts import render
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.contrib.auth.models import User
 from django.utils import timezone
 from .models import Agendamento
-from .serializers import VeiculoSerializer, AgendamentoSerializer, ServicoSerializer
+from .serializers import (
+    VeiculoSerializer, AgendamentoSerializer, ServicoSerializer,
+    AgendamentoLoteItemSerializer, RecorrenciaSerializer, horario_protegido,
+)
 from .models import Veiculo, Agendamento, Servico
 from usuarios.models import Cliente, Mecanico
 from django.utils import timezone
-from datetime import datetime
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, timedelta
+from .agenda import horarios_livres
+from .lote import criar_em_lote, expandir_recorrencia, LOTE_MAXIMO
+from oficina.emails import enfileirar_email, enfileirar_emails
+from usuarios.convites import criar_convite, texto_convite
+from usuarios.principal import principal
+from .models import DURACAO_PADRAO
 
 class VeiculoViewSet(viewsets.ModelViewSet):
     queryset = Veiculo.objects.all()
     serializer_class = VeiculoSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+# Maior período aceito na busca de horários livres
+JANELA_MAXIMA_HORARIOS = timedelta(days=31)
+
+
+def _instante_do_parametro(valor, fim_do_dia=False):
+    """Data (início do dia, ou fim com fim_do_dia) ou data e hora ISO da query string, com fuso"""
+    if not valor:
+        return None
+    try:
+        dia = parse_date(valor)
+        instante = None if dia else parse_datetime(valor)
+    except ValueError:
+        return None
+    if instante is not None:
+        return timezone.make_aware(instante) if timezone.is_naive(instante) else instante
+    if dia is None:
+        return None
+    if fim_do_dia:
+        dia += timedelta(days=1)
+    return timezone.make_aware(datetime.combine(dia, datetime.min.time()))
+
+
+def _email_confirmacao(agendamento):
+    """(assunto, mensagem, destinatarios) da confirmação enviada ao cliente"""
+    return (
+        'SGOM: Agendamento confirmado',
+        (
+            f"Olá {agendamento.cliente.nome}, seu agendamento foi confirmado.\n"
+            f"Serviço: {agendamento.servico.descricao}\n"
+            f"Horário: {agendamento.horario_inicio}"
+        ),
+        [agendamento.cliente.email],
+    )
+
+
 # PB01/PB02: Agendamentos
 class AgendamentoViewSet(viewsets.ModelViewSet):
     queryset = Agendamento.objects.all()
@@ -43,39 +87,20 @@ class AgendamentoViewSet(viewsets.ModelViewSet):
         return queryset.order_by('-horario_inicio')
 
     def update(self, request, *args, **kwargs):
-        """Permitir atualização parcial e logar"""
-        print(f"🔧 PATCH recebido para agendamento: {kwargs.get('pk')}")
-        print(f"📦 Dados recebidos: {request.data}")
-        
+        """Permitir atualização parcial"""
         partial = kwargs.pop('partial', True)  # Forçar partial=True
         instance = self.get_object()
         
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        serializer.save() 
-
-        print(f"✅ Agendamento atualizado: {serializer.data}")
-        
+        serializer.save()
         return Response(serializer.data)
 
     def perform_create(self, serializer):
         agendamento = serializer.save()
-        # notificação simples por email para o cliente (se email existir) e log para mecânico
+        # notificação simples por email para o cliente (enviada fora da requisição, ver oficina/emails.py)
         if agendamento.cliente.email:
-            try:
-                send_mail(
-                    subject='SGOM: Agendamento confirmado',
-                    message=(
-                        f"Olá {agendamento.cliente.nome}, seu agendamento foi confirmado.\n"
-                        f"Serviço: {agendamento.servico.descricao}\n"
-                        f"Horário: {agendamento.horario_inicio}"
-                    ),
-                    from_email='no-reply@sgom.local',
-                    recipient_list=[agendamento.cliente.email],
-                    fail_silently=True,
-                )
-            except Exception:
-                pass
+            enfileirar_email(*_email_confirmacao(agendamento))
 
     @action(detail=False, methods=['get'], url_path='futuros')
     def futuros(self, request):
@@ -87,6 +112,114 @@ class AgendamentoViewSet(viewsets.ModelViewSet):
         ser = self.get_serializer(qs, many=True)
         return Response(ser.data)
 
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """
+        Cria vários agendamentos de uma vez (frotas ou recorrência).
+        Body: {"agendamentos": [{...}, ...]} com os mesmos campos do POST simples
+        (mecanico opcional), ou {"recorrencia": {"agendamento": {...},
+        "frequencia": "DIARIA|SEMANAL|MENSAL", "intervalo": 1, "ocorrencias": N}}.
+        Responde com o resultado de cada linha, na ordem enviada; as válidas são
+        gravadas mesmo que outras falhem (201 todas, 207 parte, 400 nenhuma).
+        Cada agendamento criado enfileira o e-mail de confirmação, como no POST simples.
+        URL: /api/agendamentos/lote/
+        """
+        formato_invalido = Response(
+            {'erro': f'Envie "agendamentos" (lista de 1 a {LOTE_MAXIMO}) ou "recorrencia".'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+        if not isinstance(request.data, dict):
+            return formato_invalido
+        if 'recorrencia' in request.data:
+            recorrencia = RecorrenciaSerializer(data=request.data['recorrencia'])
+            recorrencia.is_valid(raise_exception=True)
+            regra = recorrencia.validated_data
+            linhas = expandir_recorrencia(
+                dict(regra['agendamento']), regra['frequencia'], regra['intervalo'], regra['ocorrencias']
+            )
+            erros_de_formato = [{}] * len(linhas)
+        else:
+            brutas = request.data.get('agendamentos')
+            if not isinstance(brutas, list) or not 0 < len(brutas) <= LOTE_MAXIMO:
+                return formato_invalido
+            itens = [AgendamentoLoteItemSerializer(data=bruta) for bruta in brutas]
+            erros_de_formato = [{} if item.is_valid() else item.errors for item in itens]
+            linhas = [dict(item.validated_data) for item, erros in zip(itens, erros_de_formato) if not erros]
+
+        with horario_protegido():
+            gravados = criar_em_lote(linhas)
+            enfileirar_emails(
+                _email_confirmacao(agendamento)
+                for agendamento in gravados
+                if isinstance(agendamento, Agendamento) and agendamento.cliente.email
+            )
+            gravados = iter(gravados)
+        resultados = [erros or next(gravados) for erros in erros_de_formato]
+
+        resposta = []
+        for indice, resultado in enumerate(resultados):
+            if isinstance(resultado, Agendamento):
+                resposta.append({'indice': indice, 'criado': True, 'agendamento': AgendamentoSerializer(resultado).data})
+            else:
+                resposta.append({'indice': indice, 'criado': False, 'erros': resultado})
+
+        criados = sum(item['criado'] for item in resposta)
+        if criados == len(resposta):
+            codigo = status.HTTP_201_CREATED
+        elif criados:
+            codigo = status.HTTP_207_MULTI_STATUS
+        else:
+            codigo = status.HTTP_400_BAD_REQUEST
+        return Response({'criados': criados, 'resultados': resposta}, status=codigo)
+
+    @action(detail=False, methods=['get'], url_path='horarios-livres')
+    def horarios_livres(self, request):
+        """
+        Horários livres por mecânico no período, do tamanho da duração do serviço.
+        Parâmetros: inicio e fim (data ou data e hora; fim como data inclui o dia),
+        servico (opcional, padrão 1 hora) e mecanico (opcional, padrão todos).
+        URL: /api/agendamentos/horarios-livres/?inicio=2026-10-20&fim=2026-10-24&servico=1
+        """
+        inicio = _instante_do_parametro(request.query_params.get('inicio'))
+        fim = _instante_do_parametro(request.query_params.get('fim'), fim_do_dia=True)
+        if inicio is None or fim is None or fim <= inicio:
+            return Response(
+                {'erro': 'Informe "inicio" e "fim" válidos (AAAA-MM-DD ou data e hora ISO), com fim após o início.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if fim - inicio > JANELA_MAXIMA_HORARIOS:
+            return Response(
+                {'erro': f'O período pode ter no máximo {JANELA_MAXIMA_HORARIOS.days} dias.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        duracao = DURACAO_PADRAO
+        servico_id = request.query_params.get('servico', None)
+        if servico_id:
+            servico = Servico.objects.filter(pk=servico_id).only('duracao_minutos').first()
+            if servico is None:
+                return Response({'erro': 'Serviço não encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+            duracao = timedelta(minutes=servico.duracao_minutos)
+
+        mecanicos = Mecanico.objects.order_by('nome')
+        mecanico_id = request.query_params.get('mecanico', None)
+        if mecanico_id:
+            mecanicos = mecanicos.filter(pk=mecanico_id)
+        nomes = dict(mecanicos.values_list('id_mecanico', 'nome'))
+
+        livres = horarios_livres(list(nomes), inicio, fim, duracao)
+        formato = serializers.DateTimeField().to_representation
+        return Response([
+            {
+                'mecanico': mecanico_id,
+                'mecanico_nome': nome,
+                'horarios': [
+                    {'inicio': formato(comeca), 'fim': formato(termina)} for comeca, termina in livres[mecanico_id]
+                ],
+            }
+            for mecanico_id, nome in nomes.items()
+        ])
+
 class ServicoViewSet(viewsets.ModelViewSet):
     """
     PB06 - CRUD de Serviços e Mão de Obra.
@@ -137,8 +270,8 @@ def cadastrar_veiculo(request):
             while User.objects.filter(username=username).exists():
                 username = f"{base_username}{i}"
                 i += 1
-            password = User.objects.make_random_password(length=10)
-            user = User.objects.create_user(username=username, email=novo_email or '', password=password)
+            # Sem senha utilizável: o cliente define a sua pelo convite (usuarios/convites.py)
+            user = User.objects.create_user(username=username, email=novo_email or '', first_name=novo_nome[:150])
             cliente = Cliente.objects.create(
                 nome=novo_nome,
                 cpf=novo_cpf,
@@ -148,20 +281,12 @@ def cadastrar_veiculo(request):
                 user=user,
             )
             novo_cliente_criado = True
+            token, expira_em = criar_convite(user)
             if novo_email:
-                try:
-                    send_mail(
-                        subject='SGOM: Credenciais de acesso',
-                        message=(
-                            f"Olá {cliente.nome}, suas credenciais foram criadas.\n"
-                            f"Usuário: {username}\nSenha: {password}"
-                        ),
-                        from_email='no-reply@sgom.local',
-                        recipient_list=[novo_email],
-                        fail_silently=True,
-                    )
-                except Exception:
-                    pass
+                enfileirar_email('SGOM: Credenciais de acesso', texto_convite(user, token, expira_em), [novo_email])
+            else:
+                # Sem e-mail, a oficina entrega o código ao cliente
+                messages.info(request, f'Usuário {username}: código para definir a senha {token}')
         else:
             messages.error(request, 'É obrigatório vincular o veículo a um cliente (existente ou novo)')
 
@@ -212,8 +337,9 @@ def agenda_mecanico(request):
         # Padrão: listar agendamentos futuros
         qs = Agendamento.objects.filter(horario_inicio__gte=timezone.now())
     qs = qs.order_by('horario_inicio')
-    if request.user and hasattr(request.user, 'mecanico'):
-        qs = qs.filter(mecanico=request.user.mecanico)
+    atual = principal(request)
+    if atual.is_mecanico:
+        qs = qs.filter(mecanico_id=atual.perfil_id)
     serializer = AgendamentoSerializer(qs, many=True)
 
     context = { 'agendamentos': serializer.data, **context_extra }
@@ -93,7 +93,7 @@ function DashboardAdmin() {
             const [prodResp, servResp, movResp, cliResp, mecResp, fornResp, pedCompraResp] = await Promise.all([
                 api.get('produtos/'),
                 api.get('servicos/'),
-                api.get('movimentacoes-estoque/'),
+                api.get('movimentacoes-estoque/?limit=20'),  // As 20 mais recentes
                 api.get('clientes/'),
                 api.get('mecanicos/'),
                 api.get('fornecedores/'),
@@ -102,7 +102,7 @@ function DashboardAdmin() {
 
             setProdutos(prodResp.data);
             setServicos(servResp.data);
-            setMovimentacoes(movResp.data);
+            setMovimentacoes(movResp.data.resultados);
             setClientes(cliResp.data);
             setMecanicos(mecResp.data);
             setFornecedores(fornResp.data);
@@ -371,7 +371,7 @@ function DashboardAdmin() {
                                 {movimentacoes.length === 0 ? (
                                     <p className="text-gray-400 text-center py-8">Nenhuma movimentação registrada</p>
                                 ) : (
-                                    movimentacoes.slice(-20).reverse().map(m => (
+                                    movimentacoes.map(m => (
                                         <div key={m.id_movimentacao} className="flex justify-between items-center bg-gray-50 p-3 rounded border">
                                             <div>
                                                 <span className={`font-bold ${m.tipo_movimentacao === 'ENTRADA' ? 'text-green-600' : 'text-red-600'}`}>
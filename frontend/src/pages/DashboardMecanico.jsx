@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import api from '../services/api';
+import api, { novaChaveIdempotencia } from '../services/api';
 
 function DashboardMecanico() {
   const navigate = useNavigate();
@@ -13,6 +13,7 @@ function DashboardMecanico() {
   const [veiculosDoCliente, setVeiculosDoCliente] = useState([]);
   const [produtos, setProdutos] = useState([]);
   const [notificacoes, setNotificacoes] = useState([]);
+  const [totalNotificacoes, setTotalNotificacoes] = useState(0);
   const [ordensServico, setOrdensServico] = useState([]);
   const [checklists, setChecklists] = useState([]); // <--- ADICIONAR NOVO ESTADO
   const [orcamentos, setOrcamentos] = useState([]); // ADICIONAR NOVO ESTADO para armazenar orçamentos
@@ -74,6 +75,9 @@ function DashboardMecanico() {
   const [produtoSelecionado, setProdutoSelecionado] = useState('');
   const [quantidadeVenda, setQuantidadeVenda] = useState(1);
   const [buscaProduto, setBuscaProduto] = useState('');
+  // Idempotency-Key da venda em andamento: criada ao abrir o modal (e ao mudar o carrinho)
+  // e reenviada igual se o usuário tentar finalizar de novo depois de uma falha
+  const [chaveVenda, setChaveVenda] = useState(null);
 
   // --- USE EFFECTS ---
   useEffect(() => {
@@ -127,14 +131,15 @@ function DashboardMecanico() {
         api.get('servicos/'),
         api.get('clientes/'),
         api.get('produtos/'),
-        api.get('notificacoes/?nao_lidas=true').catch(() => ({ data: [] })),
+        api.get('notificacoes/?nao_lidas=true&limite=3').catch(() => ({ data: [] })),
         api.get('ordens-servico/').catch(err => {
           console.error('❌ Erro ao carregar OS:', err);
           return { data: [] };
         }),
         api.get('checklists/').catch(() => ({ data: [] })),
         api.get('orcamentos/').catch(() => ({ data: [] })),
-        api.get('laudos-tecnicos/').catch(() => ({ data: [] }))  // <--- ADICIONAR
+        api.get('laudos-tecnicos/').catch(() => ({ data: [] })),  // <--- ADICIONAR
+        api.get('notificacoes/contagem/').catch(() => ({ data: { nao_lidas: 0 } }))
       ]);
 
       console.log('📦 DADOS CARREGADOS:');
@@ -154,6 +159,7 @@ function DashboardMecanico() {
       setChecklists(resp[6].data || []);
       setOrcamentos(resp[7].data || []);
       setLaudos(resp[8].data || []);  // <--- ADICIONAR
+      setTotalNotificacoes(resp[9].data?.nao_lidas || 0);
     } catch (err) {
       console.error('❌ Erro ao carregar dados:', err);
       if (err.response?.status === 401) navigate('/');
@@ -461,6 +467,7 @@ function DashboardMecanico() {
     setProdutoSelecionado('');
     setQuantidadeVenda(1);
     setBuscaProduto('');
+    setChaveVenda(novaChaveIdempotencia());
     setMostrarModalVendaBalcao(true);
   };
 
@@ -478,6 +485,7 @@ function DashboardMecanico() {
     } else {
       setCarrinhoVenda([...carrinhoVenda, { produto, quantidade: quantidadeVenda }]);
     }
+    setChaveVenda(novaChaveIdempotencia()); // Outro carrinho é outra venda
 
     setProdutoSelecionado('');
     setQuantidadeVenda(1);
@@ -485,6 +493,7 @@ function DashboardMecanico() {
 
   const removerDoCarrinho = (idProduto) => {
     setCarrinhoVenda(carrinhoVenda.filter(item => item.produto.id_produto !== idProduto));
+    setChaveVenda(novaChaveIdempotencia());
   };
 
   const calcularTotal = () => {
@@ -501,7 +510,8 @@ function DashboardMecanico() {
           valor_unitario: parseFloat(item.produto.preco_venda)
         }))
       };
-      await api.post('vendas/', payload);
+      // A mesma chave acompanha eventuais retentativas e evita baixar o estoque duas vezes
+      await api.post('vendas/', payload, { headers: { 'Idempotency-Key': chaveVenda } });
       alert('Venda realizada com sucesso!');
       setMostrarModalVendaBalcao(false);
       carregarDadosIniciais();
@@ -521,15 +531,37 @@ function DashboardMecanico() {
     setMostrarModalEstoque(true);
   };
 
+  // Recarrega os 3 alertas exibidos e a contagem: dispensar um traz o próximo da fila
+  const recarregarNotificacoes = async () => {
+    const [lista, contagem] = await Promise.all([
+      api.get('notificacoes/?nao_lidas=true&limite=3'),
+      api.get('notificacoes/contagem/')
+    ]);
+    setNotificacoes(lista.data || []);
+    setTotalNotificacoes(contagem.data?.nao_lidas || 0);
+  };
+
   const marcarNotificacaoLida = async (idNotificacao) => {
     try {
       await api.post(`notificacoes/${idNotificacao}/marcar_lida/`);
-      setNotificacoes(notificacoes.filter(n => n.id_notificacao !== idNotificacao));
+      setNotificacoes(atuais => atuais.filter(n => n.id_notificacao !== idNotificacao));
+      setTotalNotificacoes(total => Math.max(total - 1, 0));
+      await recarregarNotificacoes();
     } catch (err) {
       console.error('Erro ao marcar notificação como lida:', err);
     }
   };
 
+  const marcarTodasNotificacoesLidas = async () => {
+    try {
+      await api.post('notificacoes/marcar_todas_lidas/');
+      setNotificacoes([]);
+      setTotalNotificacoes(0);
+    } catch (err) {
+      console.error('Erro ao marcar notificações como lidas:', err);
+    }
+  };
+
   const produtosFiltradosEstoque = filtroEstoqueBaixo
     ? produtos.filter(p => p.estoque_atual < p.estoque_minimo)
     : produtos;
@@ -787,10 +819,10 @@ function DashboardMecanico() {
       <nav className="bg-blue-800 text-white px-6 py-4 flex justify-between shadow-lg sticky top-0 z-10">
         <h1 className="text-2xl font-bold">🛠️ Oficina Dashboard</h1>
         <div className="flex gap-4 items-center">
-          {notificacoes.length > 0 && (
+          {totalNotificacoes > 0 && (
             <button onClick={abrirModalEstoque} className="bg-red-600 px-4 py-2 rounded-lg font-bold hover:bg-red-700 flex items-center gap-2">
               🔔 Alertas
-              <span className="bg-white text-red-600 text-xs rounded-full px-2 py-1">{notificacoes.length}</span>
+              <span className="bg-white text-red-600 text-xs rounded-full px-2 py-1">{totalNotificacoes}</span>
             </button>
           )}
           <button onClick={() => setMostrarModalVeiculo(true)} className="bg-indigo-600 px-4 py-2 rounded font-bold hover:bg-indigo-700">+ Veículo</button>
@@ -806,12 +838,13 @@ function DashboardMecanico() {
 
       <main className="flex-1 p-8 max-w-7xl mx-auto w-full flex flex-col gap-8">
         {/* ALERTAS DE ESTOQUE */}
-        {notificacoes.length > 0 && (
+        {totalNotificacoes > 0 && (
           <section className="bg-red-50 border-l-4 border-red-500 p-4 rounded-lg shadow">
             <div className="flex items-center justify-between mb-3">
               <h3 className="text-lg font-bold text-red-800 flex items-center gap-2">
-                🔔 Alertas de Estoque Baixo ({notificacoes.length})
+                🔔 Alertas de Estoque Baixo ({totalNotificacoes})
               </h3>
+              <button onClick={marcarTodasNotificacoesLidas} className="text-sm bg-gray-200 text-gray-700 px-3 py-1 rounded hover:bg-gray-300">Dispensar todos</button>
             </div>
             <div className="space-y-2">
               {notificacoes.slice(0, 3).map(notif => (
@@ -827,8 +860,8 @@ function DashboardMecanico() {
                 </div>
               ))}
             </div>
-            {notificacoes.length > 3 && (
-              <button onClick={abrirModalEstoque} className="mt-3 text-sm text-red-700 font-bold hover:underline">Ver todas ({notificacoes.length})</button>
+            {totalNotificacoes > 3 && (
+              <button onClick={abrirModalEstoque} className="mt-3 text-sm text-red-700 font-bold hover:underline">Ver todas ({totalNotificacoes})</button>
             )}
           </section>
         )}